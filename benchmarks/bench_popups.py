@@ -0,0 +1,331 @@
+"""
+爱心弹窗性能基准测试
+在 Qt offscreen 平台下无界面运行，结果输出为 JSON，可与基线对比发现性能回退
+
+用法:
+    python benchmarks/bench_popups.py                         # 运行并输出到 benchmarks/results.json
+    python benchmarks/bench_popups.py --save-baseline         # 运行并保存为基线
+    python benchmarks/bench_popups.py --compare               # 运行并与基线对比（回退时退出码为 1）
+    python benchmarks/bench_popups.py --counts 5 30 --modes overlay
+    QT_QPA_PLATFORM=xcb python benchmarks/bench_popups.py --modes overlay opengl   # 需要 OpenGL（如 llvmpipe）
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# 必须在导入 Qt 之前设置，保证无显示器环境下也能运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+BENCH_DIR = Path(__file__).parent.resolve()
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QEvent, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt5.QtGui import QImage, QPainter
+from loguru import logger
+
+from config import config, AppConfig, BUILTIN_COLOR_THEMES, MAX_WINDOWS_POPUPS
+from frame_metrics import frame_metrics
+from heart_trajectory import HeartTrajectory
+from heart_window import HeartWindowManager
+from popup_engine import PopupEngine, STATE_PENDING
+from popup_renderer import (
+    PopupPixmapCache, ShapedTextCache, paint_popup, text_cache, POPUP_WIDTH, POPUP_HEIGHT, POPUP_MARGIN
+)
+
+
+DEFAULT_OUTPUT = BENCH_DIR / "results.json"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+SCREEN_WIDTH = 1920
+SCREEN_HEIGHT = 1080
+
+# 默认测试的弹窗数量（windows 模式只测试不超过 MAX_WINDOWS_POPUPS 的数量）
+DEFAULT_COUNTS = [5, 10, 20, 30, 50, 200, 1000]
+
+
+def max_num_popups() -> int:
+    """AppConfig 允许的最大弹窗数量"""
+    for constraint in AppConfig.model_fields["num_popups"].metadata:
+        if hasattr(constraint, "le"):
+            return constraint.le
+    return 50
+
+
+def rss_bytes():
+    """当前进程常驻内存（字节），无法获取时返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def metric(value: float, unit: str, better: str = "lower") -> dict:
+    """一项测量结果"""
+    return {"value": round(float(value), 6), "unit": unit, "better": better}
+
+
+def run_event_loop(app: QApplication, seconds: float):
+    """在不阻塞定时器的前提下运行事件循环指定时长"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def flush_deleted(app: QApplication):
+    """处理 deleteLater / WA_DeleteOnClose 产生的延迟删除"""
+    app.processEvents()
+    app.sendPostedEvents(None, QEvent.DeferredDelete)
+    app.processEvents()
+    gc.collect()
+
+
+def bench_trajectory(results: dict, repeat: int):
+    """轨迹生成与查询吞吐量"""
+    trajectory = HeartTrajectory(scale=270, center_x=960, center_y=540)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        trajectory.generate_points(config.trajectory_points)
+    results["trajectory.generate_ms"] = metric((time.perf_counter() - started) / repeat * 1000, "ms")
+
+    lookups = 20000
+    progresses = [i / lookups for i in range(lookups)]
+    started = time.perf_counter()
+    for progress in progresses:
+        trajectory.get_point_at_progress(progress)
+    elapsed = time.perf_counter() - started
+    results["trajectory.lookup_per_s"] = metric(lookups / elapsed, "ops/s", "higher")
+
+    for count in (8, 50, 500):
+        batch = progresses[:count]
+        rounds = max(1, 20000 // count)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            trajectory.get_points_and_scales(batch)
+        elapsed = time.perf_counter() - started
+        results[f"trajectory.batch_{count}_us"] = metric(elapsed / rounds * 1e6, "us")
+
+
+def bench_engine(results: dict, repeat: int):
+    """动画引擎单独推进的耗时（不涉及窗口和绘制，使用模拟时钟，结果可复现）"""
+    trajectories = [HeartTrajectory(scale=270 * factor, center_x=960, center_y=540) for factor in (1.0, 0.82)]
+    for trajectory in trajectories:
+        trajectory.generate_points(config.trajectory_points)
+
+    for count in (50, 1000, 5000):
+        engine = PopupEngine()
+        for i in range(count):
+            engine.add(trajectories[i % 2], i / count, 0.0)
+        # 先让所有弹窗完成淡入，只测量运动阶段
+        engine.step(1.0, config.lap_duration)
+
+        now = 1.0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            now += 1 / 60
+            engine.step(now, config.lap_duration)
+        results[f"engine.n{count}.step_us"] = metric((time.perf_counter() - started) / repeat * 1e6, "us")
+
+
+def bench_paint(results: dict, repeat: int):
+    """单个弹窗的绘制开销：文本排版、未缓存的完整绘制 vs 缓存贴图"""
+    theme = BUILTIN_COLOR_THEMES[0]
+    message = "记得按时吃饭哦 💖 今天也要开心呀 ✨"
+    cache = PopupPixmapCache()
+    target = QImage(POPUP_WIDTH, POPUP_HEIGHT, QImage.Format_ARGB32_Premultiplied)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        ShapedTextCache._shape(message, cache.font, POPUP_WIDTH - 2 * POPUP_MARGIN)
+    results["paint.text_shaping_us"] = metric((time.perf_counter() - started) / repeat * 1e6, "us")
+
+    # 完整绘制包括文本排版：每次先清空全局排版缓存，否则只有第一次真正排版
+    started = time.perf_counter()
+    for _ in range(repeat):
+        text_cache.clear()
+        painter = QPainter(target)
+        painter.setRenderHint(QPainter.Antialiasing)
+        paint_popup(painter, POPUP_WIDTH, POPUP_HEIGHT, theme, message, cache.font, 1.01)
+        painter.end()
+    results["paint.uncached_us"] = metric((time.perf_counter() - started) / repeat * 1e6, "us")
+
+    pixmap = cache.get(theme, message, 1.01)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        painter = QPainter(target)
+        painter.setOpacity(0.95)
+        painter.drawPixmap(0, 0, cache.get(theme, message, 1.01))
+        painter.end()
+    results["paint.cached_us"] = metric((time.perf_counter() - started) / repeat * 1e6, "us")
+    del pixmap
+
+
+def bench_popups(app: QApplication, results: dict, mode: str, count: int, duration: float):
+    """创建耗时、稳态每帧开销、绘制开销和每个弹窗的内存"""
+    # opengl 模式即使用 OpenGL 绘制的覆盖层
+    config.render_mode = "overlay" if mode == "opengl" else mode
+    config.overlay_renderer = "opengl" if mode == "opengl" else "painter"
+    # 固定画质：offscreen 下的测量不应触发降级，各次运行才可比较
+    config.adaptive_quality = False
+    prefix = f"popups.{mode}.n{count}"
+
+    manager = HeartWindowManager()
+    manager.load_messages(config.messages_path)
+    flush_deleted(app)
+    rss_before = rss_bytes()
+
+    # 正常运行时弹窗在各自出现前才构建；这里一次构建全部，测量完整的构建开销
+    started = time.perf_counter()
+    manager.create_windows(SCREEN_WIDTH, SCREEN_HEIGHT, count)
+    results[f"{prefix}.first_batch_ms"] = metric((time.perf_counter() - started) * 1000, "ms")
+    manager.flush_spawns()
+    results[f"{prefix}.create_ms"] = metric((time.perf_counter() - started) * 1000, "ms")
+
+    # 跳过依次出现的启动延迟，让所有弹窗立即淡入
+    engine = manager.engine
+    engine.appear_at[engine.rows_in_state(STATE_PENDING)] = time.monotonic()
+
+    # 预热：完成淡入，填充弹窗缓存
+    run_event_loop(app, 0.6)
+
+    frame_metrics.enabled = True
+    frame_metrics.reset()
+    overlay = manager._overlay
+    if overlay is not None and overlay.renderer == "opengl":
+        overlay.draw_calls = 0
+    run_event_loop(app, duration)
+    snapshot = frame_metrics.snapshot()
+    frame_metrics.enabled = False
+
+    results[f"{prefix}.frame_update_p50_ms"] = metric(snapshot["update_ms"]["p50"], "ms")
+    results[f"{prefix}.frame_update_p95_ms"] = metric(snapshot["update_ms"]["p95"], "ms")
+    results[f"{prefix}.paint_p50_ms"] = metric(snapshot["paint_ms"]["p50"], "ms")
+    results[f"{prefix}.paint_p95_ms"] = metric(snapshot["paint_ms"]["p95"], "ms")
+    results[f"{prefix}.dropped_frames"] = metric(snapshot["dropped_frames"], "frames")
+    if overlay is not None and overlay.renderer == "opengl" and snapshot["frames"]:
+        results[f"{prefix}.draw_calls_per_frame"] = metric(overlay.draw_calls / snapshot["frames"], "calls")
+
+    rss_after = rss_bytes()
+    if rss_before is not None and rss_after is not None:
+        results[f"{prefix}.rss_per_popup_kb"] = metric(max(0, rss_after - rss_before) / count / 1024, "KB")
+
+    manager.close_all()
+    run_event_loop(app, 0.5)
+    if manager._overlay is not None:
+        manager._overlay.deleteLater()
+    manager.frame_timer.stop()
+    flush_deleted(app)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """与基线对比，返回回退项列表"""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None or reference["value"] == 0:
+            continue
+        ratio = current["value"] / reference["value"]
+        if current["better"] == "lower":
+            regressed = ratio > 1 + tolerance
+        else:
+            regressed = ratio < 1 - tolerance
+        status = "回退" if regressed else "正常"
+        print(f"  [{status}] {name}: {reference['value']:.4g} -> {current['value']:.4g} {current['unit']} ({ratio:.2f}x)")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="爱心弹窗性能基准测试（无界面）")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="结果 JSON 文件")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="基线 JSON 文件")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--compare", action="store_true", help="与基线对比，回退时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的相对回退比例")
+    parser.add_argument("--counts", type=int, nargs="+", help=f"测试的弹窗数量（默认 {DEFAULT_COUNTS}）")
+    parser.add_argument("--modes", nargs="+", default=["windows", "overlay"], help="测试的渲染模式")
+    parser.add_argument("--duration", type=float, default=2.0, help="每组稳态测量时长（秒）")
+    parser.add_argument("--repeat", type=int, default=200, help="微基准重复次数")
+    args = parser.parse_args()
+
+    # 基准测试期间不输出日志，避免干扰计时
+    logger.remove()
+
+    app = QApplication(sys.argv)
+
+    upper = max_num_popups()
+    counts = args.counts or DEFAULT_COUNTS
+    counts = [c for c in counts if 1 <= c <= upper]
+
+    results = {}
+    print("轨迹生成与查询...")
+    bench_trajectory(results, args.repeat)
+    print("动画引擎...")
+    bench_engine(results, args.repeat)
+    print("弹窗绘制...")
+    bench_paint(results, args.repeat)
+    modes = args.modes
+    if "opengl" in modes:
+        from gl_overlay import gl_available
+        if not gl_available():
+            print(f"当前平台 ({app.platformName()}) 没有可用的 OpenGL，跳过 opengl 模式")
+            modes = [mode for mode in modes if mode != "opengl"]
+    for mode in modes:
+        for count in counts:
+            if mode == "windows" and count > MAX_WINDOWS_POPUPS:
+                continue
+            print(f"弹窗: mode={mode}, num_popups={count}...")
+            bench_popups(app, results, mode, count, args.duration)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "platform": platform.platform(),
+            "qpa": os.environ.get("QT_QPA_PLATFORM"),
+        },
+        "results": results,
+    }
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"结果已保存到: {args.output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"基线已保存到: {args.baseline}")
+
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"基线文件不存在: {args.baseline}")
+            return 2
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        print(f"与基线对比（允许回退 {args.tolerance:.0%}）:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"发现 {len(regressions)} 项性能回退")
+            return 1
+        print("未发现性能回退")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
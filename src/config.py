@@ -1,9 +1,11 @@
 """
 配置管理模块 - 使用 Pydantic 和 JSON
+配置模型 AppConfig 定义在 config_model 模块中，按需导入：启动快照有效时启动过程不需要导入 Pydantic
 """
-import json
+import sys
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field
+from typing import Dict
 from loguru import logger
 
 
@@ -12,10 +14,9 @@ BASE_DIR = Path(__file__).parent.parent.resolve()
 CONFIG_FILE = BASE_DIR / "config.json"
 DATA_DIR = BASE_DIR / "data"
 LOG_DIR = BASE_DIR / "logs"
+CACHE_DIR = BASE_DIR / "cache"  # 派生数据缓存（按需创建）
 
-# 确保必要的目录存在
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-LOG_DIR.mkdir(parents=True, exist_ok=True)
+# 注意：导入本模块不做任何 I/O，配置在首次访问时加载，日志由 main() 调用 setup_logger() 初始化
 
 
 # 内置颜色主题（用户不需要配置）
@@ -32,80 +33,113 @@ BUILTIN_COLOR_THEMES = [
     {"name": "森林绿", "bg_start": "#C5E1A5", "bg_end": "#AED581", "text": "#33691E", "shadow": "#7CB342"},
 ]
 
+# windows 渲染模式下每个弹窗是一个原生窗口，数量过多时窗口系统本身成为瓶颈
+MAX_WINDOWS_POPUPS = 50
 
-class AppConfig(BaseModel):
-    """应用配置"""
-    num_popups: int = Field(default=24, ge=5, le=50, description="弹窗数量")
-    messages_file: str = Field(default="messages.txt", description="消息文件名")
+# 最内层爱心轨迹相对最外层的最小比例
+MIN_RING_FACTOR = 0.2
+
+# 日志配置档：控制台级别（None 表示不输出到控制台）和日志文件级别
+LOG_PROFILES = {
+    "debug": {"console": "DEBUG", "file": "DEBUG"},
+    "default": {"console": "INFO", "file": "INFO"},
+    "quiet": {"console": None, "file": "WARNING"},
+}
+
+
+class ConfigValues:
+    """
+    启动快照中保存的配置（字段和取值与校验后的 AppConfig 相同）
+    
+    快照有效时代替 AppConfig 使用，启动时不需要导入 Pydantic、不重新校验；
+    热重载时替换为新解析的 AppConfig。
+    """
+    
+    def __init__(self, values: dict):
+        self.__dict__.update(values)
     
     @property
     def messages_path(self) -> Path:
         """获取消息文件完整路径"""
         return DATA_DIR / self.messages_file
+
+
+class _ConfigProxy:
+    """全局配置的延迟加载代理：首次访问属性时才读取 config.json（启动快照有效时使用快照）"""
+    
+    def __init__(self):
+        object.__setattr__(self, '_config', None)
+    
+    def load(self) -> 'AppConfig':
+        """加载配置（已加载时直接返回）"""
+        current = object.__getattribute__(self, '_config')
+        if current is None:
+            from startup_snapshot import startup_snapshot
+            current = startup_snapshot.config()
+            if current is None:
+                from config_model import AppConfig
+                current = AppConfig.load_from_json()
+            object.__setattr__(self, '_config', current)
+        return current
     
-    @classmethod
-    def load_from_json(cls, config_path: Path = CONFIG_FILE) -> 'AppConfig':
-        """从JSON文件加载配置"""
-        try:
-            if not config_path.exists():
-                logger.warning(f"配置文件不存在: {config_path}, 使用默认配置")
-                config = cls()
-                config.save_to_json(config_path)
-                return config
-            
-            with open(config_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            logger.info(f"成功加载配置文件: {config_path}")
-            return cls(**data)
-            
-        except Exception as e:
-            logger.error(f"加载配置文件失败: {e}, 使用默认配置")
-            return cls()
+    def replace(self, new_config: 'AppConfig'):
+        """替换为新的配置（热重载）"""
+        object.__setattr__(self, '_config', new_config)
+    
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+    
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+
+def __getattr__(name: str):
+    """AppConfig 按需导入（导入 Pydantic 和构建模型较慢，启动快照有效时不需要）"""
+    if name == "AppConfig":
+        from config_model import AppConfig
+        return AppConfig
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 全局配置实例（延迟加载）
+config: 'AppConfig' = _ConfigProxy()
+
+
+def setup_logger(banner: bool = True):
+    """
+    配置日志系统（按 log_profile 选择级别，log_async 时由后台线程写入）
     
-    def save_to_json(self, config_path: Path = CONFIG_FILE):
-        """保存配置到JSON文件"""
-        try:
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(
-                    self.model_dump(),
-                    f,
-                    ensure_ascii=False,
-                    indent=2
-                )
-            logger.info(f"配置已保存到: {config_path}")
-        except Exception as e:
-            logger.error(f"保存配置文件失败: {e}")
-
-
-# 全局配置实例
-config = AppConfig.load_from_json()
-
-
-def setup_logger():
-    """配置日志系统"""
+    Args:
+        banner: 是否输出启动横幅（热重载日志配置时不输出）
+    """
     logger.remove()
+    profile = LOG_PROFILES[config.log_profile]
     
-    # 控制台输出
-    logger.add(
-        sink=lambda msg: print(msg, end=''),
-        format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>",
-        level="INFO",
-        colorize=True
-    )
+    # 控制台输出（打包为无控制台程序时 sys.stdout 为 None）
+    if profile["console"] is not None and sys.stdout is not None:
+        logger.add(
+            sink=sys.stdout,
+            format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>",
+            level=profile["console"],
+            colorize=True,
+            enqueue=config.log_async
+        )
     
-    # 文件输出
+    # 文件输出（loguru 会自动创建日志目录）
     log_file = LOG_DIR / "heartcare_{time:YYYY-MM-DD}.log"
     logger.add(
         sink=str(log_file),
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-        level="INFO",
+        level=profile["file"],
         rotation="10 MB",
         retention="7 days",
         encoding='utf-8',
-        enqueue=True
+        enqueue=config.log_async
     )
     
+    if not banner:
+        return
+    
     logger.info("=" * 60)
     logger.info("爱心关怀弹窗程序启动")
     logger.info(f"弹窗数量: {config.num_popups} (建议: 15-30)")
@@ -113,12 +147,31 @@ def setup_logger():
     logger.info("=" * 60)
 
 
-# 初始化日志
-setup_logger()
+# 限频日志：键 -> 上次输出的时刻
+_last_logged: Dict[str, float] = {}
+
+
+def log_allowed(key: str, interval: float = 1.0) -> bool:
+    """
+    限制高频日志（如连续点击、批量创建）的输出频率
+    
+    Args:
+        key: 日志类别
+        interval: 同一类别两次输出的最小间隔（秒）
+    
+    Returns:
+        bool: 本次是否应该输出
+    """
+    now = time.monotonic()
+    if now - _last_logged.get(key, float('-inf')) < interval:
+        return False
+    _last_logged[key] = now
+    return True
 
 
 if __name__ == '__main__':
     print(f"\n当前配置:")
     print(f"弹窗数量: {config.num_popups} (建议: 15-30)")
     print(f"消息文件: {config.messages_path}")
+    print(f"渲染模式: {config.render_mode}")
     print(f"内置主题数: {len(BUILTIN_COLOR_THEMES)}")
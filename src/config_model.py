@@ -0,0 +1,155 @@
+"""
+配置模型
+Pydantic 校验 config.json，由 config 模块按需导入（config.AppConfig）
+"""
+import json
+from pathlib import Path
+from typing import Dict, Literal
+from pydantic import BaseModel, Field, NonNegativeFloat, model_validator
+from loguru import logger
+
+from config import CONFIG_FILE, DATA_DIR, MAX_WINDOWS_POPUPS, MIN_RING_FACTOR
+from hot_reload import file_signature
+from startup_snapshot import startup_snapshot
+
+
+class AppConfig(BaseModel):
+    """应用配置"""
+    num_popups: int = Field(
+        default=24, ge=5, le=5000,
+        description=f"弹窗数量（windows 模式最多 {MAX_WINDOWS_POPUPS} 个，更多时请使用 overlay 模式）"
+    )
+    messages_file: str = Field(default="messages.txt", description="消息文件名")
+    messages_mmap_threshold_mb: float = Field(
+        default=8.0, ge=0.0,
+        description="消息文件达到该大小(MB)时使用内存映射 + 行索引，只解码实际显示的语句"
+    )
+    render_mode: Literal["windows", "overlay"] = Field(
+        default="windows",
+        description="渲染模式: windows=每个弹窗一个独立窗口, overlay=单个全屏覆盖层绘制所有弹窗"
+    )
+    overlay_renderer: Literal["painter", "opengl"] = Field(
+        default="painter",
+        description="overlay 模式的绘制方式: painter=QPainter, opengl=纹理图集 + 每帧一次批量绘制（OpenGL 不可用时自动退回 painter）"
+    )
+    target_fps: int = Field(default=60, ge=10, le=240, description="目标帧率（帧时钟的采样频率）")
+    lap_duration: float = Field(default=25.0, ge=2.0, le=600.0, description="弹窗绕爱心一圈的时长（秒）")
+    trajectory_points: int = Field(default=120, ge=16, le=4096, description="爱心轨迹存储的点数（按弧长等距，查询时插值）")
+    heart_rings: int = Field(default=1, ge=1, le=10, description="同心爱心轨迹的圈数（弹窗按周长比例分布到各圈）")
+    heart_ring_spacing: float = Field(default=0.18, ge=0.05, le=0.5, description="相邻两圈爱心的缩放比例差")
+    layout_mode: Literal["uniform", "spread"] = Field(
+        default="uniform",
+        description="弹窗布局: uniform=爱心固定为屏幕的 25%, spread=评估弹窗重叠，在屏幕内放大爱心以减少重叠"
+    )
+    popup_size_mode: Literal["fixed", "content"] = Field(
+        default="fixed",
+        description="弹窗尺寸: fixed=固定 320x120, content=按文本排版后的尺寸调整（短句更小，长句更高）"
+    )
+    fade_mode: Literal["auto", "compositor", "repaint"] = Field(
+        default="auto",
+        description="windows 模式的淡入淡出方式: auto=有合成器时用窗口透明度, compositor=优先窗口透明度, repaint=重绘"
+    )
+    pixmap_cache_size: int = Field(default=160, ge=16, le=4096, description="弹窗预渲染缓存的最大条目数")
+    window_pool_size: int = Field(default=50, ge=0, le=500, description="windows 模式下复用池保留的空闲窗口数")
+    window_pool_idle_trim: float = Field(default=600.0, ge=0.0, description="复用池空闲多久(秒)后销毁空闲窗口，0 表示不清理")
+    adaptive_quality: bool = Field(
+        default=True,
+        description="机器跟不上时逐级降低画质（关闭脉动 → 关闭抗锯齿 → 降低帧率 → 减少弹窗），余量恢复后逐级恢复"
+    )
+    quality_degrade_ratio: float = Field(
+        default=1.5, ge=1.1, le=5.0, description="平均帧间隔超过当前帧时钟间隔的该倍数时视为跟不上"
+    )
+    quality_restore_ratio: float = Field(
+        default=0.4, ge=0.05, le=0.9, description="每帧耗时（更新 + 绘制）低于完整帧率帧预算的该比例时视为有余量"
+    )
+    quality_degrade_seconds: float = Field(default=2.0, ge=0.5, le=60.0, description="持续跟不上多久(秒)后降低一档画质")
+    quality_restore_seconds: float = Field(default=10.0, ge=1.0, le=600.0, description="持续有余量多久(秒)后恢复一档画质")
+    quality_low_fps: int = Field(default=30, ge=5, le=240, description="降低帧率档位使用的帧率（不高于 target_fps）")
+    quality_popup_fraction: float = Field(default=0.5, ge=0.1, le=1.0, description="减少弹窗档位保留的弹窗比例")
+    rotation_mode: Literal["off", "lap", "interval"] = Field(
+        default="off",
+        description="语句轮换: off=弹窗始终显示同一条语句, lap=每绕爱心一圈更换一条, interval=每隔 rotation_interval 秒更换一条"
+    )
+    rotation_interval: float = Field(default=30.0, ge=1.0, le=3600.0, description="interval 轮换模式下更换语句的间隔（秒）")
+    rotation_policy: Literal["sequential", "shuffled", "weighted"] = Field(
+        default="sequential",
+        description="轮换选择语句的方式: sequential=按文件顺序, shuffled=打乱顺序（每轮不重复）, weighted=按 rotation_weights 加权随机"
+    )
+    rotation_weights: Dict[str, NonNegativeFloat] = Field(
+        default_factory=dict, description="weighted 策略下各语句的权重（语句原文 -> 权重，未列出的语句为 1，0 表示不显示）"
+    )
+    rotation_prefetch: int = Field(default=64, ge=1, le=4096, description="后台线程预先准备（解码 + 排版）的语句数量")
+    hot_reload: bool = Field(default=True, description="监视 config.json 和消息文件，修改后自动应用（只增删/更新变化的弹窗）")
+    log_profile: Literal["debug", "default", "quiet"] = Field(
+        default="default",
+        description="日志配置档: debug=输出调试日志, default=INFO, quiet=不输出到控制台、日志文件只记录警告和错误"
+    )
+    log_async: bool = Field(default=True, description="日志在后台线程写入控制台和文件，不阻塞界面线程")
+    metrics_enabled: bool = Field(default=False, description="启动时开启帧性能统计")
+    metrics_log_interval: float = Field(default=10.0, ge=1.0, le=3600.0, description="性能统计输出到日志的间隔（秒）")
+    show_hud: bool = Field(default=False, description="启动时显示屏幕性能面板")
+    
+    @model_validator(mode='after')
+    def _check_popup_limits(self) -> 'AppConfig':
+        """校验弹窗数量与渲染模式、同心圈参数的组合"""
+        if self.render_mode == "windows" and self.num_popups > MAX_WINDOWS_POPUPS:
+            logger.warning(
+                f"windows 渲染模式最多支持 {MAX_WINDOWS_POPUPS} 个弹窗 (配置为 {self.num_popups})，"
+                f"已自动调整；更多弹窗请设置 render_mode 为 overlay"
+            )
+            self.num_popups = MAX_WINDOWS_POPUPS
+        
+        innermost = 1 - (self.heart_rings - 1) * self.heart_ring_spacing
+        if innermost < MIN_RING_FACTOR:
+            rings = int((1 - MIN_RING_FACTOR) / self.heart_ring_spacing) + 1
+            logger.warning(f"同心爱心圈数过多，最内圈过小，已从 {self.heart_rings} 圈调整为 {rings} 圈")
+            self.heart_rings = rings
+        return self
+    
+    @property
+    def messages_path(self) -> Path:
+        """获取消息文件完整路径"""
+        return DATA_DIR / self.messages_file
+    
+    @classmethod
+    def load_from_json(cls, config_path: Path = CONFIG_FILE) -> 'AppConfig':
+        """从JSON文件加载配置"""
+        try:
+            if not config_path.exists():
+                logger.warning(f"配置文件不存在: {config_path}, 使用默认配置")
+                config = cls()
+                config.save_to_json(config_path)
+                return config
+            
+            # 先记录文件签名再解析：解析期间文件被修改时，快照不会与新内容对应
+            signature = file_signature(config_path)
+            config = cls.parse_json(config_path)
+            logger.info(f"成功加载配置文件: {config_path}")
+            if config_path == CONFIG_FILE:
+                startup_snapshot.set_config(config, signature)
+            return config
+            
+        except Exception as e:
+            logger.error(f"加载配置文件失败: {e}, 使用默认配置")
+            return cls()
+    
+    @classmethod
+    def parse_json(cls, config_path: Path = CONFIG_FILE) -> 'AppConfig':
+        """解析JSON配置文件（文件无效时抛出异常，供热重载判断是否保留当前配置）"""
+        with open(config_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(**data)
+    
+    def save_to_json(self, config_path: Path = CONFIG_FILE):
+        """保存配置到JSON文件"""
+        try:
+            with open(config_path, 'w', encoding='utf-8') as f:
+                json.dump(
+                    self.model_dump(),
+                    f,
+                    ensure_ascii=False,
+                    indent=2
+                )
+            logger.info(f"配置已保存到: {config_path}")
+        except Exception as e:
+            logger.error(f"保存配置文件失败: {e}")
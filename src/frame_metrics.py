@@ -0,0 +1,232 @@
+"""
+帧性能统计模块
+记录帧间隔、位置更新耗时、绘制耗时、掉帧数和事件循环唤醒次数，并提供屏幕性能面板
+"""
+import time
+from collections import deque
+from typing import Deque, Optional
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import Qt, QTimer, QAbstractEventDispatcher
+from PyQt5.QtGui import QPainter, QColor, QFont
+from loguru import logger
+
+from config import config
+
+
+class RollingStat:
+    """滚动窗口统计 - 保留最近 N 个样本，计算分位数"""
+
+    def __init__(self, size: int = 600):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, value: float):
+        """添加一个样本"""
+        self.samples.append(value)
+
+    def clear(self):
+        """清空样本"""
+        self.samples.clear()
+
+    def percentiles(self) -> dict:
+        """返回 p50/p95/p99（毫秒），无样本时为 0"""
+        if not self.samples:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        import numpy as np  # 仅在输出统计时需要，避免拖慢启动
+        p50, p95, p99 = np.percentile(np.fromiter(self.samples, dtype=np.float64), [50, 95, 99])
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+class FrameMetrics:
+    """帧性能统计（单位：毫秒）"""
+
+    def __init__(self, window_size: int = 600):
+        """
+        初始化统计
+
+        Args:
+            window_size: 每项指标保留的最近样本数（60fps 下约 10 秒）
+        """
+        self.enabled = False
+        self.tick_interval = RollingStat(window_size)
+        self.update_time = RollingStat(window_size)
+        self.paint_time = RollingStat(window_size)
+        self.frames = 0
+        self.dropped_frames = 0
+        self._last_tick: Optional[float] = None
+        # 帧时钟当前的间隔（毫秒，画质调节器降低帧率时由管理器设置；None 表示按 target_fps）
+        self.expected_interval_ms: Optional[float] = None
+        # 累计绘制耗时（秒）：自适应画质开启时始终计时，由画质调节器读取并清零
+        self.track_paint = False
+        self.paint_seconds = 0.0
+        # 事件循环唤醒计数（空闲时应接近 0）
+        self.wakeups = 0
+        self._wakeups_since = time.monotonic()
+        self._counting_wakeups = False
+
+    def count_wakeups(self, enabled: bool):
+        """开始/停止统计事件循环唤醒次数（QAbstractEventDispatcher.awake）"""
+        dispatcher = QAbstractEventDispatcher.instance()
+        if dispatcher is None or enabled == self._counting_wakeups:
+            return
+        if enabled:
+            dispatcher.awake.connect(self._on_awake)
+        else:
+            dispatcher.awake.disconnect(self._on_awake)
+        self._counting_wakeups = enabled
+        self.wakeups = 0
+        self._wakeups_since = time.monotonic()
+
+    def _on_awake(self):
+        """事件循环从休眠中醒来"""
+        self.wakeups += 1
+
+    def wakeup_rate(self) -> float:
+        """自上次重置以来平均每秒唤醒次数"""
+        elapsed = time.monotonic() - self._wakeups_since
+        return self.wakeups / elapsed if elapsed > 0 else 0.0
+
+    def reset(self):
+        """清空所有统计"""
+        self.tick_interval.clear()
+        self.update_time.clear()
+        self.paint_time.clear()
+        self.frames = 0
+        self.dropped_frames = 0
+        self._last_tick = None
+        self.wakeups = 0
+        self._wakeups_since = time.monotonic()
+
+    def record_tick(self, now: float):
+        """记录一次帧时钟回调（now 为单调时钟秒数）"""
+        if not self.enabled:
+            return
+        self.frames += 1
+        if self._last_tick is not None:
+            interval = (now - self._last_tick) * 1000
+            self.tick_interval.add(interval)
+
+            # 超过 1.5 个帧间隔视为掉帧
+            expected = self.expected_interval_ms or 1000 / config.target_fps
+            if interval > expected * 1.5:
+                self.dropped_frames += int(round(interval / expected)) - 1
+        self._last_tick = now
+
+    def stop_ticks(self):
+        """帧时钟停止时调用，避免把停止期间算作一次超长帧"""
+        self._last_tick = None
+
+    def record_update(self, seconds: float):
+        """记录一帧中位置/状态更新的耗时"""
+        if self.enabled:
+            self.update_time.add(seconds * 1000)
+
+    def record_paint(self, seconds: float):
+        """记录一次 paintEvent 的耗时"""
+        self.paint_seconds += seconds
+        if self.enabled:
+            self.paint_time.add(seconds * 1000)
+
+    def snapshot(self) -> dict:
+        """当前统计快照"""
+        tick = self.tick_interval.percentiles()
+        return {
+            "frames": self.frames,
+            "dropped_frames": self.dropped_frames,
+            "fps": 1000 / tick["p50"] if tick["p50"] > 0 else 0.0,
+            "tick_interval_ms": tick,
+            "update_ms": self.update_time.percentiles(),
+            "paint_ms": self.paint_time.percentiles(),
+            "wakeups_per_s": self.wakeup_rate(),
+        }
+
+    def summary_lines(self) -> list:
+        """格式化的统计文本（用于日志和性能面板）"""
+        snap = self.snapshot()
+
+        def fmt(stat: dict) -> str:
+            return f"p50 {stat['p50']:.2f} / p95 {stat['p95']:.2f} / p99 {stat['p99']:.2f} ms"
+
+        return [
+            f"FPS {snap['fps']:.1f}  帧数 {snap['frames']}  掉帧 {snap['dropped_frames']}",
+            f"帧间隔 {fmt(snap['tick_interval_ms'])}",
+            f"更新   {fmt(snap['update_ms'])}",
+            f"绘制   {fmt(snap['paint_ms'])}",
+            f"唤醒   {snap['wakeups_per_s']:.1f} 次/秒",
+        ]
+
+    def log_summary(self):
+        """输出统计到日志"""
+        if not self.enabled:
+            return
+        for line in self.summary_lines():
+            logger.info(f"[性能] {line}")
+
+
+# 全局帧统计实例
+frame_metrics = FrameMetrics()
+
+
+def paint_timer():
+    """绘制计时的起点（统计和自适应画质都关闭时返回 None，不产生开销）"""
+    return time.perf_counter() if frame_metrics.enabled or frame_metrics.track_paint else None
+
+
+class MetricsHud(QWidget):
+    """性能面板 - 屏幕左上角的小型置顶窗口，不接收鼠标事件"""
+
+    def __init__(self, metrics: FrameMetrics = frame_metrics):
+        super().__init__()
+        self.metrics = metrics
+        self.lines = []
+
+        self.setWindowFlags(
+            Qt.WindowStaysOnTopHint |
+            Qt.FramelessWindowHint |
+            Qt.Tool |
+            Qt.WindowTransparentForInput
+        )
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.setFixedSize(380, 116)
+        self.move(12, 12)
+
+        self._font = QFont("Consolas", 10)
+
+        # 面板自身的刷新频率很低，只在显示时运行
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self._refresh)
+
+    def showEvent(self, event):
+        """显示时开始刷新"""
+        self.refresh_timer.start(500)
+        self._refresh()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        """隐藏时停止刷新"""
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def set_paused(self, paused: bool):
+        """空闲时暂停刷新（显示最后一次的统计），恢复时继续"""
+        if paused:
+            self._refresh()
+            self.refresh_timer.stop()
+        elif self.isVisible() and not self.refresh_timer.isActive():
+            self.refresh_timer.start(500)
+
+    def _refresh(self):
+        """刷新统计文本"""
+        self.lines = self.metrics.summary_lines()
+        self.update()
+
+    def paintEvent(self, event):
+        """绘制半透明背景和统计文本"""
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 160))
+        painter.setFont(self._font)
+        painter.setPen(QColor("#7CFC00"))
+        for i, line in enumerate(self.lines):
+            painter.drawText(10, 20 + i * 20, line)
+        painter.end()
@@ -0,0 +1,411 @@
+"""
+OpenGL 覆盖层渲染
+所有弹窗预渲染到一张纹理图集中（渐变、圆角、边框和文本都烘焙在图集里），
+每帧把所有弹窗作为带纹理的四边形一次批量绘制。只需要 OpenGL 2.0，
+可以在软件光栅化（Mesa llvmpipe）下运行；OpenGL 不可用时 create_overlay() 退回 QPainter 覆盖层
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from PyQt5.QtWidgets import QOpenGLWidget
+from PyQt5.QtGui import (
+    QImage, QOffscreenSurface, QOpenGLBuffer, QOpenGLContext, QOpenGLShader, QOpenGLShaderProgram,
+    QOpenGLTexture, QOpenGLVersionProfile, QSurfaceFormat
+)
+from loguru import logger
+
+from config import config, log_allowed
+from heart_overlay import OverlaySurface
+from frame_metrics import frame_metrics, paint_timer
+from startup_profile import startup_profiler
+from popup_renderer import popup_cache, render_popup_image, quantize_scale, POPUP_WIDTH, POPUP_HEIGHT, POPUP_MAX_HEIGHT
+
+
+# OpenGL 常量（PyQt5 不导出 GL 枚举）
+GL_TRIANGLES = 0x0004
+GL_ONE = 1
+GL_ONE_MINUS_SRC_ALPHA = 0x0303
+GL_BLEND = 0x0BE2
+GL_MAX_TEXTURE_SIZE = 0x0D33
+GL_TEXTURE_2D = 0x0DE1
+GL_UNSIGNED_BYTE = 0x1401
+GL_FLOAT = 0x1406
+GL_RGBA = 0x1908
+GL_RENDERER = 0x1F01
+GL_COLOR_BUFFER_BIT = 0x4000
+
+# 图集纹理的最大边长（同时受显卡 GL_MAX_TEXTURE_SIZE 限制）
+ATLAS_MAX_SIZE = 4096
+
+# 每个顶点：x, y, u, v, 透明度
+VERTEX_FLOATS = 5
+
+# 四边形的 6 个顶点（两个三角形）对应矩形的哪个角：(是否右侧, 是否下侧)
+_QUAD_CORNERS = np.array([(0, 0), (1, 0), (0, 1), (0, 1), (1, 0), (1, 1)], dtype=np.float32)
+
+# 着色器只使用 GLSL 1.10 / GLSL ES 1.00 的语法，兼容 OpenGL 2.0 和软件光栅化
+VERTEX_SHADER = """
+attribute vec2 a_position;
+attribute vec2 a_texcoord;
+attribute float a_opacity;
+uniform vec2 u_viewport;
+varying vec2 v_texcoord;
+varying float v_opacity;
+void main() {
+    v_texcoord = a_texcoord;
+    v_opacity = a_opacity;
+    gl_Position = vec4(a_position.x / u_viewport.x * 2.0 - 1.0, 1.0 - a_position.y / u_viewport.y * 2.0, 0.0, 1.0);
+}
+"""
+
+# 图集是预乘 alpha 的图像，整体透明度直接乘到四个通道上
+FRAGMENT_SHADER = """
+#ifdef GL_ES
+precision mediump float;
+#endif
+uniform sampler2D u_atlas;
+varying vec2 v_texcoord;
+varying float v_opacity;
+void main() {
+    gl_FragColor = texture2D(u_atlas, v_texcoord) * v_opacity;
+}
+"""
+
+# OpenGL 是否可用（首次检测后缓存）
+_gl_available: Optional[bool] = None
+
+
+def surface_format() -> QSurfaceFormat:
+    """覆盖层的 OpenGL 表面格式（需要 alpha 通道才能透明）"""
+    surface = QSurfaceFormat()
+    surface.setAlphaBufferSize(8)
+    return surface
+
+
+def gl_functions(context: QOpenGLContext):
+    """OpenGL 2.0 函数表（上下文不支持时返回 None）"""
+    profile = QOpenGLVersionProfile()
+    profile.setVersion(2, 0)
+    functions = context.versionFunctions(profile)
+    if functions is not None:
+        functions.initializeOpenGLFunctions()
+    return functions
+
+
+def build_program() -> Optional[QOpenGLShaderProgram]:
+    """编译并链接着色器（需要当前上下文），失败时返回 None"""
+    program = QOpenGLShaderProgram()
+    if (program.addShaderFromSourceCode(QOpenGLShader.Vertex, VERTEX_SHADER)
+            and program.addShaderFromSourceCode(QOpenGLShader.Fragment, FRAGMENT_SHADER)
+            and program.link()):
+        return program
+    logger.error(f"OpenGL 着色器编译失败: {program.log()}")
+    return None
+
+
+def gl_available() -> bool:
+    """检测 OpenGL 2.0 是否可用：创建离屏上下文并编译着色器（需要已创建 QApplication，结果缓存）"""
+    global _gl_available
+    if _gl_available is not None:
+        return _gl_available
+
+    available = False
+    context = QOpenGLContext()
+    context.setFormat(surface_format())
+    surface = QOffscreenSurface()
+    surface.setFormat(context.format())
+    surface.create()
+    if context.create() and surface.isValid() and context.makeCurrent(surface):
+        functions = gl_functions(context)
+        program = build_program() if functions is not None else None
+        if program is not None:
+            version = context.format()
+            logger.info(
+                f"OpenGL 可用: {functions.glGetString(GL_RENDERER)} "
+                f"({version.majorVersion()}.{version.minorVersion()})"
+            )
+            available = True
+        del program
+        context.doneCurrent()
+
+    _gl_available = available
+    return available
+
+
+class TextureAtlas:
+    """
+    弹窗图集 - 预渲染的弹窗图像放在一张纹理的等大格子中，按 LRU 淘汰
+
+    只负责分配格子和记录待上传的图像，上传和绘制由 GLHeartOverlay 完成。
+    同一批次（一次绘制调用）用到的格子不会被淘汰；格子全部被当前批次占用时，
+    调用方先绘制当前批次，再开始新的批次。
+    """
+
+    def __init__(self, size: int, cell_width: int, cell_height: int):
+        """
+        初始化图集
+
+        Args:
+            size: 纹理边长（物理像素）
+            cell_width, cell_height: 格子尺寸（物理像素，不小于最大的弹窗图像）
+        """
+        self.size = size
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.columns = size // cell_width
+        self.capacity = self.columns * (size // cell_height)
+        self._cells: 'OrderedDict[tuple, int]' = OrderedDict()
+        self._free = list(range(self.capacity - 1, -1, -1))
+        self._batch = set()
+        # 待上传的图像：(格子, 图像)
+        self.uploads: List[Tuple[int, QImage]] = []
+        self.uploaded = 0
+
+    def begin_batch(self):
+        """开始新的绘制批次（之前批次的格子可以被淘汰）"""
+        self._batch.clear()
+
+    def lookup(self, key: tuple) -> Optional[int]:
+        """查找图像所在的格子（未命中时返回 None）"""
+        cell = self._cells.get(key)
+        if cell is not None:
+            self._cells.move_to_end(key)
+            self._batch.add(cell)
+        return cell
+
+    def full(self) -> bool:
+        """所有格子都被当前批次占用（需要先绘制当前批次）"""
+        return not self._free and len(self._batch) >= len(self._cells)
+
+    def insert(self, key: tuple, image: QImage) -> int:
+        """放入新图像（调用前确认 full() 为 False），返回格子"""
+        if self._free:
+            cell = self._free.pop()
+        else:
+            evicted = next(k for k, c in self._cells.items() if c not in self._batch)
+            cell = self._cells.pop(evicted)
+        self._cells[key] = cell
+        self._batch.add(cell)
+        self.uploads.append((cell, image))
+        return cell
+
+    def cell_origin(self, cell: int) -> Tuple[int, int]:
+        """格子左上角在纹理中的像素坐标"""
+        return (cell % self.columns) * self.cell_width, (cell // self.columns) * self.cell_height
+
+
+def build_quads(xs: np.ndarray, ys: np.ndarray, widths: np.ndarray, heights: np.ndarray,
+                opacity: np.ndarray, cells: np.ndarray, atlas: TextureAtlas, ratio: float) -> np.ndarray:
+    """
+    生成所有弹窗的顶点数据（每个弹窗两个三角形）
+
+    Args:
+        xs, ys: 弹窗中心坐标（逻辑像素）
+        widths, heights: 弹窗尺寸（逻辑像素）
+        opacity: 弹窗透明度
+        cells: 弹窗图像所在的图集格子
+        atlas: 图集
+        ratio: 设备像素比（图集中的图像按物理像素渲染）
+
+    Returns:
+        np.ndarray: 形状 (N * 6, VERTEX_FLOATS) 的 float32 顶点数组
+    """
+    # 与 OverlayPopup.x / y 相同的取整方式，和点击区域对齐
+    left = np.trunc(xs - widths / 2)
+    top = np.trunc(ys - heights / 2)
+
+    u0 = (cells % atlas.columns) * atlas.cell_width / atlas.size
+    v0 = (cells // atlas.columns) * atlas.cell_height / atlas.size
+    du = widths * ratio / atlas.size
+    dv = heights * ratio / atlas.size
+
+    right, bottom = _QUAD_CORNERS[:, 0], _QUAD_CORNERS[:, 1]
+    vertices = np.empty((len(xs), 6, VERTEX_FLOATS), dtype=np.float32)
+    vertices[:, :, 0] = left[:, None] + right * widths[:, None]
+    vertices[:, :, 1] = top[:, None] + bottom * heights[:, None]
+    vertices[:, :, 2] = u0[:, None] + right * du[:, None]
+    vertices[:, :, 3] = v0[:, None] + bottom * dv[:, None]
+    vertices[:, :, 4] = opacity[:, None]
+    return vertices.reshape(-1, VERTEX_FLOATS)
+
+
+class GLHeartOverlay(OverlaySurface, QOpenGLWidget):
+    """全屏透明覆盖层（OpenGL 绘制）- 所有弹窗从图集取图，一次绘制调用完成"""
+
+    renderer = "opengl"
+
+    def __init__(self):
+        QOpenGLWidget.__init__(self)
+        self.setFormat(surface_format())
+        self._init_surface()
+
+        self._gl = None
+        self._program: Optional[QOpenGLShaderProgram] = None
+        self._buffer: Optional[QOpenGLBuffer] = None
+        self._texture: Optional[QOpenGLTexture] = None
+        self._atlas: Optional[TextureAtlas] = None
+        self._ratio = 1.0
+        self._attributes = (-1, -1, -1)
+        self.draw_calls = 0
+
+        logger.info("创建全屏覆盖层 (overlay 渲染模式, OpenGL 批量绘制)")
+
+    def initializeGL(self):
+        """创建着色器、顶点缓冲和图集纹理"""
+        self._gl = gl_functions(self.context())
+        self._program = build_program()
+        if self._gl is None or self._program is None:
+            logger.error("OpenGL 覆盖层初始化失败，弹窗将不会显示")
+            self._program = None
+            return
+
+        program = self._program
+        self._attributes = tuple(program.attributeLocation(name) for name in ("a_position", "a_texcoord", "a_opacity"))
+
+        self._buffer = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self._buffer.setUsagePattern(QOpenGLBuffer.StreamDraw)
+        self._buffer.create()
+
+        size = min(ATLAS_MAX_SIZE, self._gl.glGetIntegerv(GL_MAX_TEXTURE_SIZE))
+        texture = QOpenGLTexture(QOpenGLTexture.Target2D)
+        texture.setFormat(QOpenGLTexture.RGBA8_UNorm)
+        texture.setSize(size, size)
+        texture.setMinMagFilters(QOpenGLTexture.Nearest, QOpenGLTexture.Nearest)
+        texture.setWrapMode(QOpenGLTexture.ClampToEdge)
+        texture.allocateStorage(QOpenGLTexture.RGBA, QOpenGLTexture.UInt8)
+        self._texture = texture
+
+        self.context().aboutToBeDestroyed.connect(self._release_gl)
+        self._ensure_atlas()
+        logger.info(f"OpenGL 图集: {size}x{size}, {self._atlas.capacity} 个格子")
+
+    def _ensure_atlas(self):
+        """
+        按当前的弹窗尺寸模式和设备像素比划分图集格子（变化时清空图集）
+
+        格子按最大的弹窗尺寸划分，图像按物理像素渲染，绘制时一个纹素对应一个像素。
+        """
+        ratio = self.devicePixelRatioF()
+        cell_height = POPUP_MAX_HEIGHT if config.popup_size_mode == "content" else POPUP_HEIGHT
+        cell = (math.ceil(POPUP_WIDTH * ratio), math.ceil(cell_height * ratio))
+        atlas = self._atlas
+        if atlas is not None and ratio == self._ratio and (atlas.cell_width, atlas.cell_height) == cell:
+            return
+        self._ratio = ratio
+        self._atlas = TextureAtlas(self._texture.width(), *cell)
+
+    def _release_gl(self):
+        """上下文销毁前释放 OpenGL 资源"""
+        self.makeCurrent()
+        if self._texture is not None:
+            self._texture.destroy()
+        if self._buffer is not None:
+            self._buffer.destroy()
+        self._program = None
+        self.doneCurrent()
+
+    def paintGL(self):
+        """清空画面，按绘制顺序批量绘制所有弹窗"""
+        started = paint_timer()
+        gl = self._gl
+        if gl is None:
+            return
+        gl.glClearColor(0.0, 0.0, 0.0, 0.0)
+        gl.glClear(GL_COLOR_BUFFER_BIT)
+
+        if self.popups and self._program is not None:
+            self._ensure_atlas()
+            gl.glEnable(GL_BLEND)
+            gl.glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+            self._program.bind()
+            self._program.setUniformValue("u_viewport", float(self.width()), float(self.height()))
+            self._program.setUniformValue("u_atlas", 0)
+            self._texture.bind(0)
+            self._draw_popups()
+            self._texture.release()
+            self._program.release()
+
+        if started is not None:
+            frame_metrics.record_paint(time.perf_counter() - started)
+        startup_profiler.first_paint()
+
+    def _draw_popups(self):
+        """查找（必要时渲染）每个弹窗的图集格子，整批生成顶点后一次绘制"""
+        atlas = self._atlas
+        engine = self.popups[0].engine
+        antialiasing = popup_cache.antialiasing
+        rows, cells, widths, heights = [], [], [], []
+        batches = 1
+
+        atlas.begin_batch()
+        for popup in self.popups:
+            width, height = popup.popup_width, popup.popup_height
+            scale = quantize_scale(popup._current_scale)
+            key = (popup.color_theme['name'], popup.message, scale, width, height)
+
+            # 关闭抗锯齿期间继续使用已有的抗锯齿图像
+            cell = atlas.lookup(key + (True,))
+            if cell is None and not antialiasing:
+                cell = atlas.lookup(key + (False,))
+            if cell is None:
+                if atlas.full():
+                    self._draw_batch(engine, rows, cells, widths, heights)
+                    rows, cells, widths, heights = [], [], [], []
+                    atlas.begin_batch()
+                    batches += 1
+                image = render_popup_image(
+                    popup.color_theme, popup.message, popup_cache.font, scale,
+                    width, height, self._ratio, antialiasing
+                )
+                cell = atlas.insert(key + (antialiasing,), image)
+
+            rows.append(popup.row)
+            cells.append(cell)
+            widths.append(width)
+            heights.append(height)
+
+        self._draw_batch(engine, rows, cells, widths, heights)
+        if batches > 1 and log_allowed("gl-atlas-full", 10.0):
+            logger.warning(f"OpenGL 图集已满 ({atlas.capacity} 个格子)，本帧分 {batches} 批绘制")
+
+    def _upload(self):
+        """把新渲染的图像上传到图集纹理"""
+        atlas = self._atlas
+        for cell, image in atlas.uploads:
+            x, y = atlas.cell_origin(cell)
+            bits = image.constBits()
+            bits.setsize(image.sizeInBytes())
+            self._gl.glTexSubImage2D(
+                GL_TEXTURE_2D, 0, x, y, image.width(), image.height(),
+                GL_RGBA, GL_UNSIGNED_BYTE, np.frombuffer(bits, dtype=np.uint8)
+            )
+        atlas.uploaded += len(atlas.uploads)
+        atlas.uploads.clear()
+
+    def _draw_batch(self, engine, rows: list, cells: list, widths: list, heights: list):
+        """上传新图像，生成一批弹窗的顶点并用一次 glDrawArrays 绘制"""
+        if not rows:
+            return
+        self._upload()
+
+        rows = np.asarray(rows, dtype=np.intp)
+        vertices = build_quads(
+            engine.x[rows], engine.y[rows],
+            np.asarray(widths, dtype=np.float64), np.asarray(heights, dtype=np.float64),
+            engine.opacity[rows], np.asarray(cells, dtype=np.intp), self._atlas, self._ratio
+        )
+
+        program = self._program
+        stride = VERTEX_FLOATS * 4
+        self._buffer.bind()
+        self._buffer.allocate(vertices, vertices.nbytes)
+        for location, offset, size in zip(self._attributes, (0, 8, 16), (2, 2, 1)):
+            program.enableAttributeArray(location)
+            program.setAttributeBuffer(location, GL_FLOAT, offset, size, stride)
+        self._gl.glDrawArrays(GL_TRIANGLES, 0, len(vertices))
+        for location in self._attributes:
+            program.disableAttributeArray(location)
+        self._buffer.release()
+        self.draw_calls += 1
@@ -0,0 +1,220 @@
+"""
+全屏覆盖层渲染模式
+单个透明、无边框的全屏窗口绘制所有弹窗，替代 N 个独立的顶层窗口；
+绘制方式可选 QPainter（本模块）或 OpenGL 批量绘制（gl_overlay 模块）
+"""
+import time
+from typing import List, Sequence
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QPainter, QRegion
+from loguru import logger
+
+from config import config, log_allowed
+from heart_trajectory import HeartTrajectory
+from heart_window import PopupState
+from popup_engine import PopupEngine, STATE_PENDING, STATE_FADING_OUT, STATE_CLOSED
+from frame_metrics import frame_metrics, paint_timer
+from startup_profile import startup_profiler
+from popup_renderer import popup_cache
+from spatial_index import UniformGridIndex
+
+
+# 点击测试网格的单元边长（像素）
+HIT_CELL_SIZE = 64
+
+
+def united_rects(rects: Sequence[QRect]) -> QRegion:
+    """
+    多个矩形的并集（点击区域精确到弹窗矩形）
+
+    两两合并而不是逐个并入同一个区域：每次合并的开销与两个区域的矩形数成正比，
+    逐个合并的总开销随弹窗数量平方增长，两两合并只需 log N 轮。
+    """
+    regions = [QRegion(rect) for rect in rects]
+    if not regions:
+        return QRegion()
+    while len(regions) > 1:
+        merged = [a.united(b) for a, b in zip(regions[::2], regions[1::2])]
+        if len(regions) % 2:
+            merged.append(regions[-1])
+        regions = merged
+    return regions[0]
+
+
+class OverlayPopup(PopupState):
+    """覆盖层中的轻量弹窗 - 与 HeartWindow 共用动画引擎，但不对应原生窗口，位置直接读取引擎"""
+
+    def __init__(self, overlay: 'HeartOverlay', engine: PopupEngine, row: int, message: str,
+                 color_theme: dict, trajectory: HeartTrajectory):
+        """
+        初始化弹窗
+
+        Args:
+            overlay: 所属的全屏覆盖层
+            engine: 动画引擎
+            row: 弹窗在引擎中的行号
+            message: 要显示的关心语句
+            color_theme: 颜色主题字典
+            trajectory: 爱心轨迹对象
+        """
+        self.overlay = overlay
+        self._bind(engine, row, message, color_theme, trajectory)
+
+    @property
+    def x(self) -> int:
+        return int(self.engine.x[self.row] - self.popup_width / 2)
+
+    @property
+    def y(self) -> int:
+        return int(self.engine.y[self.row] - self.popup_height / 2)
+
+    def apply_position(self, x: float, y: float):
+        """位置由引擎维护，绘制时读取，这里无需处理"""
+
+    def rect(self) -> QRect:
+        """弹窗在覆盖层中的矩形"""
+        return QRect(self.x, self.y, self.popup_width, self.popup_height)
+
+    def is_visible(self) -> bool:
+        """是否需要绘制"""
+        return self.state not in (STATE_PENDING, STATE_CLOSED)
+
+    def show(self):
+        """由覆盖层在下一帧开始绘制，这里无需处理"""
+
+    def set_opacity(self, value: float):
+        """透明度由覆盖层绘制时读取（用缓存图像按该透明度贴图，不重新渲染内容），这里无需处理"""
+
+    def update(self):
+        """由覆盖层在每帧统一重绘，这里无需处理"""
+
+    def close(self):
+        """关闭弹窗（覆盖层在下一帧不再绘制它）"""
+        self.engine.close(self.row)
+        return True
+
+
+class OverlaySurface:
+    """
+    覆盖层的公共部分（QPainter 和 OpenGL 覆盖层共用）：弹窗管理、点击区域和点击测试
+
+    子类同时继承一个 QWidget 类，并实现 paintEvent / paintGL 绘制 self.popups。
+    """
+
+    def _init_surface(self):
+        """初始化覆盖层（在 QWidget 初始化之后调用）"""
+        self.popups: List[OverlayPopup] = []
+        # 上一帧的弹窗区域（用于计算重绘区域和点击区域）及对应的弹窗矩形
+        self._region = QRegion()
+        self._rects = None
+        # 点击测试用的空间索引（每帧增量更新）
+        self._index = UniformGridIndex(HIT_CELL_SIZE)
+
+        self.setWindowFlags(
+            Qt.WindowStaysOnTopHint |  # 置顶
+            Qt.FramelessWindowHint |    # 无边框
+            Qt.Tool                      # 工具窗口（不显示在任务栏）
+        )
+        self.setAttribute(Qt.WA_TranslucentBackground)  # 透明背景
+
+    def create_popup(self, engine: PopupEngine, row: int, message: str, color_theme: dict,
+                     trajectory: HeartTrajectory) -> OverlayPopup:
+        """在覆盖层中创建一个弹窗（显示引擎中的第 row 行）"""
+        return OverlayPopup(self, engine, row, message, color_theme, trajectory)
+
+    def sync(self, popups: List[OverlayPopup]):
+        """
+        帧时钟每帧调用一次：更新点击区域并重绘变化的区域
+
+        Args:
+            popups: 当前所有存活的弹窗（按绘制顺序）
+        """
+        self.popups = [p for p in popups if p.is_visible()]
+
+        index = self._index
+        for order, popup in enumerate(self.popups):
+            index.update(popup, popup.x, popup.y, popup.popup_width, popup.popup_height, order)
+        index.retain(set(self.popups))
+
+        if not self.popups:
+            if self.isVisible():
+                self.hide()
+                self._region = QRegion()
+                self._rects = None
+            return
+
+        # 点击穿透：只有弹窗矩形接收鼠标事件（弹窗之间的空隙点击到下层窗口）；
+        # 弹窗矩形不变的帧（只有透明度变化）不重建区域，也不重新设置遮罩
+        rects = [popup.rect() for popup in self.popups]
+        if rects != self._rects:
+            region = united_rects(rects)
+            self.setMask(region)
+            self._rects = rects
+        else:
+            region = self._region
+
+        if not self.isVisible():
+            self.show()
+
+        # 只重绘上一帧和本帧弹窗覆盖的区域
+        self.update(region.united(self._region))
+        self._region = region
+
+    def mousePressEvent(self, event):
+        """鼠标点击事件 - 点击关闭最上层的弹窗"""
+        if event.button() != Qt.LeftButton:
+            return
+
+        # 空间索引按绘制顺序返回命中的弹窗，第一个即最上层；已在淡出的弹窗不拦截点击
+        pos = event.pos()
+        for popup in self._index.query_point(pos.x(), pos.y()):
+            if popup.state not in (STATE_FADING_OUT, STATE_CLOSED):
+                if log_allowed("popup-click"):
+                    logger.info("用户点击关闭弹窗")
+                popup.fade_out_and_close()
+                return
+
+
+class HeartOverlay(OverlaySurface, QWidget):
+    """全屏透明覆盖层（QPainter 绘制）- 一次重绘完成所有弹窗，仅弹窗区域接收鼠标点击"""
+
+    renderer = "painter"
+
+    def __init__(self):
+        QWidget.__init__(self)
+        self._init_surface()
+        logger.info("创建全屏覆盖层 (overlay 渲染模式)")
+
+    def paintEvent(self, event):
+        """绘制所有弹窗"""
+        started = paint_timer()
+        painter = QPainter(self)
+        region = event.region()
+
+        for popup in self.popups:
+            rect = popup.rect()
+            if not region.intersects(rect):
+                continue
+
+            painter.setOpacity(popup._opacity)
+            painter.drawPixmap(rect.x(), rect.y(), popup_cache.get(
+                popup.color_theme, popup.message, popup._current_scale,
+                rect.width(), rect.height()
+            ))
+
+        painter.end()
+        if started is not None:
+            frame_metrics.record_paint(time.perf_counter() - started)
+        startup_profiler.first_paint()
+
+
+def create_overlay():
+    """按配置创建覆盖层：overlay_renderer 为 opengl 且 OpenGL 可用时使用批量绘制，否则使用 QPainter"""
+    if config.overlay_renderer == "opengl":
+        # 延迟导入：只有使用 OpenGL 时才加载相关模块
+        from gl_overlay import GLHeartOverlay, gl_available
+        if gl_available():
+            return GLHeartOverlay()
+        logger.warning("OpenGL 不可用，覆盖层退回 QPainter 绘制")
+    return HeartOverlay()
@@ -2,11 +2,25 @@
 爱心轨迹计算模块
 使用参数方程生成心形曲线
 """
+import math
 import numpy as np
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 from loguru import logger
 
 
+# 脉动缩放：scale = PULSE_BASE + PULSE_AMPLITUDE * |sin(2π·progress)|
+PULSE_BASE = 0.98
+PULSE_AMPLITUDE = 0.04
+
+# 批量查询时，数量不超过该值走纯 Python 路径（避免 NumPy 的调用开销）
+BATCH_THRESHOLD = 8
+
+
+def pulse_scale(progress: float) -> float:
+    """计算进度对应的脉动缩放系数"""
+    return PULSE_BASE + PULSE_AMPLITUDE * abs(math.sin(progress * 2 * math.pi))
+
+
 class HeartTrajectory:
     """爱心轨迹生成器"""
     
@@ -23,23 +37,30 @@ class HeartTrajectory:
         self.center_x = center_x
         self.center_y = center_y
         self.points = []
+        self.length = 0.0
         
-        logger.debug(f"创建爱心轨迹: scale={scale}, center=({center_x}, {center_y})")
+        logger.debug("创建爱心轨迹: scale={}, center=({}, {})", scale, center_x, center_y)
         
-    def generate_points(self, num_points: int = 360) -> List[Tuple[float, float]]:
+    def generate_points(self, num_points: int = 360, samples_per_point: int = 8) -> List[Tuple[float, float]]:
         """
-        生成爱心曲线上的点
+        生成爱心曲线上按弧长等距分布的点
         使用参数方程：
         x(t) = 16*sin³(t)
         y(t) = 13*cos(t) - 5*cos(2t) - 2*cos(3t) - cos(4t)
         
+        参数 t 均匀采样时，曲线在两瓣处点稀、在尖端和凹口处点密，
+        因此先密集采样建立累计弧长表，再按弧长等距重采样，
+        使进度值与走过的路程成正比（匀速运动）。
+        
         Args:
-            num_points: 生成点的数量（越多越平滑）
+            num_points: 存储的轨迹点数量（查询时在相邻点之间线性插值）
+            samples_per_point: 建立弧长表时每个存储点对应的采样数（越大弧长越精确）
             
         Returns:
             List[Tuple[float, float]]: 坐标点列表 [(x, y), ...]
         """
-        t = np.linspace(0, 2 * np.pi, num_points)
+        num_samples = num_points * samples_per_point
+        t = np.linspace(0, 2 * np.pi, num_samples + 1)
         
         # 爱心参数方程
         x = 16 * np.sin(t) ** 3
@@ -52,15 +73,40 @@ class HeartTrajectory:
         x = x * self.scale / 16
         y = y * self.scale / 16
         
-        # 转换为坐标点列表
-        self.points = [(float(xi), float(yi)) for xi, yi in zip(x, y)]
+        # 累计弧长表
+        arc_length = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+        self.length = float(arc_length[-1])
+        
+        # 按弧长等距重采样（闭合曲线，最后一个点与起点重合）
+        targets = np.linspace(0, self.length, num_points + 1)
+        self._xs = np.interp(targets, arc_length, x)
+        self._ys = np.interp(targets, arc_length, y)
         
-        logger.debug(f"生成了 {len(self.points)} 个轨迹点")
+        # 转换为坐标点列表（不含重复的闭合点）
+        self.points = [(float(xi), float(yi)) for xi, yi in zip(self._xs[:-1], self._ys[:-1])]
+        
+        logger.debug("生成了 {} 个轨迹点, 轨迹长度 {:.0f}", len(self.points), self.length)
         return self.points
     
+    def export_points(self) -> Tuple[List[float], List[float], float]:
+        """
+        导出 generate_points() 的结果（保存到启动快照）
+        
+        Returns:
+            Tuple: (xs, ys, 轨迹长度)，坐标不含中心偏移，末尾带闭合点
+        """
+        return self._xs.tolist(), self._ys.tolist(), self.length
+    
+    def load_points(self, xs: Sequence[float], ys: Sequence[float], length: float):
+        """恢复 export_points() 导出的轨迹点，不重新采样"""
+        self._xs = np.asarray(xs, dtype=np.float64)
+        self._ys = np.asarray(ys, dtype=np.float64)
+        self.length = length
+        self.points = list(zip(xs[:-1], ys[:-1]))
+    
     def get_point_at_progress(self, progress: float) -> Tuple[float, float]:
         """
-        根据进度获取轨迹上的点
+        根据进度获取轨迹上的点（按弧长匀速，相邻点之间线性插值）
         
         Args:
             progress: 进度值 (0.0 到 1.0)
@@ -71,14 +117,22 @@ class HeartTrajectory:
         if not self.points:
             self.generate_points()
         
+        points = self.points
+        count = len(points)
+        
         # 确保进度在有效范围内
-        progress = progress % 1.0
+        position = (progress % 1.0) * count
         
-        # 计算索引
-        index = int(progress * len(self.points))
-        index = min(index, len(self.points) - 1)
+        # 计算相邻两个点及插值比例
+        index = int(position)
+        if index >= count:
+            index = count - 1
+        frac = position - index
         
-        x, y = self.points[index]
+        x0, y0 = points[index]
+        x1, y1 = points[(index + 1) % count]
+        x = x0 + (x1 - x0) * frac
+        y = y0 + (y1 - y0) * frac
         
         # 添加中心偏移
         if self.center_x is not None and self.center_y is not None:
@@ -87,6 +141,49 @@ class HeartTrajectory:
         
         return (x, y)
     
+    def get_points_and_scales(self, progresses: Sequence[float]) -> Tuple[Sequence[float], Sequence[float], Sequence[float]]:
+        """
+        批量获取多个进度对应的坐标和脉动缩放系数（所有弹窗一次查询）
+        
+        数量较少时逐个计算（纯 Python 更快），否则使用一次向量化计算。
+        
+        Args:
+            progresses: 进度值序列
+            
+        Returns:
+            Tuple: (xs, ys, scales) 三个等长序列
+        """
+        if not self.points:
+            self.generate_points()
+        
+        if len(progresses) <= BATCH_THRESHOLD:
+            xs, ys, scales = [], [], []
+            for progress in progresses:
+                x, y = self.get_point_at_progress(progress)
+                xs.append(x)
+                ys.append(y)
+                scales.append(pulse_scale(progress))
+            return xs, ys, scales
+        
+        progress = np.mod(np.asarray(progresses, dtype=np.float64), 1.0)
+        count = len(self.points)
+        
+        # 相邻两个点及插值比例（_xs/_ys 末尾带有闭合点，index + 1 不会越界）
+        position = progress * count
+        index = np.minimum(position.astype(np.intp), count - 1)
+        frac = position - index
+        
+        xs = self._xs[index] + (self._xs[index + 1] - self._xs[index]) * frac
+        ys = self._ys[index] + (self._ys[index + 1] - self._ys[index]) * frac
+        
+        # 添加中心偏移
+        if self.center_x is not None and self.center_y is not None:
+            xs += self.center_x
+            ys += self.center_y
+        
+        scales = PULSE_BASE + PULSE_AMPLITUDE * np.abs(np.sin(progress * 2 * np.pi))
+        return xs, ys, scales
+    
     def get_screen_center_position(self, screen_width: int, screen_height: int,
                                    offset_x: int = 0, offset_y: int = 0) -> Tuple[float, float]:
         """
@@ -103,14 +200,14 @@ class HeartTrajectory:
         """
         center_x = screen_width / 2 + offset_x
         center_y = screen_height / 2 + offset_y
-        logger.debug(f"屏幕中心位置: ({center_x}, {center_y})")
+        logger.debug("屏幕中心位置: ({}, {})", center_x, center_y)
         return (center_x, center_y)
     
     def set_center(self, center_x: float, center_y: float):
         """设置轨迹中心位置"""
         self.center_x = center_x
         self.center_y = center_y
-        logger.debug(f"设置轨迹中心: ({center_x}, {center_y})")
+        logger.debug("设置轨迹中心: ({}, {})", center_x, center_y)
     
     def get_random_offset_trajectory(self, max_offset: int = 200) -> 'HeartTrajectory':
         """
@@ -135,7 +232,7 @@ class HeartTrajectory:
         )
         new_trajectory.generate_points()
         
-        logger.debug(f"创建随机偏移轨迹: offset=({offset_x}, {offset_y})")
+        logger.debug("创建随机偏移轨迹: offset=({}, {})", offset_x, offset_y)
         return new_trajectory
 
 
@@ -152,3 +249,7 @@ if __name__ == '__main__':
     for progress in [0.0, 0.25, 0.5, 0.75, 1.0]:
         point = trajectory.get_point_at_progress(progress)
         print(f"进度 {progress}: 坐标 {point}")
+    
+    # 测试批量查询
+    xs, ys, scales = trajectory.get_points_and_scales(np.linspace(0, 1, 30, endpoint=False))
+    print(f"批量查询 {len(xs)} 个点: 首点 ({xs[0]:.1f}, {ys[0]:.1f}), 缩放 {scales[0]:.3f}")
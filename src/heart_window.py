@@ -2,52 +2,174 @@
 爱心弹窗组件
 透明、无边框、美观的弹窗实现
 """
+import math
 import random
-import numpy as np
+import time
+from collections import deque
 from pathlib import Path
-from typing import List
-from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout
-from PyQt5.QtCore import Qt, QTimer, pyqtProperty
-from PyQt5.QtGui import QPainter, QLinearGradient, QColor, QPainterPath, QFont
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from PyQt5.QtWidgets import QWidget, QApplication
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QPainter
 from loguru import logger
 
-from config import config, BUILTIN_COLOR_THEMES
+from config import config, log_allowed, BUILTIN_COLOR_THEMES, MAX_WINDOWS_POPUPS
 from heart_trajectory import HeartTrajectory
+from frame_metrics import frame_metrics, paint_timer
+from message_store import open_message_store, ListMessageStore
+from message_rotation import MessagePrefetcher
+from startup_profile import startup_profiler
+from startup_snapshot import startup_snapshot
+from popup_layout import choose_heart_scale, ring_counts
+from popup_renderer import popup_cache, popup_size, POPUP_WIDTH, POPUP_HEIGHT, SCALE_STEP
+from popup_engine import PopupEngine, FrameUpdate, STATE_FADING_OUT, STATE_CLOSED, FADE_DURATION
+from quality_governor import (
+    QualityGovernor, QUALITY_NO_PULSE, QUALITY_NO_ANTIALIAS, QUALITY_LOW_FPS, QUALITY_FEWER_POPUPS
+)
 
 
-class HeartWindow(QWidget):
+# 弹窗依次出现的间隔（毫秒）；弹窗很多时压缩间隔，全部出现的总时长不超过 STARTUP_SPREAD_MS
+STAGGER_MS = 150
+STARTUP_SPREAD_MS = 7500
+
+# 超过该数量时关闭脉动缩放（每个弹窗只需一张缓存图像，而不是每个缩放档位一张）
+PULSE_MAX_POPUPS = 100
+PULSE_BUCKETS = 5
+
+# 弹窗在预定出现时刻前多久构建（秒）；每帧构建弹窗的时间预算（秒，每帧至少构建一个）
+SPAWN_LEAD = 0.25
+SPAWN_BUDGET = 0.004
+
+# 每帧最多更换语句的弹窗数（更换后弹窗图像需要重新渲染）
+ROTATE_MAX_PER_FRAME = 8
+
+# 热重载减少弹窗时，超过该数量不再逐个挑选最拥挤的弹窗
+SELECT_GREEDY_LIMIT = 500
+
+# 是否使用原生窗口透明度做淡入淡出（首次创建窗口时检测，fade_mode 修改后重新检测）
+_native_opacity = None
+
+
+def native_opacity_supported() -> bool:
+    """
+    当前平台是否可以由合成器处理窗口透明度
+    
+    使用原生窗口透明度时，淡入淡出只需修改窗口属性，不重绘内容。
+    Windows/macOS 始终有合成器；X11 需要运行合成管理器；
+    Wayland 和无界面平台不支持 setWindowOpacity，退回重绘方式。
+    """
+    global _native_opacity
+    if _native_opacity is not None:
+        return _native_opacity
+    
+    mode = config.fade_mode
+    platform = QApplication.platformName()
+    if mode == "repaint":
+        supported = False
+    elif platform in ("windows", "cocoa"):
+        supported = True
+    elif platform == "xcb":
+        try:
+            from PyQt5.QtX11Extras import QX11Info
+            supported = QX11Info.isCompositingManagerRunning()
+        except ImportError:
+            supported = False
+    else:
+        supported = False
+    
+    if mode == "compositor" and not supported:
+        logger.warning(f"平台 {platform} 未检测到合成器，淡入淡出退回重绘方式")
+    
+    _native_opacity = supported
+    logger.info(f"淡入淡出方式: {'窗口透明度（合成器）' if supported else '重绘'} (平台: {platform})")
+    return supported
+
+
+def reset_native_opacity():
+    """清除检测结果（fade_mode 修改后，下次调用 native_opacity_supported() 时重新检测）"""
+    global _native_opacity
+    _native_opacity = None
+
+
+class PopupState:
+    """
+    弹窗显示层（HeartWindow 与覆盖层弹窗共用）
+    
+    动画状态存放在管理器的 PopupEngine 中（第 row 行），由统一帧时钟向量化推进；
+    弹窗只读取状态并负责显示，不修改进度、透明度等动画数据。
+    """
+    
+    def _bind(self, engine: PopupEngine, row: int, message: str, color_theme: dict,
+              trajectory: HeartTrajectory):
+        """绑定到引擎中的一行"""
+        self.engine = engine
+        self.row = row
+        self.message = message
+        self.popup_width, self.popup_height = popup_size(message)
+        self.color_theme = color_theme
+        self.trajectory = trajectory
+        self.slot = 0            # 由管理器设置：决定消息和颜色主题的序号
+    
+    @property
+    def state(self) -> int:
+        return int(self.engine.state[self.row])
+    
+    @property
+    def progress(self) -> float:
+        return float(self.engine.progress[self.row])
+    
+    @property
+    def _opacity(self) -> float:
+        return float(self.engine.opacity[self.row])
+    
+    @property
+    def _current_scale(self) -> float:
+        return float(self.engine.scale[self.row])
+    
+    def set_message(self, message: str):
+        """更换显示的语句（热重载），动画状态保持不变"""
+        self.message = message
+        self.popup_width, self.popup_height = popup_size(message)
+        # 尺寸可能变化，按当前位置重新居中
+        self.apply_position(self.engine.x[self.row], self.engine.y[self.row])
+        self.update()
+    
+    def _start_animation(self):
+        """引擎进入淡入阶段：按当前透明度显示"""
+        self.set_opacity(self._opacity)
+        self.show()
+    
+    def fade_out_and_close(self):
+        """淡出并关闭（淡出过程由管理器的帧时钟推进；尚未显示的直接关闭）"""
+        if self.engine.fade_out(self.row, time.monotonic()):
+            self.close()
+
+
+class HeartWindow(PopupState, QWidget):
     """爱心弹窗类"""
     
-    def __init__(self, message: str, color_theme: dict, trajectory: HeartTrajectory,
-                 start_progress: float, start_delay: int = 0):
+    def __init__(self, engine: PopupEngine, row: int, message: str, color_theme: dict,
+                 trajectory: HeartTrajectory):
         """
         初始化弹窗
         
         Args:
+            engine: 动画引擎
+            row: 弹窗在引擎中的行号（起始进度、启动时刻已由管理器写入）
             message: 要显示的关心语句
             color_theme: 颜色主题字典
             trajectory: 爱心轨迹对象
-            start_progress: 起始进度位置 (0.0-1.0)
-            start_delay: 启动延迟（毫秒）
         """
-        super().__init__()
+        QWidget.__init__(self)
+        self._bind(engine, row, message, color_theme, trajectory)
+        self._native_opacity = native_opacity_supported()
         
-        self.message = message
-        self.color_theme = color_theme
-        self.trajectory = trajectory
-        self.progress = start_progress
-        self._opacity = 0.0
-        self._current_scale = 1.0
-        self.start_delay = start_delay
+        # 日志参数延迟格式化：级别低于 DEBUG 时不构造消息字符串
+        logger.debug("创建弹窗: message='{:.10}...', start_progress={:.2f}", message, self.progress)
         
-        logger.debug(f"创建弹窗: message='{message[:10]}...', start_progress={start_progress:.2f}")
-        
-        # 初始化UI
+        # 初始化UI（动画由管理器的统一帧时钟驱动，窗口本身不持有定时器）
         self._init_ui()
         
-        # 初始化动画定时器
-        self._init_animation()
-        
     def _init_ui(self):
         """初始化用户界面"""
         # 设置窗口属性
@@ -57,148 +179,137 @@ class HeartWindow(QWidget):
             Qt.Tool                      # 工具窗口（不显示在任务栏）
         )
         self.setAttribute(Qt.WA_TranslucentBackground)  # 透明背景
-        self.setAttribute(Qt.WA_DeleteOnClose)
+        # 关闭时只隐藏，由 HeartWindowPool 回收复用或显式销毁
         
-        # 固定窗口大小（稍微大一点，方便阅读）
-        self.setFixedSize(320, 120)
-        
-        # 创建布局
-        layout = QVBoxLayout()
-        layout.setContentsMargins(18, 18, 18, 18)
-        
-        # 创建文本标签
-        self.label = QLabel(self.message)
-        self.label.setAlignment(Qt.AlignCenter)
-        self.label.setWordWrap(True)
-        
-        # 设置字体
-        font = QFont("Microsoft YaHei", 14, QFont.Bold)
-        self.label.setFont(font)
-        self.label.setStyleSheet(f"color: {self.color_theme['text']}; background: transparent;")
-        
-        layout.addWidget(self.label)
-        self.setLayout(layout)
+        # 固定窗口大小（固定尺寸或按文本排版的尺寸）
+        self.setFixedSize(self.popup_width, self.popup_height)
         
         # 初始位置（在轨迹起点）
-        x, y = self.trajectory.get_point_at_progress(self.progress)
-        self.move(int(x - 160), int(y - 60))
-        
-    def _init_animation(self):
-        """初始化动画"""
-        # 运动动画定时器
-        self.animation_timer = QTimer(self)
-        self.animation_timer.timeout.connect(self._update_position)
-        
-        # 淡入动画定时器
-        self.fade_in_timer = QTimer(self)
-        self.fade_in_timer.timeout.connect(self._fade_in)
-        
-        # 延迟启动
-        if self.start_delay > 0:
-            QTimer.singleShot(self.start_delay, self._start_animation)
-        else:
-            self._start_animation()
+        self.apply_position(self.engine.x[self.row], self.engine.y[self.row])
+        
+    def rebind(self, engine: PopupEngine, row: int, message: str, color_theme: dict,
+               trajectory: HeartTrajectory):
+        """复用窗口：绑定到新的一行和内容（窗口保持隐藏，直到帧时钟启动它）"""
+        self._bind(engine, row, message, color_theme, trajectory)
+        self.setFixedSize(self.popup_width, self.popup_height)
+        self.apply_position(self.engine.x[self.row], self.engine.y[self.row])
     
-    def _start_animation(self):
-        """启动动画"""
-        self.show()
-        self.fade_in_timer.start(20)
-        
-    def _fade_in(self):
-        """淡入效果"""
-        self._opacity += 0.05
-        if self._opacity >= 0.95:
-            self._opacity = 0.95
-            self.fade_in_timer.stop()
-            # 淡入完成后开始运动
-            self.animation_timer.start(16)  # 约60fps
-        self.update()
+    def set_message(self, message: str):
+        """更换显示的语句，窗口按新的尺寸调整"""
+        PopupState.set_message(self, message)
+        self.setFixedSize(self.popup_width, self.popup_height)
     
-    def _update_position(self):
-        """更新窗口位置和动画效果"""
-        # 更新进度（速度稍慢，方便看清内容）
-        self.progress += 1.0 / 1500  # 25秒完成一圈
-        
-        if self.progress >= 1.0:
-            self.progress = self.progress % 1.0
-        
-        # 获取新位置
-        x, y = self.trajectory.get_point_at_progress(self.progress)
-        
-        # 轻微的脉动缩放效果
-        scale_factor = 0.98 + 0.04 * abs(np.sin(self.progress * 2 * np.pi))
-        self._current_scale = scale_factor
-        
-        # 移动窗口
-        self.move(int(x - 160), int(y - 60))
+    def apply_position(self, x: float, y: float):
+        """将窗口中心移动到轨迹坐标 (x, y)"""
+        self.move(int(x - self.popup_width / 2), int(y - self.popup_height / 2))
+    
+    def set_native_opacity(self, enabled: bool):
+        """切换淡入淡出方式（热重载 fade_mode）"""
+        self._native_opacity = enabled
+        if self.isVisible():
+            # 重绘方式下窗口本身保持不透明，由 paintEvent 按引擎透明度绘制
+            self.setWindowOpacity(self._opacity if enabled else 1.0)
+            self.update()
+        else:
+            # 隐藏的窗口（含复用池中的窗口）显示时由 _start_animation 设置透明度
+            self.setWindowOpacity(1.0)
+    
+    def set_opacity(self, value: float):
+        """显示引擎计算的透明度：有合成器时修改窗口透明度（无需重绘），否则重绘"""
+        if self._native_opacity:
+            self.setWindowOpacity(value)
+        else:
+            self.update()
     
     def paintEvent(self, event):
-        """绘制窗口背景（圆角矩形 + 渐变）"""
+        """绘制弹窗（贴上预渲染的背景和文本）"""
+        started = paint_timer()
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setOpacity(self._opacity)
-        
-        # 应用缩放
-        if self._current_scale != 1.0:
-            painter.save()
-            center_x = self.width() / 2
-            center_y = self.height() / 2
-            painter.translate(center_x, center_y)
-            painter.scale(self._current_scale, self._current_scale)
-            painter.translate(-center_x, -center_y)
-        
-        # 创建圆角矩形路径
-        path = QPainterPath()
-        path.addRoundedRect(0, 0, self.width(), self.height(), 15, 15)
-        
-        # 创建线性渐变
-        gradient = QLinearGradient(0, 0, 0, self.height())
-        gradient.setColorAt(0, QColor(self.color_theme['bg_start']))
-        gradient.setColorAt(1, QColor(self.color_theme['bg_end']))
-        
-        # 填充背景
-        painter.fillPath(path, gradient)
-        
-        # 绘制边框
-        painter.setPen(QColor(self.color_theme['shadow']))
-        painter.drawPath(path)
-        
-        if self._current_scale != 1.0:
-            painter.restore()
-        
+        if not self._native_opacity:
+            painter.setOpacity(self._opacity)
+        painter.drawPixmap(0, 0, popup_cache.get(
+            self.color_theme, self.message, self._current_scale,
+            self.width(), self.height()
+        ))
         painter.end()
-    
-    def fade_out_and_close(self):
-        """淡出并关闭窗口"""
-        if hasattr(self, 'animation_timer'):
-            self.animation_timer.stop()
-        self.fade_out_timer = QTimer(self)
-        self.fade_out_timer.timeout.connect(self._fade_out)
-        self.fade_out_timer.start(20)
-    
-    def _fade_out(self):
-        """淡出效果"""
-        self._opacity -= 0.05
-        if self._opacity <= 0:
-            self._opacity = 0
-            self.fade_out_timer.stop()
-            self.close()
-        self.update()
+        if started is not None:
+            frame_metrics.record_paint(time.perf_counter() - started)
+        startup_profiler.first_paint()
     
     def mousePressEvent(self, event):
         """鼠标点击事件 - 点击关闭"""
         if event.button() == Qt.LeftButton:
-            logger.info(f"用户点击关闭弹窗")
+            if log_allowed("popup-click"):
+                logger.info("用户点击关闭弹窗")
             self.fade_out_and_close()
+
+
+class HeartWindowPool:
+    """HeartWindow 复用池 - 关闭的窗口隐藏后回收，重新显示时只需重新绑定内容"""
+    
+    def __init__(self, max_size: int, idle_trim_seconds: float):
+        """
+        初始化复用池
+        
+        Args:
+            max_size: 最多保留的空闲窗口数
+            idle_trim_seconds: 空闲多久后销毁池中所有窗口（0 表示不清理）
+        """
+        self.max_size = max_size
+        self.idle: List[HeartWindow] = []
+        self.created = 0
+        self.reused = 0
+        
+        # 空闲清理定时器（单次触发，每次回收窗口时重新计时）
+        self.trim_timer = QTimer()
+        self.trim_timer.setSingleShot(True)
+        self.trim_timer.timeout.connect(self.trim)
+        self.idle_trim_ms = int(idle_trim_seconds * 1000)
     
-    @pyqtProperty(float)
-    def opacity(self):
-        return self._opacity
+    def acquire(self, engine: PopupEngine, row: int, message: str, color_theme: dict,
+                trajectory: HeartTrajectory) -> HeartWindow:
+        """取出一个窗口（优先复用空闲窗口）"""
+        self.trim_timer.stop()
+        
+        if self.idle:
+            window = self.idle.pop()
+            window.rebind(engine, row, message, color_theme, trajectory)
+            self.reused += 1
+            return window
+        
+        self.created += 1
+        return HeartWindow(engine, row, message, color_theme, trajectory)
     
-    @opacity.setter
-    def opacity(self, value):
-        self._opacity = value
-        self.update()
+    def release(self, window: HeartWindow):
+        """回收已关闭的窗口（池满时销毁）"""
+        window.hide()
+        if len(self.idle) >= self.max_size:
+            window.deleteLater()
+            return
+        
+        self.idle.append(window)
+        if self.idle_trim_ms > 0:
+            self.trim_timer.start(self.idle_trim_ms)
+    
+    def set_idle_trim(self, idle_trim_seconds: float):
+        """修改空闲清理时间（热重载），按新的时间重新计时"""
+        self.idle_trim_ms = int(idle_trim_seconds * 1000)
+        if self.idle_trim_ms > 0 and self.idle:
+            self.trim_timer.start(self.idle_trim_ms)
+        else:
+            self.trim_timer.stop()
+    
+    def trim(self, keep: int = 0):
+        """销毁空闲窗口，只保留 keep 个"""
+        if len(self.idle) <= keep:
+            return
+        logger.info(f"弹窗复用池清理: 销毁 {len(self.idle) - keep} 个空闲窗口")
+        while len(self.idle) > keep:
+            self.idle.pop().deleteLater()
+    
+    def log_stats(self):
+        """输出复用统计到日志"""
+        logger.info(f"弹窗复用池: 空闲 {len(self.idle)}/{self.max_size}, 新建 {self.created}, 复用 {self.reused}")
 
 
 class HeartWindowManager:
@@ -206,20 +317,70 @@ class HeartWindowManager:
     
     def __init__(self):
         self.windows: List[HeartWindow] = []
-        self.messages: List[str] = []
+        # 所有弹窗的动画状态（数组结构体），弹窗只负责显示；行号 -> 弹窗
+        self.engine = PopupEngine(scale_step=SCALE_STEP)
+        self._views: Dict[int, PopupState] = {}
+        self.messages: Sequence[str] = ListMessageStore([])
+        # 语句轮换：后台线程预取并排版接下来要显示的语句
+        self.rotation = MessagePrefetcher()
+        # 正在淡出、已从 windows 中移除的弹窗
+        self._closing: List[HeartWindow] = []
+        # overlay 渲染模式下的全屏覆盖层（按需创建）及创建时配置的绘制方式
+        self._overlay = None
+        self._overlay_renderer = config.overlay_renderer
+        # 当前布局的轨迹（由外向内）和屏幕尺寸，热重载增删弹窗时使用
+        self.trajectories: List[HeartTrajectory] = []
+        self.screen_size = (0, 0)
+        # 下一个新弹窗的序号（决定消息和颜色主题）
+        self._next_slot = 0
+        # 待构建的弹窗：(时间基准, 序号, 轨迹, 起始进度, 启动延迟)，由帧时钟在出现前逐个构建
+        self._spawn_queue = deque()
+        # 本批弹窗的启动统计（首个/全部弹窗显示耗时、构建耗时）
+        self._batch_start = 0.0
+        self._batch_total = 0
+        self._batch_shown = 0
+        self._build_time = 0.0
+        self._build_peak = 0.0
+        # 帧时钟启动/停止时通知（参数为是否进入空闲），用于暂停其他定时器
+        self.on_idle_changed: Optional[Callable[[bool], None]] = None
+        # 弹窗数量较少时启用脉动缩放
+        self.pulse_enabled = True
+        # 用户要求的弹窗数量（画质调节器减少弹窗时实际显示的更少）
+        self.requested_popups = 0
+        # 自适应画质：机器跟不上时逐级降级，余量恢复后逐级恢复
+        self.governor = QualityGovernor(self._on_quality_changed)
+        # windows 渲染模式下的窗口复用池
+        self.pool = HeartWindowPool(config.window_pool_size, config.window_pool_idle_trim)
+        
+        # 统一帧时钟：每帧一次性推进所有弹窗的进度、透明度和缩放
+        # （动画按单调时钟计算，定时器只决定采样频率）
+        self.frame_timer = QTimer()
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self._on_frame)
+        
         logger.info("弹窗管理器初始化")
         
     def load_messages(self, file_path: Path):
         """从文件加载关心语句"""
+        # 预取线程读取的是旧的语句存储，关闭前先停止
+        self.rotation.stop()
         try:
             if not file_path.exists():
                 logger.error(f"消息文件不存在: {file_path}")
                 self._use_default_messages()
                 return
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                self.messages = [line.strip() for line in f if line.strip()]
+            # 大文件使用内存映射，只解码实际显示的语句
+            threshold = int(config.messages_mmap_threshold_mb * 1024 * 1024)
+            messages = open_message_store(file_path, threshold)
+            if len(messages) == 0:
+                messages.close()
+                logger.error(f"消息文件为空: {file_path}")
+                self._use_default_messages()
+                return
             
+            self.messages.close()
+            self.messages = messages
             logger.success(f"成功加载 {len(self.messages)} 条关心语句")
             
         except Exception as e:
@@ -228,10 +389,11 @@ class HeartWindowManager:
     
     def _use_default_messages(self):
         """使用默认语句"""
-        self.messages = [
+        self.messages.close()
+        self.messages = ListMessageStore([
             "记得按时吃饭哦 💖", "今天也要开心呀 ✨", "累了就休息一下吧 🌟",
             "你真的很棒 💕", "别忘了多喝水 💧", "要好好照顾自己 ❤️"
-        ]
+        ])
         logger.warning(f"使用默认语句，共 {len(self.messages)} 条")
     
     def create_windows(self, screen_width: int, screen_height: int, num_popups: int):
@@ -243,51 +405,520 @@ class HeartWindowManager:
             screen_height: 屏幕高度
             num_popups: 弹窗数量
         """
-        logger.info(f"开始创建 {num_popups} 个弹窗，均匀分布在爱心轨迹上")
+        if config.render_mode == "windows" and num_popups > MAX_WINDOWS_POPUPS:
+            logger.warning(f"windows 渲染模式最多 {MAX_WINDOWS_POPUPS} 个弹窗，更多弹窗请使用 overlay 模式")
+            num_popups = MAX_WINDOWS_POPUPS
+        self.requested_popups = num_popups
+        num_popups = self.governor.popup_count(num_popups)
+        
+        logger.info(f"开始创建 {num_popups} 个弹窗，均匀分布在爱心轨迹上 (渲染模式: {config.render_mode})")
         
         # 创建更大的轨迹（屏幕中心，增大scale）
         # 根据屏幕大小动态调整
         scale = min(screen_width, screen_height) * 0.25  # 使用屏幕尺寸的25%
-        trajectory = HeartTrajectory(scale=scale)
         center_x = screen_width / 2
         center_y = screen_height / 2
-        trajectory.set_center(center_x, center_y)
-        trajectory.generate_points()
+        # 同心爱心：由外向内逐圈缩小
+        ring_factors = [1 - ring * config.heart_ring_spacing for ring in range(config.heart_rings)]
         
-        logger.info(f"爱心轨迹: scale={scale:.0f}, center=({center_x:.0f}, {center_y:.0f})")
+        # 屏幕和布局参数与上次启动相同时，直接使用启动快照中的爱心大小和轨迹点
+        layout_key = (
+            screen_width, screen_height, num_popups, config.heart_rings, config.heart_ring_spacing,
+            config.layout_mode, config.trajectory_points
+        )
+        cached = startup_snapshot.layout(layout_key)
+        if cached is not None:
+            scale, rings = cached
+        elif config.layout_mode == "spread":
+            # 在屏幕范围内放大爱心，拉开弹窗间距以减少重叠
+            scale, _, _ = choose_heart_scale(
+                screen_width, screen_height, scale, num_popups, ring_factors,
+                POPUP_WIDTH, POPUP_HEIGHT, config.trajectory_points
+            )
         
-        # 计算每个弹窗的起始位置（均匀分布，避免重叠）
-        for i in range(num_popups):
-            # 均匀分布的进度值
-            start_progress = i / num_popups
-            
-            # 循环选择消息
-            message = self.messages[i % len(self.messages)]
-            
-            # 循环选择颜色主题
-            color_theme = BUILTIN_COLOR_THEMES[i % len(BUILTIN_COLOR_THEMES)]
-            
+        trajectories = []
+        for ring, factor in enumerate(ring_factors):
+            trajectory = HeartTrajectory(scale=scale * factor)
+            trajectory.set_center(center_x, center_y)
+            if cached is not None:
+                trajectory.load_points(*rings[ring])
+            else:
+                trajectory.generate_points(config.trajectory_points)
+            trajectories.append(trajectory)
+        if cached is None:
+            startup_snapshot.set_layout(layout_key, scale, [t.export_points() for t in trajectories])
+        
+        logger.info(
+            f"爱心轨迹: scale={scale:.0f}, center=({center_x:.0f}, {center_y:.0f}), "
+            f"{len(trajectories)} 圈"
+        )
+        
+        self._configure_cache(num_popups)
+        
+        stagger = min(STAGGER_MS, STARTUP_SPREAD_MS / num_popups)
+        self.trajectories = trajectories
+        self.screen_size = (screen_width, screen_height)
+        
+        # 计算每个弹窗的起始位置（均匀分布，避免重叠）；
+        # 弹窗不在这里构建，而是由帧时钟在各自出现前 SPAWN_LEAD 秒逐个构建
+        now = time.monotonic()
+        self._spawn_queue.clear()
+        for i, (trajectory, start_progress) in enumerate(self._layout(trajectories, num_popups)):
             # 启动延迟（让弹窗依次出现，更舒缓）
-            start_delay = i * 150  # 每个延迟150ms
+            start_delay = int(i * stagger)
+            self._spawn_queue.append((now, i, trajectory, start_progress, start_delay))
+        
+        self._next_slot = num_popups
+        # 轮换从布局未用到的下一条语句开始
+        self.rotation.position = num_popups
+        self._start_rotation()
+        self._batch_start = now
+        self._batch_total = num_popups
+        self._batch_shown = 0
+        self._build_time = 0.0
+        self._build_peak = 0.0
+        
+        # 立即构建即将出现的弹窗，首个弹窗在下一帧就能显示
+        self._spawn_due(now)
+        self._ensure_clock_running()
+        logger.success(f"弹窗布局完成，{num_popups} 个弹窗将在出现前依次构建")
+    
+    def _spawn_due(self, now: float, budget: float = SPAWN_BUDGET):
+        """构建即将出现的弹窗（受每帧时间预算限制，至少构建一个）"""
+        queue = self._spawn_queue
+        if not queue:
+            return
+        
+        started = time.perf_counter()
+        log_every = max(1, self._batch_total // 10)
+        built = 0
+        while queue:
+            epoch, slot, trajectory, start_progress, start_delay = queue[0]
+            if epoch + start_delay / 1000 > now + SPAWN_LEAD:
+                break
+            if built and time.perf_counter() - started > budget:
+                break
+            queue.popleft()
+            window = self._spawn(slot, trajectory, start_progress, start_delay, epoch)
+            built += 1
             
-            # 创建窗口
-            window = HeartWindow(
-                message, 
-                color_theme, 
-                trajectory, 
-                start_progress,
-                start_delay
+            # 弹窗很多时只抽样记录约 10 条
+            if slot % log_every == 0:
+                logger.debug("创建弹窗 #{}: progress={:.3f}, theme={}", slot + 1, start_progress, window.color_theme['name'])
+        
+        elapsed = time.perf_counter() - started
+        self._build_time += elapsed
+        self._build_peak = max(self._build_peak, elapsed)
+    
+    def flush_spawns(self):
+        """立即构建所有待构建的弹窗（热重载调整数量前、基准测试时使用）"""
+        self._spawn_due(float('inf'), budget=float('inf'))
+    
+    def _popup_shown(self, now: float):
+        """记录本批弹窗的显示进度：首个弹窗和全部弹窗的显示耗时"""
+        if not self._batch_total:
+            return
+        self._batch_shown += 1
+        elapsed = (now - self._batch_start) * 1000
+        if self._batch_shown == 1:
+            logger.info(f"首个弹窗显示: 开始创建后 {elapsed:.0f} ms")
+        if self._batch_shown >= self._batch_total:
+            logger.info(
+                f"全部 {self._batch_total} 个弹窗显示: 开始创建后 {elapsed:.0f} ms "
+                f"(构建共 {self._build_time * 1000:.1f} ms, 单帧最长 {self._build_peak * 1000:.1f} ms)"
             )
-            self.windows.append(window)
+            self._batch_total = 0
+    
+    def _configure_cache(self, num_popups: int):
+        """按弹窗数量决定是否启用脉动，并为弹窗缓存预留容量"""
+        # 弹窗很多时关闭脉动（否则缓存需要每个弹窗 × 每个缩放档位一张图像）
+        self.pulse_enabled = num_popups <= PULSE_MAX_POPUPS
+        distinct = min(num_popups, math.lcm(len(self.messages), len(BUILTIN_COLOR_THEMES)))
+        popup_cache.reserve(distinct * PULSE_BUCKETS if self.pulse_enabled else distinct)
+    
+    def _spawn(self, slot: int, trajectory: HeartTrajectory, start_progress: float,
+               start_delay: int, now: float) -> HeartWindow:
+        """
+        创建一个弹窗并加入 windows（消息和颜色主题按序号循环选择）
+        
+        Args:
+            slot: 弹窗序号
+            trajectory: 所在的爱心轨迹
+            start_progress: 起始进度
+            start_delay: 启动延迟（毫秒）
+            now: 当前单调时钟
+        """
+        # 循环选择消息和颜色主题
+        message = self.messages[slot % len(self.messages)]
+        color_theme = BUILTIN_COLOR_THEMES[slot % len(BUILTIN_COLOR_THEMES)]
+        
+        # 动画状态写入引擎，再创建显示它的窗口（overlay 模式下为覆盖层中的轻量弹窗）
+        row = self.engine.add(trajectory, start_progress, now + start_delay / 1000)
+        if config.render_mode == "overlay":
+            overlay = self._ensure_overlay(*self.screen_size)
+            window = overlay.create_popup(self.engine, row, message, color_theme, trajectory)
+        else:
+            window = self.pool.acquire(self.engine, row, message, color_theme, trajectory)
+        window.slot = slot
+        self._views[row] = window
+        self.windows.append(window)
+        return window
+    
+    @staticmethod
+    def _layout(trajectories: List[HeartTrajectory], num_popups: int) -> List[Tuple[HeartTrajectory, float]]:
+        """
+        将弹窗按轨迹周长比例分配到各圈，每圈内均匀分布
+        
+        Returns:
+            List: (轨迹, 起始进度)，各圈交错排列，让依次出现的弹窗分散在各圈上
+        """
+        counts = ring_counts(trajectories, num_popups)
+        
+        rings = []
+        for ring, (trajectory, count) in enumerate(zip(trajectories, counts)):
+            # 相邻圈错开半个间隔，减少内外圈弹窗重叠
+            offset = 0.5 * (ring % 2) / max(count, 1)
+            rings.append([(trajectory, (j / count + offset) % 1.0) for j in range(count)])
+        
+        layout = []
+        for j in range(max(counts)):
+            for ring in rings:
+                if j < len(ring):
+                    layout.append(ring[j])
+        return layout
+    
+    def _ensure_overlay(self, screen_width: int, screen_height: int):
+        """获取（必要时创建）全屏覆盖层"""
+        # 延迟导入：heart_overlay 依赖本模块的 PopupState
+        from heart_overlay import create_overlay
+        
+        if self._overlay is not None and self._overlay_renderer != config.overlay_renderer and not self._closing:
+            # 绘制方式已修改（热重载）：旧覆盖层上的弹窗都已关闭，换成新的覆盖层
+            self._overlay.hide()
+            self._overlay.deleteLater()
+            self._overlay = None
+        if self._overlay is None:
+            self._overlay = create_overlay()
+            self._overlay_renderer = config.overlay_renderer
+        self._overlay.setGeometry(0, 0, screen_width, screen_height)
+        return self._overlay
+    
+    def _ensure_clock_running(self):
+        """确保帧时钟在运行"""
+        if not self.frame_timer.isActive():
+            frame_metrics.track_paint = config.adaptive_quality
+            self.frame_timer.start(self._frame_interval())
+            if self.on_idle_changed is not None:
+                self.on_idle_changed(False)
+    
+    def _on_frame(self):
+        """帧时钟回调：引擎一次推进所有存活弹窗，再同步到窗口"""
+        now = time.monotonic()
+        frame_metrics.record_tick(now)
+        started = time.perf_counter()
+        
+        # 构建即将出现的弹窗
+        self._spawn_due(now)
+        
+        # 引擎一次推进所有弹窗，窗口只更新本帧变化的部分
+        update = self.engine.step(now, config.lap_duration, self.pulse_enabled and self.governor.pulse_allowed)
+        self._apply_update(update, now)
+        if config.rotation_mode != "off":
+            self._rotate_messages(now)
+        
+        # 回收已关闭的弹窗
+        if len(update.closed):
+            closed = set(update.closed.tolist())
+            self.windows = self._drop_closed(self.windows, closed)
+            self._closing = self._drop_closed(self._closing, closed)
+        
+        # overlay 模式：所有弹窗在一次重绘中完成
+        if self._overlay is not None:
+            self._overlay.sync(self.windows + self._closing)
+        
+        elapsed = time.perf_counter() - started
+        frame_metrics.record_update(elapsed)
+        self.governor.observe(now, elapsed)
+        
+        # 没有存活弹窗时停止时钟，避免空转
+        if not self.windows and not self._closing and not self._spawn_queue:
+            self.frame_timer.stop()
+            frame_metrics.stop_ticks()
+            self.governor.stop()
+            if self.on_idle_changed is not None:
+                self.on_idle_changed(True)
+    
+    def _apply_update(self, update: FrameUpdate, now: float):
+        """把引擎本帧的变化同步到窗口"""
+        views = self._views
+        for row in update.started.tolist():
+            views[row]._start_animation()
+            self._popup_shown(now)
+        
+        opacity = self.engine.opacity
+        for row in update.faded.tolist():
+            views[row].set_opacity(opacity[row])
+        
+        # 覆盖层弹窗绘制时直接读取引擎中的坐标，只有原生窗口需要逐个移动
+        if config.render_mode != "overlay":
+            xs, ys = self.engine.x, self.engine.y
+            for row in update.moved.tolist():
+                views[row].apply_position(xs[row], ys[row])
+        
+        # 脉动缩放跨越缓存档位时才需要重绘
+        for row in update.rescaled.tolist():
+            views[row].update()
+        
+        for row in update.closed.tolist():
+            views[row].close()
+    
+    def _rotate_messages(self, now: float):
+        """到达更换时刻的弹窗换上预取好的语句（预取不及时留到下一帧再换）"""
+        interval = config.lap_duration if config.rotation_mode == "lap" else config.rotation_interval
+        due = self.engine.rotations_due(now, interval)[:ROTATE_MAX_PER_FRAME]
+        rotated = 0
+        for row in due.tolist():
+            message = self.rotation.take()
+            if message is None:
+                break
+            self._views[row].set_message(message)
+            rotated += 1
+        self.engine.schedule_rotation(due[:rotated], now, interval)
+    
+    def _drop_closed(self, windows: List[HeartWindow], closed: set) -> List[HeartWindow]:
+        """移除并回收本帧关闭的弹窗（closed 为行号），返回仍存活的弹窗"""
+        alive = []
+        for window in windows:
+            if window.row in closed:
+                self._recycle(window)
+            else:
+                alive.append(window)
+        return alive
+    
+    def _recycle(self, window: HeartWindow):
+        """释放弹窗在引擎中的行；原生窗口放回复用池（覆盖层弹窗无需处理）"""
+        self.engine.release(window.row)
+        del self._views[window.row]
+        if isinstance(window, HeartWindow):
+            if config.render_mode == "overlay":
+                # 已切换到覆盖层（热重载）：原生窗口不会再复用
+                window.hide()
+                window.deleteLater()
+            else:
+                self.pool.release(window)
+    
+    def _current_progress(self, window: HeartWindow, now: float) -> float:
+        """弹窗此刻的进度（运动中的弹窗按单调时钟计算，不必等到下一帧）"""
+        return self.engine.current_progress(window.row, now, config.lap_duration)
+    
+    def _retire(self, window: HeartWindow):
+        """淡出一个弹窗（尚未显示的直接回收）"""
+        window.fade_out_and_close()
+        if window.state == STATE_CLOSED:
+            self._recycle(window)
+        else:
+            self._closing.append(window)
+    
+    def resize_popups(self, num_popups: int):
+        """
+        调整弹窗数量：只增删差额，现有弹窗保持当前的动画进度
+        
+        新弹窗插入到所在圈最大的空隙中；减少时每圈按进度顺序均匀保留，其余淡出。
+        
+        Args:
+            num_popups: 新的弹窗数量（画质调节器减少弹窗时按比例显示更少）
+        """
+        if config.render_mode == "windows" and num_popups > MAX_WINDOWS_POPUPS:
+            num_popups = MAX_WINDOWS_POPUPS
+        self.requested_popups = num_popups
+        self._set_popup_count(self.governor.popup_count(num_popups))
+    
+    def update_fade_mode(self):
+        """fade_mode 修改后（热重载）重新检测淡入淡出方式，应用到现有窗口和复用池中的窗口"""
+        reset_native_opacity()
+        enabled = native_opacity_supported()
+        for window in self.windows + self._closing + self.pool.idle:
+            if isinstance(window, HeartWindow):
+                window.set_native_opacity(enabled)
+    
+    def _set_popup_count(self, num_popups: int):
+        """增删弹窗，使实际显示的数量为 num_popups"""
+        if not self.trajectories or not (self.windows or self._spawn_queue):
+            return
+        # 先构建仍在排队的弹窗，下面统一按当前进度计算差额
+        self.flush_spawns()
+        
+        # 已点击、正在淡出的弹窗不计入数量，交给 _closing 在淡出结束后回收
+        fading = [w for w in self.windows if w.state in (STATE_FADING_OUT, STATE_CLOSED)]
+        if fading:
+            self._closing.extend(fading)
+            self.windows = [w for w in self.windows if w.state not in (STATE_FADING_OUT, STATE_CLOSED)]
+        
+        now = time.monotonic()
+        lap_duration = config.lap_duration
+        groups: Dict[int, List[HeartWindow]] = {}
+        for window in self.windows:
+            groups.setdefault(id(window.trajectory), []).append(window)
+        
+        added = removed = 0
+        # 淡出或已回收的弹窗按对象移除：回收后行号可能已释放或被新弹窗复用，不能再读取其状态
+        retired = set()
+        targets = ring_counts(self.trajectories, num_popups)
+        for trajectory, target in zip(self.trajectories, targets):
+            group = sorted(groups.get(id(trajectory), []), key=lambda w: self._current_progress(w, now))
+            
+            positions = [self._current_progress(w, now) for w in group]
             
-            logger.debug(f"创建弹窗 #{i+1}/{num_popups}: progress={start_progress:.3f}, theme={color_theme['name']}")
+            if target < len(group):
+                keep = self._select_spread(positions, target)
+                for index, window in enumerate(group):
+                    if index not in keep:
+                        self._retire(window)
+                        retired.add(id(window))
+                        removed += 1
+                continue
+            
+            count = target - len(group)
+            stagger = min(STAGGER_MS, STARTUP_SPREAD_MS / max(count, 1))
+            for k in range(count):
+                progress = self._largest_gap_center(positions)
+                positions.append(progress)
+                positions.sort()
+                
+                # 相邻弹窗在等待和淡入期间会继续前进，起始进度提前相应距离，
+                # 开始运动时正好位于空隙中央
+                start_delay = int(k * stagger)
+                lead = (start_delay / 1000 + FADE_DURATION) / lap_duration
+                self._spawn(self._next_slot, trajectory, (progress + lead) % 1.0, start_delay, now)
+                self._next_slot += 1
+                added += 1
+        
+        self.windows = [w for w in self.windows if id(w) not in retired]
+        self._configure_cache(len(self.windows))
+        self._ensure_clock_running()
+        logger.info(f"弹窗数量调整为 {len(self.windows)} 个: 新增 {added}, 淡出 {removed}")
+    
+    @staticmethod
+    def _select_spread(positions: List[float], target: int) -> set:
+        """
+        从已排序的进度中挑选 target 个尽量均匀的位置
         
-        logger.success(f"所有弹窗创建完成！")
+        逐个去掉最拥挤（与两侧相邻弹窗间距之和最小）的位置；数量很多时直接按顺序均匀抽取。
+        
+        Returns:
+            set: 保留的下标
+        """
+        if len(positions) > SELECT_GREEDY_LIMIT:
+            return {round(j * len(positions) / target) for j in range(target)}
+        
+        alive = list(range(len(positions)))
+        while len(alive) > target:
+            count = len(alive)
+            crowded = min(
+                range(count),
+                key=lambda k: (positions[alive[(k + 1) % count]] - positions[alive[k - 1]]) % 1.0
+            )
+            alive.pop(crowded)
+        return set(alive)
+    
+    @staticmethod
+    def _largest_gap_center(positions: List[float]) -> float:
+        """已排序的进度中最大空隙的中点（首尾相接）"""
+        if not positions:
+            return 0.0
+        best_start, best_gap = positions[-1], positions[0] + 1.0 - positions[-1]
+        for left, right in zip(positions, positions[1:]):
+            if right - left > best_gap:
+                best_start, best_gap = left, right - left
+        return (best_start + best_gap / 2) % 1.0
+    
+    def refresh_messages(self):
+        """消息列表变化后，只更换语句变化了的弹窗的文本（动画进度不变）"""
+        if config.rotation_mode != "off":
+            # 轮换模式下弹窗在各自的更换时刻换上新文件中的语句
+            if self.windows:
+                self._start_rotation()
+            logger.info("语句已更新，弹窗将在轮换时显示新的语句")
+            return
+        changed = 0
+        for window in self.windows:
+            message = self.messages[window.slot % len(self.messages)]
+            if message != window.message:
+                window.set_message(message)
+                changed += 1
+        self._configure_cache(len(self.windows))
+        logger.info(f"语句已更新: {changed}/{len(self.windows)} 个弹窗更换了文本")
+    
+    def _start_rotation(self):
+        """轮换模式下（重新）启动预取线程，否则停止"""
+        if config.rotation_mode == "off":
+            self.rotation.stop()
+            return
+        self.rotation.start(
+            self.messages, config.rotation_policy, config.rotation_weights,
+            config.rotation_prefetch, popup_cache.font
+        )
+    
+    def update_rotation(self):
+        """轮换配置变化：按新的间隔重新安排更换时刻，并按新的策略重新预取"""
+        self.engine.reset_rotation()
+        if self.windows or self._spawn_queue:
+            self._start_rotation()
+        else:
+            self.rotation.stop()
+    
+    def rebase_motion(self):
+        """以当前进度为起点重新计时（修改 lap_duration 前调用，避免弹窗跳动）"""
+        self.engine.rebase(time.monotonic(), config.lap_duration)
+    
+    def _frame_interval(self) -> int:
+        """帧时钟间隔（毫秒，画质调节器降低帧率时更长）"""
+        interval = self.governor.frame_interval_ms()
+        frame_metrics.expected_interval_ms = interval
+        return interval
+    
+    def update_frame_interval(self):
+        """目标帧率或画质档位变化后更新帧时钟间隔"""
+        if self.frame_timer.isActive():
+            self.frame_timer.setInterval(self._frame_interval())
+    
+    def _on_quality_changed(self, old: int, new: int):
+        """画质档位变化：只应用跨过的档位对应的设置"""
+        def crossed(level: int) -> bool:
+            return (old >= level) != (new >= level)
+        
+        if crossed(QUALITY_NO_PULSE) and not self.governor.pulse_allowed:
+            # 关闭脉动：弹窗恢复原始大小
+            for row in self.engine.reset_scale().tolist():
+                self._views[row].update()
+        if crossed(QUALITY_NO_ANTIALIAS):
+            popup_cache.set_antialiasing(self.governor.antialiasing)
+            if self.governor.antialiasing:
+                # 重新绘制降级期间渲染的无抗锯齿图像
+                for window in self.windows + self._closing:
+                    window.update()
+        if crossed(QUALITY_LOW_FPS):
+            self.update_frame_interval()
+        if crossed(QUALITY_FEWER_POPUPS) and self.requested_popups:
+            self._set_popup_count(self.governor.popup_count(self.requested_popups))
+    
+    def reset_quality(self):
+        """恢复完整画质（关闭自适应画质时调用）"""
+        self.governor.reset()
+        frame_metrics.track_paint = config.adaptive_quality
     
     def close_all(self):
         """关闭所有弹窗"""
         logger.info(f"关闭所有弹窗，共 {len(self.windows)} 个")
+        # 尚未构建的弹窗不再构建
+        self._spawn_queue.clear()
+        self._batch_total = 0
         for window in self.windows:
             if window:
-                window.fade_out_and_close()
+                self._retire(window)
         self.windows.clear()
+        if self.rotation.running:
+            self.rotation.stop()
+            self.rotation.log_stats()
+        popup_cache.log_stats()
+        self.pool.log_stats()
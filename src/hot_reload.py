@@ -0,0 +1,98 @@
+"""
+配置和消息文件热重载
+监视 config.json 和消息文件，变化后通知应用按差异更新弹窗
+"""
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from loguru import logger
+
+
+
+# 文件变化后等待的时间（毫秒）：编辑器保存时可能连续触发多次事件
+RELOAD_DEBOUNCE_MS = 300
+
+# 修改后需要重建所有弹窗的配置项（轨迹、布局或渲染方式变化）
+REBUILD_FIELDS = {
+    "render_mode", "overlay_renderer", "heart_rings", "heart_ring_spacing", "layout_mode",
+    "popup_size_mode", "trajectory_points",
+}
+
+# 文件签名：(修改时间, 大小)，文件不存在时为 None
+FileSignature = Optional[Tuple[int, int]]
+
+
+def file_signature(path: Path) -> FileSignature:
+    """文件签名（用于判断内容是否真的变化）"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def diff_config(old: 'AppConfig', new: 'AppConfig') -> Set[str]:
+    """两份配置中取值不同的配置项（old 可以是启动快照中的配置）"""
+    from config import AppConfig
+    return {name for name in AppConfig.model_fields if getattr(old, name) != getattr(new, name)}
+
+
+class FileWatcher(QObject):
+    """
+    文件监视器（带去抖动）
+
+    同时监视文件和所在目录：很多编辑器保存时先写临时文件再重命名，
+    原文件的监视会失效，目录事件可以捕获这种情况。事件只触发一次去抖动检查，
+    检查时按文件签名判断哪些文件真的变化了。
+    """
+
+    file_changed = pyqtSignal(str)
+
+    def __init__(self, paths: Iterable[Path]):
+        super().__init__()
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._schedule)
+        self._watcher.directoryChanged.connect(self._schedule)
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(RELOAD_DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._check)
+
+        self._signatures: Dict[Path, FileSignature] = {}
+        self.set_paths(paths)
+
+    def set_paths(self, paths: Iterable[Path]):
+        """设置要监视的文件（替换之前的文件）"""
+        watched = self._watcher.files() + self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+
+        self._signatures = {Path(path): file_signature(Path(path)) for path in paths}
+        self._watch()
+        logger.info(f"热重载: 监视 {', '.join(path.name for path in self._signatures)}")
+
+    def _watch(self):
+        """（重新）添加监视：被替换的文件需要重新添加"""
+        files = set(self._watcher.files())
+        directories = set(self._watcher.directories())
+        for path in self._signatures:
+            if path.exists() and str(path) not in files:
+                self._watcher.addPath(str(path))
+            if path.parent.exists() and str(path.parent) not in directories:
+                self._watcher.addPath(str(path.parent))
+
+    def _schedule(self, _path: str):
+        """收到文件系统事件：等待去抖动时间后再检查"""
+        self._debounce.start()
+
+    def _check(self):
+        """检查哪些文件的签名变化了，逐个发出通知"""
+        self._watch()
+        for path, old in list(self._signatures.items()):
+            new = file_signature(path)
+            if new == old:
+                continue
+            self._signatures[path] = new
+            if new is not None:
+                self.file_changed.emit(str(path))
@@ -0,0 +1,231 @@
+"""
+单实例与本地控制通道
+正在运行的实例监听一个本地套接字（Windows 为命名管道，Linux/macOS 为 Unix 套接字），
+再次启动程序或使用命令行工具时通过它控制该实例，不会再创建第二套窗口、托盘和键盘钩子。
+
+协议：每个请求和响应都是一行 JSON
+    请求: {"command": "num_popups", "value": 30}
+    响应: {"ok": true, "num_popups": 30} 或 {"ok": false, "error": "..."}
+
+命令行用法（需要实例正在运行）：
+    python instance_control.py show | hide | reload | metrics | ping | quit
+    python instance_control.py num_popups 30
+"""
+import getpass
+import json
+import os
+import sys
+from typing import Callable, Dict, List, Optional
+from PyQt5.QtCore import QObject
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from loguru import logger
+
+
+def _server_name() -> str:
+    """本地套接字名称（按用户区分，不同用户各自运行一个实例）"""
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = str(os.getuid()) if hasattr(os, 'getuid') else "default"
+    return f"heartcare-popups-{user}"
+
+
+SERVER_NAME = _server_name()
+
+# 连接和等待响应的超时（毫秒）；没有实例运行时连接立即失败，不会等到超时
+CONNECT_TIMEOUT_MS = 500
+REPLY_TIMEOUT_MS = 3000
+
+# 单个请求的最大长度（字节），超过时断开连接
+MAX_REQUEST_BYTES = 64 * 1024
+
+# 命令处理函数：参数为请求中的其余字段，返回值合并到响应中，出错时抛出异常
+CommandHandler = Callable[[dict], dict]
+
+# 命令行工具支持的命令及说明
+COMMANDS = {
+    "ping": "检查实例是否在运行",
+    "show": "重新显示弹窗",
+    "hide": "隐藏所有弹窗",
+    "num_popups": "调整弹窗数量（运行期间有效，不修改 config.json）",
+    "reload": "重新加载消息文件",
+    "metrics": "输出帧性能统计",
+    "quit": "退出程序",
+}
+
+
+class ControlServer(QObject):
+    """
+    控制通道服务端 - 在界面线程中接收命令
+
+    请求由 Qt 事件循环分发，命令处理函数直接在界面线程中执行，可以直接操作弹窗和托盘。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.handlers: Dict[str, CommandHandler] = {}
+        self._server = QLocalServer(self)
+        # 只允许当前用户连接
+        self._server.setSocketOptions(QLocalServer.UserAccessOption)
+        self._server.newConnection.connect(self._on_new_connection)
+        self._buffers: Dict[QLocalSocket, bytes] = {}
+
+    def listen(self) -> Optional[bool]:
+        """
+        开始监听
+
+        Unix 上 listen() 会直接替换同名的套接字文件，所以先确认没有实例在监听，再清理上次异常退出
+        留下的套接字文件。两个实例几乎同时启动、都在对方监听之前完成检查时，Windows 上后一个实例
+        监听失败，再次检查后退出；Unix 上后一个实例会替换前一个的套接字，前一个实例照常运行但不再
+        接受控制命令（这一窗口只有几毫秒）。
+
+        Returns:
+            Optional[bool]: True 开始监听；False 已有实例在监听；None 控制通道不可用（程序可以照常运行）
+        """
+        if send_command("ping") is not None:
+            return False
+        QLocalServer.removeServer(SERVER_NAME)
+        if self._server.listen(SERVER_NAME):
+            logger.info(f"控制通道已启动: {self._server.fullServerName()}")
+            return True
+
+        # 检查之后另一个实例抢先开始监听
+        if send_command("ping") is not None:
+            return False
+        logger.warning(f"控制通道启动失败: {self._server.errorString()}")
+        return None
+
+    def close(self):
+        """停止监听（退出时调用）"""
+        self._server.close()
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            self._buffers[socket] = b""
+            socket.readyRead.connect(lambda socket=socket: self._on_ready_read(socket))
+            socket.disconnected.connect(lambda socket=socket: self._on_disconnected(socket))
+
+    def _on_disconnected(self, socket: QLocalSocket):
+        self._buffers.pop(socket, None)
+        socket.deleteLater()
+
+    def _on_ready_read(self, socket: QLocalSocket):
+        """收到完整的一行后处理请求并回复"""
+        if socket not in self._buffers:
+            return
+        data = self._buffers[socket] + bytes(socket.readAll())
+        if b"\n" not in data:
+            if len(data) > MAX_REQUEST_BYTES:
+                logger.warning("控制通道请求过长，已断开")
+                self._buffers.pop(socket)
+                socket.abort()
+            else:
+                self._buffers[socket] = data
+            return
+
+        # 每个连接只处理一个请求，回复后断开（disconnectFromServer 会先发送完待写数据）
+        self._buffers.pop(socket)
+        reply = self._dispatch(data.split(b"\n", 1)[0])
+        socket.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+        socket.disconnectFromServer()
+
+    def _dispatch(self, line: bytes) -> dict:
+        """解析并执行一条命令"""
+        try:
+            request = json.loads(line.decode("utf-8"))
+            command = request.pop("command")
+        except Exception:
+            return {"ok": False, "error": "请求格式错误"}
+
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"未知命令: {command}"}
+
+        logger.info(f"控制通道命令: {command} {request if request else ''}")
+        try:
+            result = handler(request)
+        except Exception as e:
+            logger.warning(f"控制通道命令 {command} 执行失败: {e}")
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, **result}
+
+
+def send_command(command: str, timeout_ms: int = CONNECT_TIMEOUT_MS, **args) -> Optional[dict]:
+    """
+    向正在运行的实例发送一条命令（阻塞，不需要事件循环和 QApplication）
+
+    Args:
+        command: 命令名称
+        timeout_ms: 连接超时（毫秒）
+        **args: 命令参数
+
+    Returns:
+        Optional[dict]: 实例的响应；没有实例在运行时返回 None
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(SERVER_NAME)
+    if not socket.waitForConnected(timeout_ms):
+        return None
+
+    socket.write(json.dumps({"command": command, **args}, ensure_ascii=False).encode("utf-8") + b"\n")
+    socket.waitForBytesWritten(timeout_ms)
+
+    data = b""
+    while b"\n" not in data and socket.waitForReadyRead(REPLY_TIMEOUT_MS):
+        data += bytes(socket.readAll())
+    data += bytes(socket.readAll())
+    socket.abort()
+
+    try:
+        return json.loads(data.split(b"\n", 1)[0].decode("utf-8"))
+    except ValueError:
+        return {"ok": False, "error": "实例没有响应"}
+
+
+def run_command(words: List[str]) -> int:
+    """
+    执行命令行中的控制命令并输出响应
+
+    Args:
+        words: 命令及参数，例如 ["num_popups", "30"]
+
+    Returns:
+        int: 退出码（0 成功，1 命令失败，2 没有实例在运行或命令无效）
+    """
+    command, values = words[0], words[1:]
+    if command not in COMMANDS:
+        print(f"未知命令: {command}，可用命令: {', '.join(COMMANDS)}", file=sys.stderr)
+        return 2
+
+    args = {}
+    if command == "num_popups":
+        if len(values) != 1 or not values[0].isdigit():
+            print("用法: num_popups <数量>", file=sys.stderr)
+            return 2
+        args["value"] = int(values[0])
+
+    reply = send_command(command, **args)
+    if reply is None:
+        print("爱心关怀弹窗没有在运行", file=sys.stderr)
+        return 2
+    print(json.dumps(reply, ensure_ascii=False, indent=2))
+    return 0 if reply.get("ok") else 1
+
+
+def main():
+    """命令行工具入口"""
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="控制正在运行的爱心关怀弹窗",
+        epilog="\n".join(f"  {name:<11} {help}" for name, help in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", help="命令")
+    parser.add_argument("value", nargs="*", help="命令参数")
+    args = parser.parse_args()
+    sys.exit(run_command([args.command] + args.value))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,25 +2,34 @@
 爱心弹窗主程序
 显示沿爱心轨迹运动的关心语句弹窗
 按 ESC 键退出
+
+启动路径尽量精简：配置、日志、界面模块都在 main() 中按阶段加载，
+使用 --startup-profile 可查看各阶段耗时。
+已有实例在运行时，再次启动只通知该实例重新显示弹窗后退出（见 instance_control）。
 """
+from startup_profile import startup_profiler
+
+import argparse
+import os
 import sys
 import threading
+import time
 from pathlib import Path
 from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction
 from PyQt5.QtCore import QTimer, pyqtSignal, QObject
-from PyQt5.QtGui import QIcon
 from loguru import logger
 
-try:
-    import keyboard
-    KEYBOARD_AVAILABLE = True
-except ImportError:
-    KEYBOARD_AVAILABLE = False
-    logger.warning("keyboard 库未安装，ESC键监听将不可用")
-    logger.warning("请运行: pip install keyboard")
+startup_profiler.mark("导入 Qt")
 
-from config import config
-from heart_window import HeartWindowManager
+# keyboard 库在监听线程中导入，不占用主线程的启动时间
+keyboard = None
+
+# 以下对象在 main() 中按启动阶段导入（Pydantic 模型构建和 NumPy 都较慢，启动快照有效时不导入 Pydantic）
+config = None
+startup_snapshot = None
+HeartWindowManager = None
+frame_metrics = None
+MetricsHud = None
 
 
 class KeyboardListener(QObject):
@@ -33,18 +42,17 @@ class KeyboardListener(QObject):
         super().__init__()
         self.listening = False
         self.listener_thread = None
+        # 停止监听时置位：监听线程阻塞等待该事件，不轮询
+        self._stop_event = threading.Event()
         
     def start_listening(self):
         """启动监听线程"""
-        if not KEYBOARD_AVAILABLE:
-            logger.error("keyboard 库未安装，无法启动ESC监听")
-            return
-        
         if self.listening:
             logger.warning("ESC监听已经在运行")
             return
         
         self.listening = True
+        self._stop_event.clear()
         
         # 在独立线程中启动监听
         self.listener_thread = threading.Thread(target=self._listen_loop, daemon=True)
@@ -54,13 +62,21 @@ class KeyboardListener(QObject):
     
     def _listen_loop(self):
         """监听循环 - 在独立线程中运行"""
+        global keyboard
+        try:
+            import keyboard
+        except ImportError:
+            self.listening = False
+            logger.error("keyboard 库未安装，ESC键监听将不可用")
+            logger.warning("请运行: pip install keyboard")
+            return
+        
         try:
             # 注册ESC键的回调
             keyboard.on_press_key('esc', self._on_esc_press, suppress=False)
             
-            # 保持线程运行
-            while self.listening:
-                threading.Event().wait(0.1)
+            # 按键回调由 keyboard 库的钩子线程触发，这里只需阻塞到停止监听（不轮询、不唤醒）
+            self._stop_event.wait()
                 
         except Exception as e:
             logger.error(f"键盘监听线程异常: {e}")
@@ -77,9 +93,10 @@ class KeyboardListener(QObject):
             return
         
         self.listening = False
+        self._stop_event.set()
         
         try:
-            if KEYBOARD_AVAILABLE:
+            if keyboard is not None:
                 keyboard.unhook_all()
         except:
             pass
@@ -90,13 +107,30 @@ class KeyboardListener(QObject):
 class HeartCareApp:
     """爱心关怀应用主类"""
     
-    def __init__(self):
-        """初始化应用"""
+    def __init__(self, app: QApplication, control=None):
+        """
+        初始化应用
+        
+        Args:
+            app: QApplication
+            control: 本地控制通道（ControlServer），None 表示不接受外部控制
+        """
         logger.info("初始化爱心关怀应用...")
         
-        self.app = QApplication(sys.argv)
-        self.app.setApplicationName("爱心关怀弹窗")
-        self.app.setQuitOnLastWindowClosed(False)
+        self.app = app
+        
+        # 本地控制通道：再次启动程序或命令行工具通过它控制本实例
+        self.control = control
+        if control is not None:
+            control.handlers.update({
+                "ping": self._on_control_ping,
+                "show": self._on_control_show,
+                "hide": self._on_control_hide,
+                "num_popups": self._on_control_num_popups,
+                "reload": self._on_control_reload,
+                "metrics": self._on_control_metrics,
+                "quit": self._on_control_quit,
+            })
         
         # 创建键盘监听器
         self.keyboard_listener = KeyboardListener()
@@ -115,11 +149,28 @@ class HeartCareApp:
         self.manager = HeartWindowManager()
         self.manager.load_messages(config.messages_path)
         
+        # 性能统计：定期输出到日志，可选显示性能面板
+        self.hud = None
+        self.metrics_log_timer = QTimer()
+        self.metrics_log_timer.timeout.connect(frame_metrics.log_summary)
+        
+        # 空闲状态：没有弹窗时停止所有周期性定时器，事件循环只在热键、托盘或文件变化时唤醒
+        self.idle = False
+        self._idle_since = 0.0
+        self._idle_wakeups = 0
+        self.manager.on_idle_changed = self._on_idle_changed
+        
         # 创建系统托盘图标
         self._create_tray_icon()
         
+        # 热重载：config.json 或消息文件修改后按差异更新弹窗
+        self.watcher = None
+        self._update_watcher()
+        startup_profiler.mark("初始化应用")
+        
         # 启动弹窗
         self._start_popups()
+        startup_profiler.mark("创建弹窗")
     
     def _create_tray_icon(self):
         """创建系统托盘图标和菜单"""
@@ -142,9 +193,23 @@ class HeartCareApp:
         
         tray_menu.addSeparator()
         
+        # 性能监控
+        self.metrics_action = QAction("📊 性能监控", self.app)
+        self.metrics_action.setCheckable(True)
+        self.metrics_action.toggled.connect(self._set_metrics_enabled)
+        tray_menu.addAction(self.metrics_action)
+        
+        # 性能面板
+        self.hud_action = QAction("🖥️ 性能面板", self.app)
+        self.hud_action.setCheckable(True)
+        self.hud_action.toggled.connect(self._set_hud_visible)
+        tray_menu.addAction(self.hud_action)
+        
+        tray_menu.addSeparator()
+        
         # 退出
         quit_action = QAction("❌ 退出 (ESC)", self.app)
-        quit_action.triggered.connect(self.quit_app)
+        quit_action.triggered.connect(lambda: self.quit_app("托盘菜单"))
         tray_menu.addAction(quit_action)
         
         self.tray_icon.setContextMenu(tray_menu)
@@ -154,6 +219,10 @@ class HeartCareApp:
         # 托盘图标双击事件
         self.tray_icon.activated.connect(self._on_tray_activated)
         
+        # 按配置初始化性能监控状态
+        self.metrics_action.setChecked(config.metrics_enabled or config.show_hud)
+        self.hud_action.setChecked(config.show_hud)
+        
         logger.success("系统托盘图标创建成功")
     
     def _on_tray_activated(self, reason):
@@ -162,6 +231,59 @@ class HeartCareApp:
             logger.info("用户双击托盘图标")
             self._restart_popups()
     
+    def _on_idle_changed(self, idle: bool):
+        """帧时钟停止（没有弹窗）时进入空闲，重新开始显示时恢复"""
+        if idle == self.idle:
+            return
+        self.idle = idle
+        
+        if idle:
+            # 输出最后一次统计后停止周期性输出，性能面板停在最后的数据
+            frame_metrics.log_summary()
+            self.metrics_log_timer.stop()
+            if self.hud is not None:
+                self.hud.set_paused(True)
+            self._idle_since = time.monotonic()
+            self._idle_wakeups = frame_metrics.wakeups
+            logger.info("进入空闲：弹窗已全部关闭，定时器已停止")
+            return
+        
+        if frame_metrics.enabled:
+            duration = time.monotonic() - self._idle_since
+            wakeups = frame_metrics.wakeups - self._idle_wakeups
+            logger.info(f"空闲 {duration:.0f} 秒，事件循环唤醒 {wakeups} 次 ({wakeups / max(duration, 1e-3):.2f} 次/秒)")
+            frame_metrics.reset()
+            self.metrics_log_timer.start(int(config.metrics_log_interval * 1000))
+        if self.hud is not None:
+            self.hud.set_paused(False)
+    
+    def _set_metrics_enabled(self, enabled: bool):
+        """开启/关闭帧性能统计"""
+        frame_metrics.enabled = enabled
+        frame_metrics.count_wakeups(enabled)
+        if enabled:
+            frame_metrics.reset()
+            if not self.idle:
+                self.metrics_log_timer.start(int(config.metrics_log_interval * 1000))
+            logger.info(f"性能监控已开启，每 {config.metrics_log_interval:.0f} 秒输出一次统计")
+        else:
+            self.metrics_log_timer.stop()
+            # 性能面板依赖统计数据，一并关闭
+            self.hud_action.setChecked(False)
+            logger.info("性能监控已关闭")
+    
+    def _set_hud_visible(self, visible: bool):
+        """显示/隐藏性能面板"""
+        if visible:
+            # 性能面板需要统计数据
+            self.metrics_action.setChecked(True)
+            if self.hud is None:
+                self.hud = MetricsHud()
+            self.hud.show()
+            self.hud.set_paused(self.idle)
+        elif self.hud is not None:
+            self.hud.hide()
+    
     def _start_popups(self):
         """启动弹窗显示"""
         logger.info(f"开始显示 {config.num_popups} 个弹窗...")
@@ -172,8 +294,10 @@ class HeartCareApp:
             self.screen_height,
             config.num_popups
         )
+        # 本次启动重新生成的配置、语句和布局写回启动快照
+        startup_snapshot.save()
         
-        logger.success("弹窗已全部启动！")
+        logger.success("弹窗已开始显示！")
         self.tray_icon.showMessage(
             "爱心关怀 💖",
             f"已启动 {config.num_popups} 个弹窗\n\n⌨️ 按 ESC 键退出程序\n🖱️ 点击弹窗关闭单个",
@@ -181,6 +305,95 @@ class HeartCareApp:
             3000
         )
     
+    def _update_watcher(self):
+        """按 hot_reload 开始或停止监视 config.json 和消息文件"""
+        if config.hot_reload and self.watcher is None:
+            from hot_reload import FileWatcher
+            from config import CONFIG_FILE
+            self.watcher = FileWatcher([CONFIG_FILE, config.messages_path])
+            self.watcher.file_changed.connect(self._on_file_changed)
+        elif not config.hot_reload and self.watcher is not None:
+            # 通常正在处理该监视器发出的信号：先断开，再延迟销毁
+            self.watcher.file_changed.disconnect(self._on_file_changed)
+            self.watcher.deleteLater()
+            self.watcher = None
+            logger.info("热重载已关闭")
+    
+    def _on_file_changed(self, path: str):
+        """监视的文件变化：重新加载配置或消息"""
+        from config import CONFIG_FILE
+        if Path(path) == CONFIG_FILE:
+            self._reload_config()
+        elif Path(path) == config.messages_path:
+            self._reload_messages()
+    
+    def _reload_messages(self):
+        """重新加载消息文件，只更换文本变化的弹窗"""
+        logger.info(f"消息文件已修改，重新加载: {config.messages_path}")
+        self.manager.load_messages(config.messages_path)
+        self.manager.refresh_messages()
+    
+    def _reload_config(self):
+        """重新加载 config.json，按变化的配置项做最小的更新"""
+        from config import AppConfig, CONFIG_FILE, setup_logger
+        from hot_reload import diff_config, file_signature, REBUILD_FIELDS
+        
+        try:
+            signature = file_signature(CONFIG_FILE)
+            new_config = AppConfig.parse_json(CONFIG_FILE)
+        except Exception as e:
+            logger.warning(f"配置文件无效，保留当前配置: {e}")
+            return
+        
+        changed = diff_config(config.load(), new_config)
+        if not changed:
+            return
+        logger.info(f"配置已更新: {', '.join(sorted(changed))}")
+        
+        # 先按旧的圈速记录当前进度，再切换配置
+        if "lap_duration" in changed:
+            self.manager.rebase_motion()
+        config.replace(new_config)
+        startup_snapshot.set_config(new_config, signature)
+        
+        if changed & {"log_profile", "log_async"}:
+            setup_logger(banner=False)
+        if "hot_reload" in changed:
+            self._update_watcher()
+        if "messages_file" in changed:
+            if self.watcher is not None:
+                self.watcher.set_paths([CONFIG_FILE, config.messages_path])
+            self.manager.load_messages(config.messages_path)
+            if not changed & REBUILD_FIELDS:
+                self.manager.refresh_messages()
+        
+        if changed & REBUILD_FIELDS:
+            logger.info("轨迹或渲染方式已变化，重新创建所有弹窗")
+            self._restart_popups()
+        elif changed & {"num_popups", "quality_popup_fraction"}:
+            self.manager.resize_popups(config.num_popups)
+        
+        if changed & {"rotation_mode", "rotation_interval", "rotation_policy", "rotation_weights", "rotation_prefetch"}:
+            self.manager.update_rotation()
+        if "fade_mode" in changed:
+            self.manager.update_fade_mode()
+        if "adaptive_quality" in changed:
+            self.manager.reset_quality()
+        if changed & {"target_fps", "quality_low_fps", "adaptive_quality"}:
+            self.manager.update_frame_interval()
+        if "window_pool_size" in changed:
+            self.manager.pool.max_size = config.window_pool_size
+            self.manager.pool.trim(config.window_pool_size)
+        if "window_pool_idle_trim" in changed:
+            self.manager.pool.set_idle_trim(config.window_pool_idle_trim)
+        if "render_mode" in changed and config.render_mode == "overlay":
+            # 覆盖层模式不使用原生窗口
+            self.manager.pool.trim(0)
+        if "metrics_enabled" in changed:
+            self.metrics_action.setChecked(config.metrics_enabled or config.show_hud)
+        if "show_hud" in changed:
+            self.hud_action.setChecked(config.show_hud)
+    
     def _restart_popups(self):
         """重新显示弹窗"""
         logger.info("用户请求重新显示弹窗")
@@ -198,17 +411,78 @@ class HeartCareApp:
             1000
         )
     
-    def quit_app(self):
-        """退出应用 - 由ESC监听线程触发"""
+    def _on_control_ping(self, args: dict) -> dict:
+        """控制命令 ping：返回进程号和当前弹窗数量"""
+        return {"pid": os.getpid(), "popups": len(self.manager.windows), "idle": self.idle}
+    
+    def _on_control_show(self, args: dict) -> dict:
+        """控制命令 show：重新显示弹窗（再次启动程序时发送）"""
+        self._restart_popups()
+        return {}
+    
+    def _on_control_hide(self, args: dict) -> dict:
+        """控制命令 hide：隐藏所有弹窗"""
+        self._hide_popups()
+        return {}
+    
+    def _on_control_num_popups(self, args: dict) -> dict:
+        """控制命令 num_popups：调整弹窗数量（按配置模型校验，只在本次运行期间有效）"""
+        from config import AppConfig
+        values = {name: getattr(config, name) for name in AppConfig.model_fields}
+        values["num_popups"] = args.get("value")
+        new_config = AppConfig(**values)
+        config.replace(new_config)
+        # 弹窗已隐藏时只更新配置，下次显示时使用新的数量
+        self.manager.resize_popups(config.num_popups)
+        return {"num_popups": config.num_popups}
+    
+    def _on_control_reload(self, args: dict) -> dict:
+        """控制命令 reload：重新加载消息文件"""
+        self._reload_messages()
+        return {"messages": len(self.manager.messages)}
+    
+    def _on_control_metrics(self, args: dict) -> dict:
+        """控制命令 metrics：输出帧性能统计到日志并返回"""
+        frame_metrics.log_summary()
+        return {
+            "enabled": frame_metrics.enabled,
+            "popups": len(self.manager.windows),
+            "idle": self.idle,
+            "metrics": frame_metrics.snapshot(),
+        }
+    
+    def _on_control_quit(self, args: dict) -> dict:
+        """控制命令 quit：回复后退出"""
+        QTimer.singleShot(0, lambda: self.quit_app("控制通道"))
+        return {}
+    
+    def quit_app(self, source: str = "ESC键"):
+        """
+        退出应用 - 由ESC监听线程、托盘菜单或控制通道触发
+        
+        Args:
+            source: 退出信号的来源（写入日志）
+        """
         logger.info("=" * 60)
-        logger.info("⌨️ 接收到退出信号（ESC键）")
+        logger.info(f"👋 接收到退出信号（{source}）")
         
         # 停止键盘监听
         self.keyboard_listener.stop_listening()
         
+        # 不再接受控制命令，之后启动的程序成为新的实例
+        if self.control is not None:
+            self.control.close()
+        
+        # 输出最后一次性能统计
+        frame_metrics.log_summary()
+        self.metrics_log_timer.stop()
+        
         # 关闭所有弹窗
         self.manager.close_all()
         
+        # 运行期间热重载的配置和语句写回启动快照
+        startup_snapshot.save()
+        
         # 隐藏托盘图标
         self.tray_icon.hide()
         
@@ -238,16 +512,81 @@ class HeartCareApp:
         return self.app.exec_()
 
 
+def parse_args():
+    """解析命令行参数（未识别的参数留给 Qt）"""
+    parser = argparse.ArgumentParser(description="爱心关怀弹窗")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="输出启动各阶段耗时（导入、配置、日志、QApplication、首个弹窗绘制）")
+    parser.add_argument("--new-instance", action="store_true",
+                        help="即使已有实例在运行也启动新的实例（新实例不接受控制命令）")
+    parser.add_argument("--command", nargs="+", metavar="COMMAND",
+                        help="向正在运行的实例发送控制命令后退出，例如 --command num_popups 30"
+                             "（show / hide / num_popups N / reload / metrics / ping / quit）")
+    args, qt_args = parser.parse_known_args()
+    return args, [sys.argv[0]] + qt_args
+
+
 def main():
     """主函数"""
+    args, qt_argv = parse_args()
+    startup_profiler.verbose = args.startup_profile
+    
+    global config, startup_snapshot, HeartWindowManager, frame_metrics, MetricsHud
+    
+    # 已有实例在运行时只发送命令，不加载配置、不创建 QApplication
+    if args.command:
+        from instance_control import run_command
+        sys.exit(run_command(args.command))
+    if not args.new_instance:
+        from instance_control import send_command
+        if send_command("show") is not None:
+            logger.info("爱心关怀弹窗已在运行，已通知其重新显示弹窗")
+            sys.exit(0)
+        startup_profiler.mark("检查已运行的实例")
+    
     try:
+        # 按阶段加载，便于统计启动耗时
+        from config import config, setup_logger
+        from startup_snapshot import startup_snapshot
+        startup_profiler.mark("导入配置模块")
+        
+        config.load()
+        startup_profiler.mark("加载配置")
+        
+        setup_logger()
+        startup_profiler.mark("初始化日志")
+        
+        app = QApplication(qt_argv)
+        app.setApplicationName("爱心关怀弹窗")
+        app.setQuitOnLastWindowClosed(False)
+        startup_profiler.mark("创建 QApplication")
+        
+        control = None
+        if not args.new_instance:
+            from instance_control import ControlServer, send_command
+            control = ControlServer()
+            listening = control.listen()
+            if listening is False:
+                # 与另一个实例几乎同时启动，对方先开始监听
+                send_command("show")
+                logger.info("爱心关怀弹窗已在运行，已通知其重新显示弹窗")
+                sys.exit(0)
+            if listening is None:
+                # 控制通道不可用不影响程序本身运行，只是不接受控制命令
+                control = None
+        
+        # 界面模块依赖 NumPy 等较重的库，放在 QApplication 之后导入
+        from heart_window import HeartWindowManager
+        from frame_metrics import frame_metrics, MetricsHud
+        startup_profiler.mark("导入界面模块")
+        
         if not config.messages_path.exists():
             logger.warning(f"未找到消息文件: {config.messages_path}")
             logger.warning("将使用默认消息")
         
         # 创建并运行应用
-        app = HeartCareApp()
-        exit_code = app.run()
+        heart_app = HeartCareApp(app, control)
+        exit_code = heart_app.run()
         
         logger.info(f"程序退出，退出码: {exit_code}")
         sys.exit(exit_code)
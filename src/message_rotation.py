@@ -0,0 +1,209 @@
+"""
+语句轮换
+弹窗每绕爱心一圈（或每隔固定时间）更换一条语句。后台线程按选择策略取出语句、解码并完成文本排版，
+放入有界队列；界面线程只取出准备好的语句替换，不读取文件、不排版
+"""
+import bisect
+import itertools
+import queue
+import random
+import threading
+from typing import Dict, Iterator, Optional, Sequence
+from PyQt5.QtGui import QFont
+from loguru import logger
+
+from popup_renderer import ShapedTextCache, text_cache, POPUP_WIDTH, POPUP_MARGIN
+
+
+# shuffled 策略每次打乱的语句块大小：超大文件不必一次打乱全部下标，每轮仍然不重复
+SHUFFLE_BLOCK = 4096
+
+# 停止时等待预取线程退出的最长时间（秒）
+STOP_TIMEOUT = 1.0
+
+# weighted 策略扫描语句时每隔多少条检查一次是否已停止（超大文件的扫描可能需要数秒）
+SCAN_CHECK_INTERVAL = 4096
+
+
+def iter_sequential(count: int, start: int) -> Iterator[int]:
+    """按文件顺序循环，从下标 start 开始"""
+    index = start % count
+    while True:
+        yield index
+        index = (index + 1) % count
+
+
+def iter_shuffled(count: int) -> Iterator[int]:
+    """
+    打乱顺序循环，每轮每条语句恰好出现一次
+
+    先打乱语句块的顺序，再逐块打乱块内顺序：内存只与块大小和块数有关，
+    超大的内存映射文件也不需要一次生成全部下标。
+    """
+    while True:
+        blocks = list(range(0, count, SHUFFLE_BLOCK))
+        random.shuffle(blocks)
+        for block in blocks:
+            indices = list(range(block, min(block + SHUFFLE_BLOCK, count)))
+            random.shuffle(indices)
+            yield from indices
+
+
+def iter_weighted(messages: Sequence[str], weights: Dict[str, float],
+                  stop_event: Optional[threading.Event] = None) -> Iterator[int]:
+    """
+    按权重随机抽取（可重复），未列出的语句权重为 1
+
+    先扫描一遍语句找到 weights 中列出的语句（在预取线程中进行，大文件也不阻塞界面），
+    之后每次按总权重决定抽取列出的语句还是其余语句，不需要为整个文件建立权重数组。
+    扫描期间 stop_event 被设置时立即结束（不再产生下标）。
+    """
+    count = len(messages)
+    listed: Dict[int, float] = {}
+    if weights:
+        for index in range(count):
+            if stop_event is not None and index % SCAN_CHECK_INTERVAL == 0 and stop_event.is_set():
+                return
+            weight = weights.get(messages[index])
+            if weight is not None:
+                listed[index] = weight
+
+    listed_indices = list(listed)
+    cumulative = list(itertools.accumulate(listed.values()))
+    listed_total = cumulative[-1] if cumulative else 0.0
+    unlisted = count - len(listed)
+    total = unlisted + listed_total
+    if total <= 0:
+        logger.warning("语句轮换: 所有语句的权重都为 0，改为均匀随机选择")
+        while True:
+            yield random.randrange(count)
+
+    # 列出的语句占多数时直接记录其余语句的下标，避免拒绝采样反复落空
+    others = [i for i in range(count) if i not in listed] if len(listed) > count // 2 else None
+    while True:
+        pick = random.random() * total
+        if pick < unlisted:
+            if others is not None:
+                yield random.choice(others)
+                continue
+            index = random.randrange(count)
+            while index in listed:
+                index = random.randrange(count)
+            yield index
+        else:
+            position = bisect.bisect_right(cumulative, pick - unlisted)
+            yield listed_indices[min(position, len(listed_indices) - 1)]
+
+
+class MessagePrefetcher:
+    """
+    语句预取线程
+
+    后台线程按选择策略依次取出语句下标，解码语句并按弹窗的文本宽度排版，放入有界队列；
+    队列满时阻塞在 put() 上（不轮询，弹窗长时间不更换时线程也不会被唤醒）。
+    界面线程用 take() 非阻塞地取出，队列为空时本帧不更换，下一帧再试。
+    """
+
+    def __init__(self):
+        # sequential 策略下一条语句的下标（重新启动时从这里继续）
+        self.position = 0
+        self.taken = 0
+        self.starved = 0
+        self._font: Optional[QFont] = None
+        self._queue: Optional[queue.Queue] = None
+        self._stop_event: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, messages: Sequence[str], policy: str, weights: Dict[str, float],
+              capacity: int, font: QFont):
+        """
+        （重新）启动预取线程
+
+        Args:
+            messages: 语句存储（停止预取前不能关闭）
+            policy: 选择策略 sequential / shuffled / weighted
+            weights: weighted 策略的语句权重
+            capacity: 队列容量（预先准备的语句数量）
+            font: 弹窗文本字体
+        """
+        self.stop()
+        self._stop_event = threading.Event()
+
+        if policy == "sequential":
+            indices = iter_sequential(len(messages), self.position)
+        elif policy == "shuffled":
+            indices = iter_shuffled(len(messages))
+        else:
+            indices = iter_weighted(messages, dict(weights), self._stop_event)
+
+        self._font = font
+        self._queue = queue.Queue(maxsize=capacity)
+        # 排版在预取线程中进行，使用字体的副本
+        self._thread = threading.Thread(
+            target=self._produce, args=(messages, indices, QFont(font), self._queue, self._stop_event),
+            name="message-prefetch", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"语句轮换: 预取线程已启动 (策略 {policy}, 预取 {capacity} 条)")
+
+    @staticmethod
+    def _produce(messages: Sequence[str], indices: Iterator[int], font: QFont,
+                 prepared: queue.Queue, stop_event: threading.Event):
+        """预取循环 - 在独立线程中运行：取语句、解码、排版，放入队列"""
+        max_width = POPUP_WIDTH - 2 * POPUP_MARGIN
+        try:
+            for index in indices:
+                if stop_event.is_set():
+                    return
+                message = messages[index]
+                layout = ShapedTextCache._shape(message, font, max_width)
+                prepared.put((index, message, layout))
+        except Exception as e:
+            # 停止后语句存储可能已关闭，读取失败是预期的
+            if not stop_event.is_set():
+                logger.error(f"语句预取线程异常: {e}")
+
+    def take(self) -> Optional[str]:
+        """
+        取出一条准备好的语句（界面线程调用，不阻塞）
+
+        排版结果放入全局文本缓存，弹窗计算尺寸和渲染时直接命中。
+
+        Returns:
+            Optional[str]: 语句，队列为空时返回 None
+        """
+        if self._queue is None:
+            return None
+        try:
+            index, message, layout = self._queue.get_nowait()
+        except queue.Empty:
+            self.starved += 1
+            return None
+
+        text_cache.put(message, self._font, POPUP_WIDTH - 2 * POPUP_MARGIN, layout)
+        self.position = index + 1
+        self.taken += 1
+        return message
+
+    def stop(self):
+        """停止预取线程（替换或关闭语句存储前调用）"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        # 清空队列，让阻塞在 put() 上的线程继续执行并退出
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._thread.join(STOP_TIMEOUT)
+        self._thread = None
+        self._queue = None
+
+    def log_stats(self):
+        """输出轮换统计到日志"""
+        logger.info(f"语句轮换: 更换 {self.taken} 次, 预取不及 {self.starved} 次")
@@ -0,0 +1,218 @@
+"""
+关心语句存储模块
+小文件直接读入内存；超大文件使用内存映射 + 行偏移索引，只解码实际显示的语句
+"""
+import glob
+import hashlib
+import mmap
+import os
+import random
+import shutil
+from pathlib import Path
+from typing import List, Sequence
+import numpy as np
+from loguru import logger
+
+from config import CACHE_DIR
+from startup_snapshot import startup_snapshot
+
+
+# 建立索引时每次处理的字节数（按行对齐）
+INDEX_CHUNK_SIZE = 8 * 1024 * 1024
+
+# 索引文件格式版本（格式变化时递增，旧索引自动失效）
+INDEX_VERSION = 1
+
+# ASCII 空白字符（与 str.strip 对纯空白行的判断一致）
+_WHITESPACE = np.array([9, 10, 11, 12, 13, 32], dtype=np.uint8)
+
+
+class ListMessageStore:
+    """内存中的语句列表（小文件和默认语句）"""
+
+    def __init__(self, messages: List[str]):
+        self.messages = messages
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __getitem__(self, index: int) -> str:
+        return self.messages[index]
+
+    def sample(self, count: int) -> List[str]:
+        """随机抽取 count 条（不重复，数量不足时全部返回）"""
+        return random.sample(self.messages, min(count, len(self.messages)))
+
+    def close(self):
+        """释放资源（内存列表无需处理）"""
+
+
+class MappedMessageStore:
+    """
+    内存映射的语句文件
+
+    文件本身通过 mmap 按需分页读取，行偏移索引 (start, end) 以 .npy 形式缓存在
+    CACHE_DIR 中（以文件大小和修改时间为键），再次启动时以只读映射方式加载，
+    不需要重新扫描文件。只有被访问的语句才会被解码为字符串。
+
+    映射的不是语句文件本身，而是它在 CACHE_DIR 中的私有副本（同样以大小和修改时间为键，
+    文件未变化时直接复用）：Windows 上被映射的文件不能写入，编辑器无法保存；Linux 上
+    文件被原地截断后访问映射会触发 SIGBUS。程序运行期间语句文件可以随意修改，
+    修改后由文件监听重新加载。副本占用与语句文件相同的磁盘空间；无法创建副本时直接映射原文件。
+    """
+
+    def __init__(self, file_path: Path):
+        """
+        打开语句文件
+
+        Args:
+            file_path: 语句文件路径（UTF-8，每行一条）
+        """
+        self.file_path = file_path
+        self._stat = file_path.stat()
+        self._file = open(self._private_copy(), 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = self._load_or_build_index()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self._index[index]
+        return self._mmap[int(start):int(end)].decode('utf-8', errors='replace').strip()
+
+    def sample(self, count: int) -> List[str]:
+        """随机抽取 count 条（不重复，数量不足时全部返回），不加载整个文件"""
+        indices = random.sample(range(len(self)), min(count, len(self)))
+        return [self[i] for i in indices]
+
+    def close(self):
+        """关闭内存映射和文件"""
+        self._index = np.empty((0, 2), dtype=np.uint64)
+        self._mmap.close()
+        self._file.close()
+
+    def _index_prefix(self) -> str:
+        """同一消息文件的所有索引缓存共用的文件名前缀（文件名 + 路径哈希）"""
+        path_hash = hashlib.md5(str(self.file_path.resolve()).encode('utf-8')).hexdigest()[:12]
+        return f"{self.file_path.stem}-{path_hash}"
+
+    def _index_path(self) -> Path:
+        """索引缓存文件路径（以文件路径、大小和修改时间为键）"""
+        stat = self._stat
+        return CACHE_DIR / f"{self._index_prefix()}-v{INDEX_VERSION}-{stat.st_size}-{stat.st_mtime_ns}.idx.npy"
+
+    def _private_copy(self) -> Path:
+        """
+        语句文件在 CACHE_DIR 中的副本（以文件路径、大小和修改时间为键，不存在时复制）
+
+        Returns:
+            Path: 要映射的文件；无法创建副本时为语句文件本身
+        """
+        stat = self._stat
+        copy_path = CACHE_DIR / f"{self._index_prefix()}-{stat.st_size}-{stat.st_mtime_ns}.copy"
+        if copy_path.exists() and copy_path.stat().st_size == stat.st_size:
+            return copy_path
+
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # 先复制到临时文件再改名，中途退出不会留下不完整的副本
+            temp_path = copy_path.with_suffix('.tmp')
+            shutil.copyfile(self.file_path, temp_path)
+            os.replace(temp_path, copy_path)
+        except OSError as e:
+            logger.warning(f"复制语句文件失败，直接映射原文件: {e}")
+            return self.file_path
+
+        logger.info(f"复制语句文件: {copy_path.name} ({stat.st_size / 1024 / 1024:.1f} MB)")
+        # 清理同一文件的旧副本（Windows 上仍被映射的旧副本删除失败，下次再清理）
+        for old in CACHE_DIR.glob(f"{glob.escape(self._index_prefix())}-*.copy"):
+            if old != copy_path:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+        return copy_path
+
+    def _load_or_build_index(self) -> np.ndarray:
+        """加载缓存的行索引，不存在或已过期时重新建立"""
+        index_path = self._index_path()
+
+        if index_path.exists():
+            try:
+                index = np.load(index_path, mmap_mode='r')
+                logger.info(f"使用缓存的语句索引: {index_path.name} ({len(index)} 条)")
+                return index
+            except (OSError, ValueError) as e:
+                logger.warning(f"语句索引损坏，重新建立: {e}")
+
+        index = self._build_index()
+
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # 清理同一文件的旧索引（文件名可能包含 "-v" 或通配符，前缀直接由文件名构造并转义）
+            for old in CACHE_DIR.glob(f"{glob.escape(self._index_prefix())}-v*.idx.npy"):
+                old.unlink()
+            np.save(index_path, index)
+        except OSError as e:
+            logger.warning(f"保存语句索引失败: {e}")
+
+        return index
+
+    def _build_index(self) -> np.ndarray:
+        """扫描文件建立非空行的 (start, end) 偏移索引"""
+        data = np.frombuffer(self._mmap, dtype=np.uint8)
+        size = len(data)
+        dtype = np.uint32 if size < 2 ** 32 else np.uint64
+        parts = []
+
+        position = 0
+        while position < size:
+            # 分块处理，块边界对齐到换行符之后
+            end = min(position + INDEX_CHUNK_SIZE, size)
+            if end < size:
+                newline = self._mmap.find(b'\n', end)
+                end = size if newline == -1 else newline + 1
+            chunk = data[position:end]
+
+            newlines = np.flatnonzero(chunk == 10)
+            starts = np.concatenate(([0], newlines + 1))
+            ends = np.concatenate((newlines, [len(chunk)]))
+            valid = starts < len(chunk)
+            starts, ends = starts[valid], ends[valid]
+
+            # 过滤空行和纯空白行
+            non_space = ~np.isin(chunk, _WHITESPACE)
+            counts = np.add.reduceat(non_space, starts, dtype=np.int64)
+            keep = (ends > starts) & (counts > 0)
+
+            parts.append(np.stack((starts[keep], ends[keep]), axis=1).astype(dtype) + dtype(position))
+            position = end
+
+        index = np.concatenate(parts) if parts else np.empty((0, 2), dtype=dtype)
+        logger.info(f"建立语句索引: {len(index)} 条, 文件 {size / 1024 / 1024:.1f} MB")
+        return index
+
+
+def open_message_store(file_path: Path, mmap_threshold: int) -> Sequence[str]:
+    """
+    打开语句文件
+
+    Args:
+        file_path: 语句文件路径
+        mmap_threshold: 文件大小达到该字节数时使用内存映射，否则整体读入内存
+
+    Returns:
+        支持 len()、下标访问和 sample() 的语句存储
+    """
+    stat = file_path.stat()
+    if stat.st_size < mmap_threshold:
+        # 文件未变化时直接使用启动快照中的语句列表
+        messages = startup_snapshot.messages(file_path)
+        if messages is None:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                messages = [line.strip() for line in f if line.strip()]
+            startup_snapshot.set_messages(file_path, (stat.st_mtime_ns, stat.st_size), messages)
+        return ListMessageStore(messages)
+
+    return MappedMessageStore(file_path)
@@ -0,0 +1,295 @@
+"""
+弹窗动画引擎
+所有弹窗的动画状态（阶段、进度、透明度、缩放、位置）存放在连续的 NumPy 数组中，
+每帧一次向量化推进；不依赖 Qt，可以脱离界面做确定性的模拟和性能分析
+"""
+from typing import Dict, List, NamedTuple
+import numpy as np
+
+from heart_trajectory import HeartTrajectory
+
+
+# 弹窗动画阶段
+STATE_PENDING = 0      # 等待启动延迟
+STATE_FADING_IN = 1    # 淡入中
+STATE_MOVING = 2       # 沿轨迹运动
+STATE_FADING_OUT = 3   # 淡出中
+STATE_CLOSED = 4       # 已关闭（等待显示层回收）
+STATE_FREE = 5         # 空闲行（未分配给弹窗）
+
+# 动画参数（基于单调时钟，与实际帧率无关）
+FADE_DURATION = 0.38            # 淡入/淡出时长（秒）
+MAX_OPACITY = 0.95
+
+# 每行的状态数组：(名称, 类型)
+_COLUMNS = (
+    ("state", np.int8),
+    ("ring", np.int32),          # 所在轨迹的编号
+    ("progress", np.float64),
+    ("opacity", np.float64),
+    ("scale", np.float64),
+    ("x", np.float64),           # 弹窗中心坐标
+    ("y", np.float64),
+    ("appear_at", np.float64),   # 单调时钟到达该时刻后开始淡入
+    ("phase_start", np.float64), # 当前阶段开始的时刻（秒）
+    ("move_progress", np.float64),  # 开始运动时的进度
+    ("fade_from", np.float64),   # 开始淡出时的透明度
+    ("rotate_at", np.float64),   # 下次更换语句的时刻（NaN 表示尚未安排）
+)
+
+
+class FrameUpdate(NamedTuple):
+    """一帧推进的结果（各项为行号数组），显示层只需更新这些行对应的弹窗"""
+    started: np.ndarray    # 本帧开始淡入（需要显示）
+    faded: np.ndarray      # 透明度变化
+    moved: np.ndarray      # 位置变化
+    rescaled: np.ndarray   # 脉动缩放跨越了缓存档位（需要重绘）
+    closed: np.ndarray     # 本帧淡出完成
+
+
+class PopupEngine:
+    """
+    弹窗动画引擎（数组结构体）
+
+    每个弹窗占一行，行号在弹窗存活期间不变，释放后复用。状态只记录阶段和阶段开始时刻，
+    进度、透明度由 step() 根据传入的时刻计算：掉帧不会让动画变慢，各弹窗之间也不会漂移，
+    相同的时刻序列总是得到相同的结果。
+    """
+
+    def __init__(self, capacity: int = 64, scale_step: float = 0.01):
+        """
+        初始化引擎
+
+        Args:
+            capacity: 初始行数（不够时按倍数扩容）
+            scale_step: 脉动缩放的档位步长（跨越档位时才需要重绘）
+        """
+        self.scale_step = scale_step
+        self.capacity = 0
+        self.count = 0   # 使用过的行数（之后的行从未分配）
+        self.live = 0    # 已分配的行数
+        self._free: List[int] = []
+        self._trajectories: List[HeartTrajectory] = []
+        self._rings: Dict[int, int] = {}
+        self._grow(capacity)
+
+    def __len__(self) -> int:
+        return self.live
+
+    def _grow(self, capacity: int):
+        """扩容到 capacity 行（保留现有数据）"""
+        for name, dtype in _COLUMNS:
+            column = np.zeros(capacity, dtype=dtype)
+            if self.capacity:
+                column[:self.capacity] = getattr(self, name)
+            setattr(self, name, column)
+        self.state[self.capacity:] = STATE_FREE
+        self.capacity = capacity
+
+    def _ring(self, trajectory: HeartTrajectory) -> int:
+        """轨迹的编号（首次使用时登记）"""
+        ring = self._rings.get(id(trajectory))
+        if ring is None:
+            ring = len(self._trajectories)
+            self._trajectories.append(trajectory)
+            self._rings[id(trajectory)] = ring
+        return ring
+
+    def add(self, trajectory: HeartTrajectory, start_progress: float, appear_at: float) -> int:
+        """
+        添加一个等待出现的弹窗
+
+        Args:
+            trajectory: 所在的爱心轨迹
+            start_progress: 起始进度 (0.0-1.0)
+            appear_at: 开始淡入的单调时钟时刻（秒）
+
+        Returns:
+            int: 行号
+        """
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self.count == self.capacity:
+                self._grow(self.capacity * 2)
+            row = self.count
+            self.count += 1
+
+        self.state[row] = STATE_PENDING
+        self.ring[row] = self._ring(trajectory)
+        self.progress[row] = start_progress
+        self.opacity[row] = 0.0
+        self.scale[row] = 1.0
+        self.x[row], self.y[row] = trajectory.get_point_at_progress(start_progress)
+        self.appear_at[row] = appear_at
+        self.phase_start[row] = 0.0
+        self.move_progress[row] = start_progress
+        self.fade_from[row] = 0.0
+        self.rotate_at[row] = np.nan
+        self.live += 1
+        return row
+
+    def release(self, row: int):
+        """释放一行（弹窗已回收），全部释放后重置引擎"""
+        self.state[row] = STATE_FREE
+        self._free.append(row)
+        self.live -= 1
+        if self.live == 0:
+            self.clear()
+
+    def clear(self):
+        """释放所有行"""
+        self.state[:self.count] = STATE_FREE
+        self.count = 0
+        self.live = 0
+        self._free.clear()
+        self._trajectories.clear()
+        self._rings.clear()
+
+    def fade_out(self, row: int, now: float) -> bool:
+        """
+        开始淡出
+
+        Returns:
+            bool: 尚未出现的弹窗直接关闭时为 True
+        """
+        state = self.state[row]
+        if state == STATE_PENDING:
+            self.state[row] = STATE_CLOSED
+            return True
+        if state not in (STATE_FADING_OUT, STATE_CLOSED, STATE_FREE):
+            self.state[row] = STATE_FADING_OUT
+            self.phase_start[row] = now
+            self.fade_from[row] = self.opacity[row]
+        return False
+
+    def close(self, row: int):
+        """立即关闭（不淡出）"""
+        if self.state[row] != STATE_FREE:
+            self.state[row] = STATE_CLOSED
+
+    def current_progress(self, row: int, now: float, lap_duration: float) -> float:
+        """此刻的进度（运动中的弹窗按时钟计算，不必等到下一帧）"""
+        if self.state[row] == STATE_MOVING:
+            return float((self.move_progress[row] + (now - self.phase_start[row]) / lap_duration) % 1.0)
+        return float(self.progress[row])
+
+    def rebase(self, now: float, lap_duration: float):
+        """以当前进度为起点重新计时（修改圈速前调用，避免跳动）"""
+        moving = np.flatnonzero(self.state[:self.count] == STATE_MOVING)
+        self.move_progress[moving] = (
+            self.move_progress[moving] + (now - self.phase_start[moving]) / lap_duration
+        ) % 1.0
+        self.phase_start[moving] = now
+
+    def reset_scale(self) -> np.ndarray:
+        """
+        所有弹窗恢复原始大小（关闭脉动时调用）
+
+        Returns:
+            np.ndarray: 缩放跨越了档位、需要重绘的行
+        """
+        count = self.count
+        live = np.flatnonzero(self.state[:count] != STATE_FREE)
+        changed = live[self._bucket(self.scale[live]) != self._bucket(1.0)]
+        self.scale[live] = 1.0
+        return changed
+
+    def _bucket(self, scale):
+        """缩放系数所在的档位"""
+        return np.rint(np.asarray(scale) / self.scale_step)
+
+    def step(self, now: float, lap_duration: float, pulse: bool = True) -> FrameUpdate:
+        """
+        将所有弹窗推进到时刻 now
+
+        各阶段按顺序处理，同一帧内可以连续跨越多个阶段（例如淡入完成后立即开始运动），
+        每个阶段的开始时刻都按精确的理论时刻计算，与帧的采样时刻无关。
+
+        Args:
+            now: 单调时钟（秒）
+            lap_duration: 绕轨迹一圈的时长（秒）
+            pulse: 是否更新脉动缩放
+
+        Returns:
+            FrameUpdate: 本帧需要更新显示的行
+        """
+        count = self.count
+        state = self.state[:count]
+
+        # 到达出现时刻：开始淡入
+        started = np.flatnonzero((state == STATE_PENDING) & (self.appear_at[:count] <= now))
+        state[started] = STATE_FADING_IN
+        self.phase_start[started] = self.appear_at[started]
+
+        # 淡入：完成后从淡入结束的精确时刻开始运动
+        fading_in = np.flatnonzero(state == STATE_FADING_IN)
+        elapsed = now - self.phase_start[fading_in]
+        done = elapsed >= FADE_DURATION
+        finished = fading_in[done]
+        state[finished] = STATE_MOVING
+        self.phase_start[finished] += FADE_DURATION
+        self.move_progress[finished] = self.progress[finished]
+        self.opacity[fading_in] = np.where(done, MAX_OPACITY, MAX_OPACITY * elapsed / FADE_DURATION)
+
+        # 淡出
+        fading_out = np.flatnonzero(state == STATE_FADING_OUT)
+        elapsed = now - self.phase_start[fading_out]
+        done = elapsed >= FADE_DURATION
+        closed = fading_out[done]
+        state[closed] = STATE_CLOSED
+        self.opacity[fading_out] = np.where(done, 0.0, self.fade_from[fading_out] * (1 - elapsed / FADE_DURATION))
+
+        # 运动：进度由运动时长决定，一圈恰好 lap_duration 秒
+        moved = np.flatnonzero(state == STATE_MOVING)
+        progress = (self.move_progress[moved] + (now - self.phase_start[moved]) / lap_duration) % 1.0
+        self.progress[moved] = progress
+        scales = self._locate(moved, progress)
+
+        rescaled = moved[:0]
+        if pulse:
+            rescaled = moved[self._bucket(self.scale[moved]) != self._bucket(scales)]
+            self.scale[moved] = scales
+
+        return FrameUpdate(started, np.concatenate((fading_in, fading_out)), moved, rescaled, closed)
+
+    def _locate(self, rows: np.ndarray, progress: np.ndarray) -> np.ndarray:
+        """按进度更新各行的坐标（每条轨迹一次批量查询），返回脉动缩放系数"""
+        scales = np.empty(len(rows))
+        if not len(rows):
+            return scales
+
+        rings = self.ring[rows]
+        for ring in np.unique(rings):
+            select = slice(None) if len(self._trajectories) == 1 else rings == ring
+            xs, ys, ring_scales = self._trajectories[ring].get_points_and_scales(progress[select])
+            self.x[rows[select]] = xs
+            self.y[rows[select]] = ys
+            scales[select] = ring_scales
+        return scales
+
+    def rotations_due(self, now: float, interval: float) -> np.ndarray:
+        """
+        运动中、到达更换语句时刻的行
+
+        尚未安排的行从开始运动的时刻起每隔 interval 秒更换一次（轮换间隔等于圈速时，
+        弹窗正好在回到起点时更换）；各弹窗开始运动的时刻不同，更换自然错开。
+        """
+        moving = self.rows_in_state(STATE_MOVING)
+        unset = moving[np.isnan(self.rotate_at[moving])]
+        self.rotate_at[unset] = now + interval - (now - self.phase_start[unset]) % interval
+        return moving[self.rotate_at[moving] <= now]
+
+    def schedule_rotation(self, rows: np.ndarray, now: float, interval: float):
+        """已更换语句的行安排下一次更换（错过多次时从现在起计时）"""
+        self.rotate_at[rows] += interval
+        late = rows[self.rotate_at[rows] <= now]
+        self.rotate_at[late] = now + interval
+
+    def reset_rotation(self):
+        """取消所有已安排的更换（轮换配置变化后按新的间隔重新安排）"""
+        self.rotate_at[:self.count] = np.nan
+
+    def rows_in_state(self, *states: int) -> np.ndarray:
+        """处于给定阶段的行"""
+        return np.flatnonzero(np.isin(self.state[:self.count], states))
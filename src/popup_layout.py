@@ -0,0 +1,124 @@
+"""
+弹窗布局模块
+按爱心轨迹和弹窗尺寸评估弹窗之间的重叠，选择重叠较少的爱心大小
+"""
+import time
+from typing import List, Tuple
+import numpy as np
+from loguru import logger
+
+from heart_trajectory import HeartTrajectory
+from spatial_index import overlapping_pairs
+
+
+# 评估重叠时采样的整体相位数：所有弹窗以相同的进度速度运动，相对间隔不变，
+# 一种布局的好坏取决于它在一整圈各个相位上的平均重叠
+LAYOUT_PHASES = 16
+
+# 候选的爱心大小数量（在默认大小和屏幕能容纳的最大大小之间均匀取值）
+LAYOUT_CANDIDATES = 8
+
+# 重叠不超过最小重叠的 (1 + LAYOUT_TOLERANCE) 倍时，选择更小的爱心
+LAYOUT_TOLERANCE = 0.1
+
+# 超过该数量时重叠无法避免，不再逐个评估，直接使用最大的爱心
+SPREAD_MAX_POPUPS = 200
+
+
+def ring_counts(trajectories: List[HeartTrajectory], num_popups: int) -> List[int]:
+    """按轨迹周长比例把弹窗分配到各圈（取整剩下的弹窗分给外圈）"""
+    total_length = sum(t.length for t in trajectories)
+    counts = [int(num_popups * t.length / total_length) for t in trajectories]
+    for ring in range(num_popups - sum(counts)):
+        counts[ring % len(counts)] += 1
+    return counts
+
+
+def max_heart_scale(screen_width: int, screen_height: int, width: float, height: float) -> float:
+    """弹窗完全留在屏幕内时，以屏幕中心为中心的爱心最大 scale"""
+    unit = HeartTrajectory(scale=1.0)
+    unit.generate_points(64)
+    left, right = -unit._xs.min(), unit._xs.max()
+    top, bottom = -unit._ys.min(), unit._ys.max()
+
+    half_width = screen_width / 2 - width / 2
+    half_height = screen_height / 2 - height / 2
+    return max(0.0, min(half_width / left, half_width / right, half_height / top, half_height / bottom))
+
+
+def overlap_cost(trajectories: List[HeartTrajectory], counts: List[int], width: float, height: float,
+                 phases: int = LAYOUT_PHASES) -> float:
+    """
+    各圈弹窗均匀分布时，运动一整圈的平均重叠面积（像素²）
+
+    所有相位的所有弹窗坐标一次算出，各相位在 y 方向错开后做一次空间哈希，
+    不会跨相位配对。
+    """
+    shifts = np.arange(phases) / phases
+    xs_parts, ys_parts = [], []
+    for trajectory, count in zip(trajectories, counts):
+        if count == 0:
+            continue
+        progress = (np.arange(count) / count)[None, :] + shifts[:, None]
+        xs, ys, _ = trajectory.get_points_and_scales(progress.ravel())
+        xs_parts.append(np.asarray(xs).reshape(phases, count))
+        ys_parts.append(np.asarray(ys).reshape(phases, count))
+
+    xs = np.concatenate(xs_parts, axis=1)
+    ys = np.concatenate(ys_parts, axis=1)
+    spacing = ys.max() - ys.min() + 2 * height
+    ys = ys + np.arange(phases)[:, None] * spacing
+
+    _, _, area = overlapping_pairs(xs.ravel(), ys.ravel(), width, height)
+    return float(area.sum()) / phases
+
+
+def choose_heart_scale(screen_width: int, screen_height: int, base_scale: float, num_popups: int,
+                       ring_factors: List[float], width: float, height: float,
+                       num_points: int) -> Tuple[float, float, float]:
+    """
+    在默认大小和屏幕能容纳的最大大小之间选择爱心大小
+
+    弹窗沿轨迹等距匀速运动，重叠只取决于弹窗间距（轨迹周长 / 弹窗数量）和轨迹形状，
+    因此通过调整爱心大小减少重叠；重叠相差不大时优先选择更小的爱心。
+
+    Args:
+        screen_width, screen_height: 屏幕尺寸
+        base_scale: 默认爱心大小
+        num_popups: 弹窗数量
+        ring_factors: 各圈相对最外圈的缩放比例
+        width, height: 弹窗尺寸
+        num_points: 轨迹点数
+
+    Returns:
+        (scale, base_cost, cost): 选中的爱心大小，以及默认大小和选中大小的平均重叠面积
+    """
+    largest = max_heart_scale(screen_width, screen_height, width, height)
+    if largest <= base_scale:
+        return base_scale, 0.0, 0.0
+    if num_popups > SPREAD_MAX_POPUPS:
+        logger.info(f"弹窗布局: 弹窗数量超过 {SPREAD_MAX_POPUPS}，直接使用最大的爱心 scale {largest:.0f}")
+        return largest, 0.0, 0.0
+
+    started = time.perf_counter()
+    center_x = screen_width / 2
+    center_y = screen_height / 2
+    costs = []
+    candidates = np.linspace(base_scale, largest, LAYOUT_CANDIDATES)
+    for scale in candidates:
+        trajectories = []
+        for factor in ring_factors:
+            trajectory = HeartTrajectory(scale=scale * factor, center_x=center_x, center_y=center_y)
+            trajectory.generate_points(num_points)
+            trajectories.append(trajectory)
+        costs.append(overlap_cost(trajectories, ring_counts(trajectories, num_popups), width, height))
+
+    limit = min(costs) * (1 + LAYOUT_TOLERANCE)
+    chosen = next(i for i, cost in enumerate(costs) if cost <= limit)
+
+    logger.info(
+        f"弹窗布局: 爱心 scale {base_scale:.0f} -> {candidates[chosen]:.0f}, "
+        f"平均重叠面积 {costs[0]:.0f} -> {costs[chosen]:.0f} px², "
+        f"耗时 {(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+    return float(candidates[chosen]), costs[0], costs[chosen]
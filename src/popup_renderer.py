@@ -0,0 +1,383 @@
+"""
+弹窗渲染模块
+预渲染弹窗（背景 + 文本）到 QPixmap 并缓存，绘制时直接贴图；
+文本排版（含中文和 emoji 的字形整形）按消息缓存为 QStaticText，只做一次
+"""
+import math
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from PyQt5.QtGui import (
+    QPainter, QLinearGradient, QColor, QPainterPath, QFont, QFontMetricsF, QPixmap, QImage,
+    QStaticText, QTextOption, QTransform
+)
+from loguru import logger
+
+from config import config
+
+
+# 弹窗尺寸（固定大小，稍微大一点，方便阅读）
+POPUP_WIDTH = 320
+POPUP_HEIGHT = 120
+POPUP_MARGIN = 18
+
+# 按内容调整大小时的尺寸范围（宽度上限为 POPUP_WIDTH）
+POPUP_MIN_WIDTH = 140
+POPUP_MIN_HEIGHT = 64
+POPUP_MAX_HEIGHT = 180
+
+# 预排版文本缓存的最大条目数（每条只有排版结果，远小于一张 QPixmap）
+TEXT_CACHE_SIZE = 2048
+
+# reserve() 预留容量的上限：每张图像约 150 KB（高分屏上为数倍），超过时宁可淘汰重绘也不无限占用内存
+# （开启脉动时最多 100 个弹窗 × 5 个缩放档位，在上限之内）
+PIXMAP_RESERVE_LIMIT = 512
+
+# 脉动缩放的量化步长（0.98-1.02 之间只需 5 个档位）
+SCALE_STEP = 0.01
+
+# 主题颜色解析缓存：主题名 -> (bg_start, bg_end, text, shadow)
+_theme_colors: Dict[str, Tuple[QColor, QColor, QColor, QColor]] = {}
+
+
+def theme_colors(color_theme: dict) -> Tuple[QColor, QColor, QColor, QColor]:
+    """获取主题对应的 QColor（每个主题只解析一次十六进制颜色）"""
+    colors = _theme_colors.get(color_theme['name'])
+    if colors is None:
+        colors = (
+            QColor(color_theme['bg_start']),
+            QColor(color_theme['bg_end']),
+            QColor(color_theme['text']),
+            QColor(color_theme['shadow']),
+        )
+        _theme_colors[color_theme['name']] = colors
+    return colors
+
+
+def quantize_scale(scale: float) -> float:
+    """将缩放系数量化到最近的档位"""
+    return round(round(scale / SCALE_STEP) * SCALE_STEP, 4)
+
+
+def paint_popup_background(painter: QPainter, width: int, height: int,
+                           color_theme: dict, scale: float = 1.0):
+    """
+    在 (0, 0, width, height) 区域绘制弹窗背景（圆角矩形 + 渐变 + 边框）
+
+    Args:
+        painter: 已设置好透明度和平移的画笔
+        width: 弹窗宽度
+        height: 弹窗高度
+        color_theme: 颜色主题字典
+        scale: 以中心为原点的缩放系数
+    """
+    bg_start, bg_end, _, shadow = theme_colors(color_theme)
+
+    # 应用缩放
+    if scale != 1.0:
+        painter.save()
+        center_x = width / 2
+        center_y = height / 2
+        painter.translate(center_x, center_y)
+        painter.scale(scale, scale)
+        painter.translate(-center_x, -center_y)
+
+    # 创建圆角矩形路径
+    path = QPainterPath()
+    path.addRoundedRect(0, 0, width, height, 15, 15)
+
+    # 创建线性渐变
+    gradient = QLinearGradient(0, 0, 0, height)
+    gradient.setColorAt(0, bg_start)
+    gradient.setColorAt(1, bg_end)
+
+    # 填充背景
+    painter.fillPath(path, gradient)
+
+    # 绘制边框
+    painter.setPen(shadow)
+    painter.drawPath(path)
+
+    if scale != 1.0:
+        painter.restore()
+
+
+def paint_popup(painter: QPainter, width: int, height: int, color_theme: dict,
+                message: str, font: QFont, scale: float = 1.0):
+    """绘制完整弹窗：背景 + 居中自动换行的文本（使用预排版的文本）"""
+    paint_popup_background(painter, width, height, color_theme, scale)
+
+    # 与 popup_size() 共用按标准宽度排版的结果，放不下时才按实际宽度重新排版
+    static_text, text_width, text_height = text_cache.get(message, font, POPUP_WIDTH - 2 * POPUP_MARGIN)
+    if text_width > width - 2 * POPUP_MARGIN:
+        static_text, text_width, text_height = text_cache.get(message, font, width - 2 * POPUP_MARGIN)
+    painter.setFont(font)
+    painter.setPen(theme_colors(color_theme)[2])
+    painter.drawStaticText(QPointF((width - text_width) / 2, (height - text_height) / 2), static_text)
+
+
+def render_popup_image(color_theme: dict, message: str, font: QFont, scale: float,
+                       width: int, height: int, ratio: float, antialiasing: bool = True) -> QImage:
+    """
+    渲染一个弹窗到 QImage（预乘 alpha 的 RGBA8888，可直接上传为 OpenGL 纹理）
+
+    Args:
+        ratio: 设备像素比（图像按物理像素渲染）
+        antialiasing: 是否抗锯齿
+    """
+    image = QImage(math.ceil(width * ratio), math.ceil(height * ratio), QImage.Format_RGBA8888_Premultiplied)
+    image.setDevicePixelRatio(ratio)
+    image.fill(Qt.transparent)
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing, antialiasing)
+    painter.setRenderHint(QPainter.TextAntialiasing, antialiasing)
+    paint_popup(painter, width, height, color_theme, message, font, scale)
+    painter.end()
+    return image
+
+
+class ShapedTextCache:
+    """
+    预排版文本缓存 - 按 (消息, 字体, 最大宽度) 缓存排版好的 QStaticText 及其尺寸，LRU 淘汰
+
+    每条消息的换行和字形整形只做一次，之后渲染任意主题、缩放档位的弹窗图像
+    以及计算弹窗尺寸都直接复用排版结果。
+    """
+
+    def __init__(self, max_entries: int = TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._layouts: 'OrderedDict[tuple, Tuple[QStaticText, float, float]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, message: str, font: QFont, max_width: int) -> Tuple[QStaticText, float, float]:
+        """
+        获取消息的排版结果（未命中时排版一次）
+
+        Args:
+            message: 关心语句
+            font: 字体
+            max_width: 文本区域的最大宽度（超过时自动换行）
+
+        Returns:
+            Tuple: (QStaticText, 文本宽度, 文本高度)
+        """
+        key = (message, font.key(), max_width)
+
+        layout = self._layouts.get(key)
+        if layout is not None:
+            self.hits += 1
+            self._layouts.move_to_end(key)
+            return layout
+
+        self.misses += 1
+        layout = self._shape(message, font, max_width)
+        self._store(key, layout)
+        return layout
+
+    def put(self, message: str, font: QFont, max_width: int, layout: Tuple[QStaticText, float, float]):
+        """放入已完成的排版结果（语句轮换的预取线程排版，界面线程放入）"""
+        self._store((message, font.key(), max_width), layout)
+
+    def _store(self, key: tuple, layout: Tuple[QStaticText, float, float]):
+        """记录排版结果，超出容量时淘汰最久未用的条目"""
+        self._layouts[key] = layout
+        self._layouts.move_to_end(key)
+        if len(self._layouts) > self.max_entries:
+            self._layouts.popitem(last=False)
+
+    @staticmethod
+    def _shape(message: str, font: QFont, max_width: int) -> Tuple[QStaticText, float, float]:
+        """测量换行后的实际文本宽度，并按该宽度排版"""
+        bounds = QFontMetricsF(font).boundingRect(
+            QRectF(0, 0, max_width, 100000), Qt.AlignHCenter | Qt.TextWordWrap, message
+        )
+        # 多留 1px，避免按实际宽度排版时因舍入误差多换一行
+        text_width = min(max_width, math.ceil(bounds.width()) + 1)
+
+        static_text = QStaticText(message)
+        static_text.setTextFormat(Qt.PlainText)
+        static_text.setTextWidth(text_width)
+        static_text.setTextOption(QTextOption(Qt.AlignHCenter))
+        static_text.prepare(QTransform(), font)
+        return static_text, text_width, static_text.size().height()
+
+    def clear(self):
+        """清空缓存"""
+        self._layouts.clear()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {"entries": len(self._layouts), "hits": self.hits, "misses": self.misses}
+
+
+class PopupPixmapCache:
+    """弹窗预渲染缓存 - 按 (主题, 消息, 缩放档位, 尺寸) 缓存 QPixmap，LRU 淘汰"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最多缓存的 QPixmap 数量（None 表示使用配置项 pixmap_cache_size）
+        """
+        self._max_entries = max_entries
+        self._reserved = 0
+        self._pixmaps: 'OrderedDict[tuple, QPixmap]' = OrderedDict()
+        self._font = None
+        # 画质调节器降级时新渲染的图像不做抗锯齿；记录这些条目，恢复时重新渲染
+        self.antialiasing = True
+        self._aliased = set()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def configured_entries(self) -> int:
+        """配置的缓存容量（构造参数或配置项 pixmap_cache_size）"""
+        if self._max_entries is None:
+            return config.pixmap_cache_size
+        return self._max_entries
+
+    @property
+    def max_entries(self) -> int:
+        """最多缓存的 QPixmap 数量（不小于 reserve() 预留的数量）"""
+        return max(self.configured_entries, self._reserved)
+    
+    def reserve(self, entries: int):
+        """
+        按当前弹窗组合预留缓存容量，避免工作集大于缓存时每帧都在淘汰和重绘
+        
+        预留数量不超过 PIXMAP_RESERVE_LIMIT；超过配置的容量时输出警告。
+        
+        Args:
+            entries: 同时可见的不同弹窗图像数量
+        """
+        reserved = min(entries, PIXMAP_RESERVE_LIMIT)
+        configured = self.configured_entries
+        if reserved > configured and reserved != self._reserved:
+            logger.warning(
+                f"弹窗缓存需要 {entries} 项，超过配置的 pixmap_cache_size={configured}，"
+                f"预留 {reserved} 项（上限 {PIXMAP_RESERVE_LIMIT}）"
+            )
+        self._reserved = reserved
+
+    @property
+    def font(self) -> QFont:
+        """弹窗文本字体（所有弹窗共用一个实例）"""
+        if self._font is None:
+            self._font = QFont("Microsoft YaHei", 14, QFont.Bold)
+        return self._font
+
+    def get(self, color_theme: dict, message: str, scale: float = 1.0,
+            width: int = POPUP_WIDTH, height: int = POPUP_HEIGHT) -> QPixmap:
+        """
+        获取弹窗的预渲染图像（未命中时渲染一次）
+
+        Args:
+            color_theme: 颜色主题字典
+            message: 关心语句
+            scale: 脉动缩放系数（会被量化到档位）
+            width: 弹窗宽度
+            height: 弹窗高度
+
+        Returns:
+            QPixmap: 透明背景的弹窗图像
+        """
+        bucket = quantize_scale(scale)
+        key = (color_theme['name'], message, bucket, width, height)
+
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self.hits += 1
+            self._pixmaps.move_to_end(key)
+            return pixmap
+
+        self.misses += 1
+        pixmap = self._render(color_theme, message, bucket, width, height)
+        self._pixmaps[key] = pixmap
+        if not self.antialiasing:
+            self._aliased.add(key)
+        if len(self._pixmaps) > self.max_entries:
+            evicted, _ = self._pixmaps.popitem(last=False)
+            self._aliased.discard(evicted)
+        return pixmap
+
+    def set_antialiasing(self, enabled: bool):
+        """
+        开启/关闭抗锯齿（只影响之后渲染的图像）
+
+        关闭时已缓存的抗锯齿图像继续使用，不会集中重绘；
+        重新开启时丢弃关闭期间渲染的图像，下次使用时按抗锯齿重新渲染。
+        """
+        self.antialiasing = enabled
+        if enabled:
+            for key in self._aliased:
+                self._pixmaps.pop(key, None)
+            self._aliased.clear()
+
+    def _render(self, color_theme: dict, message: str, scale: float,
+                width: int, height: int) -> QPixmap:
+        """渲染一个弹窗到 QPixmap"""
+        ratio = QApplication.instance().devicePixelRatio()
+        pixmap = QPixmap(int(width * ratio), int(height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing, self.antialiasing)
+        painter.setRenderHint(QPainter.TextAntialiasing, self.antialiasing)
+        paint_popup(painter, width, height, color_theme, message, self.font, scale)
+        painter.end()
+        return pixmap
+
+    def clear(self):
+        """清空缓存"""
+        self._pixmaps.clear()
+        self._aliased.clear()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._pixmaps),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def log_stats(self):
+        """输出缓存统计到日志"""
+        stats = self.stats()
+        logger.info(
+            f"弹窗缓存: {stats['entries']}/{stats['max_entries']} 项, "
+            f"命中 {stats['hits']}, 未命中 {stats['misses']}, 命中率 {stats['hit_rate']:.1%}"
+        )
+        text_stats = text_cache.stats()
+        logger.info(
+            f"文本排版缓存: {text_stats['entries']} 项, "
+            f"命中 {text_stats['hits']}, 未命中 {text_stats['misses']}"
+        )
+
+
+# 全局缓存实例（HeartWindow 与覆盖层共用）
+text_cache = ShapedTextCache()
+popup_cache = PopupPixmapCache()
+
+
+def popup_size(message: str) -> Tuple[int, int]:
+    """
+    弹窗尺寸：固定大小，或按预排版的文本尺寸调整（popup_size_mode = "content"）
+
+    Returns:
+        Tuple: (宽度, 高度)
+    """
+    if config.popup_size_mode == "fixed":
+        return POPUP_WIDTH, POPUP_HEIGHT
+
+    _, text_width, text_height = text_cache.get(message, popup_cache.font, POPUP_WIDTH - 2 * POPUP_MARGIN)
+    width = max(POPUP_MIN_WIDTH, math.ceil(text_width) + 2 * POPUP_MARGIN)
+    height = min(POPUP_MAX_HEIGHT, max(POPUP_MIN_HEIGHT, math.ceil(text_height) + 2 * POPUP_MARGIN))
+    return width, height
@@ -0,0 +1,176 @@
+"""
+自适应画质调节
+根据实测的帧间隔和每帧耗时逐级降低画质（关闭脉动 → 关闭抗锯齿 → 降低帧率 → 减少弹窗），
+余量恢复后再逐级恢复；降级和恢复都需要持续一段时间才生效（滞回），避免来回切换
+"""
+from typing import Callable, Optional
+from loguru import logger
+
+from config import config
+from frame_metrics import frame_metrics
+
+
+# 画质档位（越大画质越低，每一档包含之前所有档位的降级）
+QUALITY_FULL = 0          # 完整画质
+QUALITY_NO_PULSE = 1      # 关闭脉动缩放
+QUALITY_NO_ANTIALIAS = 2  # 新渲染的弹窗图像不做抗锯齿
+QUALITY_LOW_FPS = 3       # 帧时钟降到 quality_low_fps
+QUALITY_FEWER_POPUPS = 4  # 只保留 quality_popup_fraction 比例的弹窗
+
+QUALITY_NAMES = ["完整画质", "关闭脉动", "关闭抗锯齿", "降低帧率", "减少弹窗"]
+
+# 每次评估的统计窗口（秒）
+EVALUATE_INTERVAL = 0.5
+
+# 刚恢复就再次降级时，恢复所需的持续时间加倍（最多为配置值的该倍数）
+RESTORE_BACKOFF_MAX = 8
+
+
+class QualityGovernor:
+    """
+    画质调节器
+
+    帧时钟每帧调用 observe()：平均帧间隔明显超过当前目标间隔说明跟不上，
+    每帧耗时（状态更新 + 绘制）远低于完整帧率的帧预算说明有余量。
+    恢复的判断以完整帧率为准，因此降低帧率、减少弹窗后也能正确判断能否恢复。
+    """
+
+    def __init__(self, on_change: Optional[Callable[[int, int], None]] = None):
+        """
+        初始化调节器
+
+        Args:
+            on_change: 档位变化时调用，参数为 (旧档位, 新档位)
+        """
+        self.on_change = on_change
+        self.level = QUALITY_FULL
+        self._last_tick: Optional[float] = None
+        self._window_start: Optional[float] = None
+        self._frames = 0
+        self._interval_sum = 0.0
+        self._intervals = 0
+        self._work_sum = 0.0
+        self._over = 0.0          # 持续跟不上的时长（秒）
+        self._under = 0.0         # 持续有余量的时长（秒）
+        self._backoff = 1
+        self._restored_at: Optional[float] = None
+
+    @property
+    def pulse_allowed(self) -> bool:
+        return self.level < QUALITY_NO_PULSE
+
+    @property
+    def antialiasing(self) -> bool:
+        return self.level < QUALITY_NO_ANTIALIAS
+
+    def frame_interval_ms(self) -> int:
+        """当前档位的帧时钟间隔（毫秒）"""
+        fps = config.target_fps
+        if self.level >= QUALITY_LOW_FPS:
+            fps = min(fps, config.quality_low_fps)
+        return max(1, round(1000 / fps))
+
+    def popup_count(self, requested: int) -> int:
+        """当前档位下实际显示的弹窗数量"""
+        if self.level >= QUALITY_FEWER_POPUPS:
+            return max(1, round(requested * config.quality_popup_fraction))
+        return requested
+
+    def observe(self, now: float, update_seconds: float):
+        """
+        记录一帧（帧时钟回调末尾调用）
+
+        Args:
+            now: 本帧开始时的单调时钟（秒）
+            update_seconds: 本帧状态更新耗时（秒）
+        """
+        if not config.adaptive_quality:
+            return
+
+        if self._last_tick is None:
+            # 时钟刚启动：从这一帧开始计时，丢弃之前累计的绘制耗时
+            self._last_tick = self._window_start = now
+            frame_metrics.paint_seconds = 0.0
+            return
+
+        self._interval_sum += now - self._last_tick
+        self._intervals += 1
+        self._last_tick = now
+        self._frames += 1
+        self._work_sum += update_seconds
+
+        if now - self._window_start >= EVALUATE_INTERVAL:
+            self._evaluate(now)
+
+    def stop(self):
+        """帧时钟停止时调用，避免把停止期间算作一次超长帧"""
+        self._last_tick = None
+        self._reset_window()
+
+    def reset(self):
+        """恢复完整画质并清空统计（关闭自适应画质时调用）"""
+        self.stop()
+        self._over = self._under = 0.0
+        self._backoff = 1
+        self._set_level(QUALITY_FULL)
+
+    def _reset_window(self):
+        """开始新的统计窗口"""
+        self._window_start = self._last_tick
+        self._frames = 0
+        self._interval_sum = 0.0
+        self._intervals = 0
+        self._work_sum = 0.0
+
+    def _evaluate(self, now: float):
+        """统计窗口结束：判断是否跟不上或有余量，持续足够久后调整档位"""
+        duration = now - self._window_start
+        mean_interval = self._interval_sum / self._intervals
+        work = (self._work_sum + frame_metrics.paint_seconds) / self._frames
+        frame_metrics.paint_seconds = 0.0
+        self._reset_window()
+
+        target = self.frame_interval_ms() / 1000
+        budget = 1 / config.target_fps
+        if mean_interval > target * config.quality_degrade_ratio:
+            self._over += duration
+            self._under = 0.0
+        elif work < budget * config.quality_restore_ratio and mean_interval < target * 1.1:
+            self._under += duration
+            self._over = 0.0
+        else:
+            self._over = self._under = 0.0
+
+        if self._over >= config.quality_degrade_seconds and self.level < QUALITY_FEWER_POPUPS:
+            # 刚恢复就又跟不上：下次恢复前等待更久
+            if self._restored_at is not None and now - self._restored_at < self._restore_hold() * 2:
+                self._backoff = min(self._backoff * 2, RESTORE_BACKOFF_MAX)
+            self._over = 0.0
+            logger.warning(
+                f"画质调节: 帧间隔 {mean_interval * 1000:.1f} ms 超过目标 {target * 1000:.1f} ms，"
+                f"降级为「{QUALITY_NAMES[self.level + 1]}」"
+            )
+            self._set_level(self.level + 1)
+        elif self._under >= self._restore_hold() and self.level > QUALITY_FULL:
+            self._under = 0.0
+            self._restored_at = now
+            logger.info(
+                f"画质调节: 每帧耗时 {work * 1000:.2f} ms，余量充足，"
+                f"恢复为「{QUALITY_NAMES[self.level - 1]}」"
+            )
+            self._set_level(self.level - 1)
+        elif self._under >= self._restore_hold() * 4:
+            # 长时间稳定后取消退避
+            self._backoff = 1
+
+    def _restore_hold(self) -> float:
+        """恢复一个档位需要持续有余量的时长（秒）"""
+        return config.quality_restore_seconds * self._backoff
+
+    def _set_level(self, level: int):
+        """切换档位并通知管理器"""
+        if level == self.level:
+            return
+        old, self.level = self.level, level
+        if self.on_change is not None:
+            self.on_change(old, level)
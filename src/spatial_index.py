@@ -0,0 +1,191 @@
+"""
+空间索引模块
+均匀网格索引，用于覆盖层中大量弹窗的点击命中测试；以及向量化的空间哈希重叠检测
+"""
+from typing import Dict, Hashable, List, Set, Tuple
+import numpy as np
+
+# 网格坐标范围 (col0, row0, col1, row1)，两端都包含
+CellSpan = Tuple[int, int, int, int]
+
+# 空间哈希中需要检查的相邻单元（只取一半方向，每对矩形只检查一次）
+_FORWARD_NEIGHBOURS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class UniformGridIndex:
+    """
+    均匀网格空间索引
+
+    每个条目按其矩形覆盖的网格单元登记。弹窗每帧只移动几个像素，
+    大多数帧覆盖的单元不变，因此 update() 只在单元范围变化时才修改网格。
+    """
+
+    def __init__(self, cell_size: int = 128):
+        """
+        初始化索引
+
+        Args:
+            cell_size: 网格单元边长（像素），与弹窗尺寸同一量级时效率最高
+        """
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Set[Hashable]] = {}
+        self._spans: Dict[Hashable, CellSpan] = {}
+        self._rects: Dict[Hashable, Tuple[int, int, int, int]] = {}
+        self._order: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def _span(self, x: int, y: int, width: int, height: int) -> CellSpan:
+        """矩形覆盖的网格范围"""
+        size = self.cell_size
+        return (x // size, y // size, (x + width - 1) // size, (y + height - 1) // size)
+
+    def update(self, item: Hashable, x: int, y: int, width: int, height: int, order: int = 0):
+        """
+        插入或更新条目
+
+        Args:
+            item: 条目（需可哈希）
+            x, y, width, height: 条目矩形
+            order: 绘制顺序（越大越靠上，命中测试时优先）
+        """
+        self._rects[item] = (x, y, width, height)
+        self._order[item] = order
+
+        span = self._span(x, y, width, height)
+        old = self._spans.get(item)
+        if old == span:
+            return
+        if old is not None:
+            self._unregister(item, old)
+        self._register(item, span)
+        self._spans[item] = span
+
+    def remove(self, item: Hashable):
+        """移除条目（不存在时忽略）"""
+        span = self._spans.pop(item, None)
+        if span is None:
+            return
+        self._unregister(item, span)
+        del self._rects[item]
+        del self._order[item]
+
+    def retain(self, items: Set[Hashable]):
+        """只保留给定的条目，其余全部移除"""
+        for item in [i for i in self._spans if i not in items]:
+            self.remove(item)
+
+    def clear(self):
+        """清空索引"""
+        self._cells.clear()
+        self._spans.clear()
+        self._rects.clear()
+        self._order.clear()
+
+    def _register(self, item: Hashable, span: CellSpan):
+        """在范围内的所有网格单元中登记条目"""
+        col0, row0, col1, row1 = span
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                self._cells.setdefault((col, row), set()).add(item)
+
+    def _unregister(self, item: Hashable, span: CellSpan):
+        """从范围内的所有网格单元中移除条目"""
+        col0, row0, col1, row1 = span
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                cell = self._cells.get((col, row))
+                if cell is not None:
+                    cell.discard(item)
+                    if not cell:
+                        del self._cells[(col, row)]
+
+    def query_point(self, x: int, y: int) -> List[Hashable]:
+        """
+        查询包含点 (x, y) 的条目
+
+        Returns:
+            List: 按绘制顺序从上到下排列的条目
+        """
+        cell = self._cells.get((x // self.cell_size, y // self.cell_size))
+        if not cell:
+            return []
+
+        hits = []
+        for item in cell:
+            left, top, width, height = self._rects[item]
+            if left <= x < left + width and top <= y < top + height:
+                hits.append(item)
+        hits.sort(key=self._order.__getitem__, reverse=True)
+        return hits
+
+
+def overlapping_pairs(xs, ys, width, height) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    向量化空间哈希：找出所有相互重叠的矩形对
+
+    以最大矩形尺寸为单元大小做哈希，重叠的两个矩形中心所在单元最多相差一格，
+    因此每个矩形只需与自身及相邻单元中的矩形比较，整个过程没有 Python 层循环
+    （只循环 5 个相邻方向）。
+
+    Args:
+        xs, ys: 矩形中心坐标，形状 (N,)
+        width, height: 矩形尺寸（标量或形状 (N,) 的数组）
+
+    Returns:
+        (i, j, area): 重叠矩形对的下标（每对只出现一次）和重叠面积
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    widths = np.broadcast_to(np.asarray(width, dtype=np.float64), xs.shape)
+    heights = np.broadcast_to(np.asarray(height, dtype=np.float64), xs.shape)
+    count = len(xs)
+    if count < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float64)
+
+    cols = np.floor(xs / widths.max()).astype(np.int64)
+    rows = np.floor(ys / heights.max()).astype(np.int64)
+    rows -= rows.min() - 1
+    stride = int(rows.max()) + 2
+    keys = cols * stride + rows
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    firsts, seconds = [], []
+    for d_col, d_row in _FORWARD_NEIGHBOURS:
+        targets = (cols + d_col) * stride + (rows + d_row)
+        lo = np.searchsorted(sorted_keys, targets, side='left')
+        hi = np.searchsorted(sorted_keys, targets, side='right')
+        counts = hi - lo
+        total = int(counts.sum())
+        if total == 0:
+            continue
+
+        # 展开每个矩形对应的候选区间 [lo, hi)
+        first = np.repeat(np.arange(count), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(lo, counts) + offsets]
+        if d_col == 0 and d_row == 0:
+            keep = first < second
+            first, second = first[keep], second[keep]
+        firsts.append(first)
+        seconds.append(second)
+
+    if not firsts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float64)
+
+    first = np.concatenate(firsts)
+    second = np.concatenate(seconds)
+
+    half_w = widths / 2
+    half_h = heights / 2
+    overlap_x = (np.minimum(xs[first] + half_w[first], xs[second] + half_w[second])
+                 - np.maximum(xs[first] - half_w[first], xs[second] - half_w[second]))
+    overlap_y = (np.minimum(ys[first] + half_h[first], ys[second] + half_h[second])
+                 - np.maximum(ys[first] - half_h[first], ys[second] - half_h[second]))
+    hit = (overlap_x > 0) & (overlap_y > 0)
+    return first[hit], second[hit], overlap_x[hit] * overlap_y[hit]
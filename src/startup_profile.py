@@ -0,0 +1,51 @@
+"""
+启动耗时统计
+记录启动各阶段（导入、配置、日志、QApplication、首个弹窗绘制）的耗时
+"""
+import time
+from typing import List, Optional, Tuple
+from loguru import logger
+
+
+class StartupProfiler:
+    """启动阶段计时器（各阶段耗时 = 与上一个阶段结束时刻之差）"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.verbose = False
+        self.first_paint_at: Optional[float] = None
+
+    def mark(self, phase: str):
+        """记录一个阶段结束"""
+        self.phases.append((phase, time.perf_counter()))
+
+    def first_paint(self):
+        """首个弹窗绘制时调用（只有第一次生效）"""
+        if self.first_paint_at is not None:
+            return
+        self.first_paint_at = time.perf_counter()
+        self.phases.append(("首个弹窗绘制", self.first_paint_at))
+        self.report()
+
+    def elapsed_ms(self) -> float:
+        """从进程启动（main 模块开始执行）到现在的毫秒数"""
+        return (time.perf_counter() - self.start) * 1000
+
+    def report(self):
+        """输出启动总耗时；--startup-profile 模式下输出各阶段明细"""
+        total = (self.phases[-1][1] - self.start) * 1000 if self.phases else 0.0
+        logger.info(f"启动完成：首个弹窗绘制耗时 {total:.0f} ms")
+
+        if not self.verbose:
+            return
+
+        logger.info("启动耗时分析 (--startup-profile):")
+        previous = self.start
+        for phase, at in self.phases:
+            logger.info(f"  {phase:<12} {(at - previous) * 1000:8.1f} ms   (累计 {(at - self.start) * 1000:8.1f} ms)")
+            previous = at
+
+
+# 全局启动计时器（main 模块最先导入，start 即为进程启动时刻的近似值）
+startup_profiler = StartupProfiler()
@@ -0,0 +1,156 @@
+"""
+启动快照
+启动时由源文件派生的状态（校验后的配置、语句列表、爱心大小和轨迹点）保存在 CACHE_DIR 的单个文件中，
+下次启动时一次读取。各部分分别记录来源：配置和语句记录文件签名（修改时间、大小），布局记录屏幕尺寸和
+布局参数；不一致的部分照常重新生成并在之后写回。程序本身更新后整个快照失效
+"""
+import pickle
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+from loguru import logger
+
+from config import CACHE_DIR, CONFIG_FILE, ConfigValues
+from hot_reload import file_signature, FileSignature
+
+
+# 快照格式版本（格式变化时递增，旧快照自动失效）
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE = CACHE_DIR / f"startup-v{SNAPSHOT_VERSION}.pickle"
+
+# 不超过该大小的消息文件才把语句列表放进快照（更大的文件照常读取，或使用内存映射 + 行索引缓存）
+SNAPSHOT_MESSAGES_MAX_BYTES = 1024 * 1024
+
+# 快照内容由这些模块生成：源码运行时以它们的签名作为程序版本，打包版本使用可执行文件的签名
+SOURCE_MODULES = (
+    "config.py", "config_model.py", "heart_trajectory.py", "message_store.py",
+    "popup_layout.py", "popup_renderer.py", "startup_snapshot.py"
+)
+
+# 布局参数：(屏幕宽, 屏幕高, 弹窗数量, 圈数, 圈间距, 布局方式, 轨迹点数)
+LayoutKey = Tuple[int, int, int, int, float, str, int]
+
+# 每圈轨迹导出的点：(xs, ys, 轨迹长度)
+RingPoints = Tuple[List[float], List[float], float]
+
+
+def code_signature() -> tuple:
+    """程序本身的签名（程序更新后快照中的派生状态可能不再适用）"""
+    if getattr(sys, 'frozen', False):
+        return (file_signature(Path(sys.executable)),)
+    source_dir = Path(__file__).parent
+    return tuple(file_signature(source_dir / name) for name in SOURCE_MODULES)
+
+
+class StartupSnapshot:
+    """
+    启动快照 - 首次使用时读取整个快照文件，之后各部分按需取用
+
+    取用时校验该部分的来源，不一致时返回 None，由调用方照常生成后用 set_*() 记录；
+    启动完成后和退出时调用 save()，有变化时才写回。
+    """
+
+    def __init__(self, path: Path = SNAPSHOT_FILE):
+        self.path = path
+        self._parts: Optional[dict] = None
+        self._dirty = False
+
+    def _data(self) -> dict:
+        """快照各部分（首次访问时读取；文件不存在、损坏或程序已更新时为空）"""
+        if self._parts is not None:
+            return self._parts
+
+        self._parts = {}
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return self._parts
+        except Exception as e:
+            logger.warning(f"启动快照损坏，将重新生成: {e}")
+            return self._parts
+
+        if data.get("version") == SNAPSHOT_VERSION and data.get("code") == code_signature():
+            self._parts = data["parts"]
+        else:
+            logger.info("程序已更新，启动快照将重新生成")
+        return self._parts
+
+    def _set(self, name: str, part: dict):
+        """记录一个部分（save() 时写回）"""
+        self._data()[name] = part
+        self._dirty = True
+
+    def config(self) -> Optional[ConfigValues]:
+        """config.json 未变化时返回快照中校验过的配置"""
+        part = self._data().get("config")
+        if part is None or part["source"] != file_signature(CONFIG_FILE):
+            return None
+        logger.info(f"配置文件未变化，使用启动快照: {CONFIG_FILE}")
+        return ConfigValues(part["values"])
+
+    def set_config(self, config: 'AppConfig', signature: FileSignature):
+        """
+        记录校验后的配置
+
+        Args:
+            config: 校验后的配置
+            signature: 解析前记录的 config.json 签名
+        """
+        if signature is not None:
+            self._set("config", {"source": signature, "values": config.model_dump()})
+
+    def messages(self, path: Path) -> Optional[List[str]]:
+        """消息文件未变化时返回快照中的语句列表"""
+        part = self._data().get("messages")
+        if part is None or part["path"] != str(path) or part["source"] != file_signature(path):
+            return None
+        return part["messages"]
+
+    def set_messages(self, path: Path, signature: FileSignature, messages: List[str]):
+        """记录消息文件读取并去除空白后的语句（文件过大时不记录）"""
+        if signature is not None and signature[1] <= SNAPSHOT_MESSAGES_MAX_BYTES:
+            self._set("messages", {"path": str(path), "source": signature, "messages": messages})
+
+    def layout(self, key: LayoutKey) -> Optional[Tuple[float, List[RingPoints]]]:
+        """
+        布局参数相同时返回快照中的爱心大小和各圈轨迹点
+
+        Returns:
+            Optional[Tuple]: (爱心 scale, 各圈轨迹点)
+        """
+        part = self._data().get("layout")
+        if part is None or part["key"] != key:
+            return None
+        return part["scale"], part["rings"]
+
+    def set_layout(self, key: LayoutKey, scale: float, rings: Sequence[RingPoints]):
+        """记录布局结果"""
+        self._set("layout", {"key": key, "scale": scale, "rings": list(rings)})
+
+    def save(self):
+        """有变化时写回快照文件（先写临时文件再替换，中途退出不会留下损坏的快照）"""
+        if not self._dirty:
+            return
+
+        data = {"version": SNAPSHOT_VERSION, "code": code_signature(), "parts": self._parts}
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # 清理旧版本的快照
+            for old in CACHE_DIR.glob("startup-v*.pickle"):
+                if old != self.path:
+                    old.unlink()
+            temp = self.path.with_suffix(".tmp")
+            with open(temp, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            temp.replace(self.path)
+        except OSError as e:
+            logger.warning(f"保存启动快照失败: {e}")
+            return
+
+        self._dirty = False
+        logger.info(f"启动快照已更新: {self.path.name} ({', '.join(sorted(self._parts))})")
+
+
+# 全局启动快照（配置、语句和布局共用一次读取）
+startup_snapshot = StartupSnapshot()
@@ -0,0 +1,124 @@
+"""
+OpenGL 覆盖层测试
+图集分配和顶点生成不需要 OpenGL 上下文；实际绘制需要 OpenGL 2.0，不可用时跳过
+（软件光栅化：LIBGL_ALWAYS_SOFTWARE=1 QT_QPA_PLATFORM=xcb python -m pytest tests/test_gl_overlay.py）
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+# 必须在导入 Qt 之前设置，保证无显示器环境下也能运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "src"))
+
+import numpy as np
+import pytest
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QApplication
+
+from config import config, AppConfig
+from gl_overlay import TextureAtlas, build_quads, gl_available, VERTEX_FLOATS
+
+app = QApplication.instance() or QApplication([])
+
+
+def image():
+    return QImage(1, 1, QImage.Format_RGBA8888_Premultiplied)
+
+
+def test_atlas_packing():
+    atlas = TextureAtlas(100, 30, 20)
+    assert (atlas.columns, atlas.capacity) == (3, 15)
+
+    cells = [atlas.insert(("popup", i), image()) for i in range(atlas.capacity)]
+    assert cells == list(range(atlas.capacity))
+    assert atlas.cell_origin(0) == (0, 0)
+    assert atlas.cell_origin(4) == (30, 20)
+    assert atlas.cell_origin(14) == (60, 80)
+    assert len(atlas.uploads) == atlas.capacity
+    # 当前批次占用了所有格子：需要先绘制
+    assert atlas.full()
+
+
+def test_atlas_evicts_least_recently_used_outside_batch():
+    atlas = TextureAtlas(60, 30, 20)
+    assert atlas.capacity == 6
+    for i in range(6):
+        atlas.insert(i, image())
+
+    atlas.begin_batch()
+    assert not atlas.full()
+    # 最近使用过的 0、1 不淘汰，最久未使用的 2 先被淘汰
+    assert atlas.lookup(0) == 0
+    assert atlas.lookup(1) == 1
+    assert atlas.insert("new", image()) == 2
+    assert atlas.lookup(2) is None
+
+    # 同一批次用到的格子不会被淘汰
+    assert atlas.insert("newer", image()) == 3
+    for key in (4, 5):
+        atlas.lookup(key)
+    assert atlas.full()
+
+    atlas.begin_batch()
+    assert not atlas.full()
+    assert atlas.insert("next batch", image()) == 0
+
+
+def test_build_quads_layout_and_uvs():
+    atlas = TextureAtlas(100, 30, 20)
+    xs, ys = np.array([50.0, 10.5]), np.array([40.0, 20.0])
+    widths, heights = np.array([20.0, 10.0]), np.array([10.0, 6.0])
+    opacity = np.array([0.5, 0.95])
+    cells = np.array([0, 4])
+
+    vertices = build_quads(xs, ys, widths, heights, opacity, cells, atlas, ratio=2.0)
+    assert vertices.shape == (12, VERTEX_FLOATS)
+    assert vertices.dtype == np.float32
+
+    # 第一个弹窗：左上角 (40, 35)，两个三角形覆盖整个矩形
+    quad = vertices[:6]
+    corners = {tuple(v) for v in quad[:, :2]}
+    assert corners == {(40, 35), (60, 35), (40, 45), (60, 45)}
+    # 纹理坐标按物理像素（设备像素比 2）从格子 0 的左上角开始
+    np.testing.assert_allclose(quad[0, 2:4], (0, 0))
+    np.testing.assert_allclose(quad[5, 2:4], (40 / 100, 20 / 100))
+    np.testing.assert_allclose(quad[:, 4], 0.5)
+
+    # 第二个弹窗：中心取整与点击区域一致；格子 4 位于 (30, 20)
+    quad = vertices[6:]
+    np.testing.assert_allclose(quad[0, :2], (5, 17))
+    np.testing.assert_allclose(quad[0, 2:4], (0.3, 0.2))
+    np.testing.assert_allclose(quad[5, 2:4], (0.3 + 20 / 100, 0.2 + 12 / 100), rtol=1e-6)
+    np.testing.assert_allclose(quad[:, 4], 0.95, rtol=1e-6)
+
+
+def test_gl_overlay_draws_in_one_call():
+    if not gl_available():
+        pytest.skip("OpenGL 2.0 不可用")
+    from heart_window import HeartWindowManager
+    from gl_overlay import GLHeartOverlay
+
+    original = config.load()
+    values = {name: getattr(original, name) for name in AppConfig.model_fields}
+    values.update(render_mode="overlay", overlay_renderer="opengl", adaptive_quality=False)
+    config.replace(AppConfig(**values))
+    manager = HeartWindowManager()
+    try:
+        manager.load_messages(config.messages_path)
+        manager.create_windows(1280, 720, 20)
+        end = time.monotonic() + 3.0
+        while time.monotonic() < end:
+            app.processEvents()
+            time.sleep(0.005)
+
+        overlay = manager._overlay
+        assert isinstance(overlay, GLHeartOverlay)
+        overlay.draw_calls = 0
+        overlay.repaint()
+        assert overlay.draw_calls == 1
+        assert overlay._atlas.uploaded >= 1
+    finally:
+        manager.close_all()
+        config.replace(original)
@@ -0,0 +1,49 @@
+"""
+爱心轨迹测试
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "src"))
+
+import numpy as np
+import pytest
+
+from heart_trajectory import HeartTrajectory, BATCH_THRESHOLD, pulse_scale
+
+
+@pytest.mark.parametrize("num_points", [64, 120, 360])
+def test_points_evenly_spaced_by_arc_length(num_points):
+    trajectory = HeartTrajectory(scale=200)
+    trajectory.generate_points(num_points)
+
+    # 相邻存储点（含闭合点）之间的弦长几乎相等：进度与走过的路程成正比
+    steps = np.hypot(np.diff(trajectory._xs), np.diff(trajectory._ys))
+    assert len(steps) == num_points
+    # 弦长之和略短于弧长（点越少越短）
+    assert steps.sum() == pytest.approx(trajectory.length, rel=5e-3)
+    np.testing.assert_allclose(steps, steps.mean(), rtol=0.01)
+
+
+def test_equal_progress_steps_cover_equal_distance():
+    trajectory = HeartTrajectory(scale=200, center_x=500, center_y=400)
+    points = np.array([trajectory.get_point_at_progress(p) for p in np.linspace(0, 1, 1001)])
+    steps = np.hypot(*np.diff(points, axis=0).T)
+    np.testing.assert_allclose(steps, trajectory.length / 1000, rtol=0.05)
+
+
+@pytest.mark.parametrize("count", [1, BATCH_THRESHOLD, BATCH_THRESHOLD + 1, 1000])
+def test_batch_matches_scalar(count):
+    trajectory = HeartTrajectory(scale=200, center_x=960, center_y=540)
+    rng = np.random.default_rng(count)
+    # 包含整圈边界和超出 [0, 1) 的进度
+    progresses = rng.uniform(-1.5, 2.5, count)
+    progresses[:min(count, 4)] = [0.0, 1.0, -0.25, 0.999999][:min(count, 4)]
+
+    xs, ys, scales = trajectory.get_points_and_scales(progresses.tolist())
+    assert len(xs) == len(ys) == len(scales) == count
+
+    expected = np.array([trajectory.get_point_at_progress(p) for p in progresses])
+    np.testing.assert_allclose(xs, expected[:, 0], atol=1e-9)
+    np.testing.assert_allclose(ys, expected[:, 1], atol=1e-9)
+    np.testing.assert_allclose(scales, [pulse_scale(p) for p in progresses], atol=1e-12)
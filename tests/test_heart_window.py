@@ -0,0 +1,218 @@
+"""
+弹窗管理器测试（弹窗数量调整、覆盖层点击、淡入淡出方式热重载）
+在 Qt offscreen 平台下无界面运行：python -m pytest tests
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+# 必须在导入 Qt 之前设置，保证无显示器环境下也能运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "src"))
+
+import pytest
+from PyQt5.QtCore import Qt, QEvent, QPoint, QPointF
+from PyQt5.QtGui import QMouseEvent
+from PyQt5.QtWidgets import QApplication
+
+from config import config, AppConfig
+import heart_window
+from heart_window import HeartWindow, HeartWindowManager
+from popup_engine import STATE_FREE, STATE_MOVING, STATE_FADING_OUT, STATE_CLOSED
+
+app = QApplication.instance() or QApplication([])
+
+
+def pump(seconds: float):
+    """运行事件循环 seconds 秒（帧时钟在其中推进）"""
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.005)
+
+
+def wait_idle(manager: HeartWindowManager, timeout: float = 5.0) -> bool:
+    """等待所有弹窗关闭、帧时钟停止"""
+    end = time.monotonic() + timeout
+    while manager.frame_timer.isActive() and time.monotonic() < end:
+        pump(0.05)
+    return not manager.frame_timer.isActive()
+
+
+def assert_consistent(manager: HeartWindowManager):
+    """弹窗列表中没有已释放的行，也没有两个弹窗共用一行"""
+    popups = manager.windows + manager._closing
+    rows = [popup.row for popup in popups]
+    assert len(rows) == len(set(rows))
+    assert all(popup.state != STATE_FREE for popup in popups)
+    assert all(manager._views[popup.row] is popup for popup in popups)
+    assert manager.engine.live == len(popups)
+
+
+@pytest.fixture(params=["windows", "overlay"])
+def manager(request):
+    """按指定渲染模式创建管理器，结束时关闭所有弹窗并恢复配置"""
+    original = config.load()
+
+    def configure(**changes):
+        values = {name: getattr(original, name) for name in AppConfig.model_fields}
+        values.update(render_mode=request.param, adaptive_quality=False)
+        values.update(changes)
+        config.replace(AppConfig(**values))
+
+    configure()
+    manager = HeartWindowManager()
+    manager.configure = configure
+    manager.load_messages(config.messages_path)
+    yield manager
+    manager.close_all()
+    wait_idle(manager)
+    config.replace(original)
+
+
+def test_shrink_during_startup(manager):
+    manager.create_windows(1920, 1080, 30)
+    # 部分弹窗仍在等待出现时减少数量
+    pump(0.3)
+    manager.resize_popups(12)
+
+    assert len(manager.windows) == 12
+    assert_consistent(manager)
+
+    pump(1.0)
+    assert_consistent(manager)
+    manager.close_all()
+    assert wait_idle(manager)
+    assert manager.engine.live == 0
+
+
+def test_resize_keeps_clicked_popup_fading(manager):
+    manager.create_windows(1920, 1080, 10)
+    pump(2.5)
+    clicked = next(w for w in manager.windows if w.state not in (STATE_FADING_OUT, STATE_CLOSED))
+    clicked.fade_out_and_close()
+    manager.resize_popups(12)
+
+    assert clicked not in manager.windows
+    assert len(manager.windows) == 12
+    assert_consistent(manager)
+
+    # 淡出结束后被点击的弹窗回收
+    pump(1.5)
+    assert clicked not in manager._closing
+    assert_consistent(manager)
+
+
+def test_ring_rebalance(manager):
+    manager.configure(heart_rings=3)
+    manager.create_windows(1920, 1080, 8)
+    pump(0.3)
+    manager.resize_popups(7)
+
+    assert len(manager.windows) == 7
+    assert_consistent(manager)
+
+    manager.close_all()
+    assert wait_idle(manager)
+    assert manager.engine.live == 0
+
+
+def test_overlay_click_skips_fading_popup(manager):
+    if config.render_mode != "overlay":
+        pytest.skip("只有覆盖层需要按空间索引查找被点击的弹窗")
+    manager.create_windows(1920, 1080, 10)
+    pump(2.5)
+
+    # 两个弹窗叠在同一位置，最上层的已在淡出
+    engine, overlay = manager.engine, manager._overlay
+    first, second = [w for w in manager.windows if w.state == STATE_MOVING][:2]
+    x, y = float(engine.x[first.row]), float(engine.y[first.row])
+    engine.x[second.row], engine.y[second.row] = x, y
+    overlay.sync(manager.windows + manager._closing)
+    top, under = list(overlay._index.query_point(int(x), int(y)))[:2]
+    top.fade_out_and_close()
+
+    event = QMouseEvent(QEvent.MouseButtonPress, QPointF(x, y), Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
+    overlay.mousePressEvent(event)
+    assert under.state == STATE_FADING_OUT
+
+
+def test_overlay_click_between_popups_passes_through(manager, monkeypatch):
+    if config.render_mode != "overlay":
+        pytest.skip("只有覆盖层使用点击区域遮罩")
+    # 缩短启动错开时间，让 80 个弹窗都已出现
+    monkeypatch.setattr(heart_window, "STARTUP_SPREAD_MS", 800)
+    manager.create_windows(1920, 1080, 80)
+    pump(2.5)
+    assert len(manager._overlay.popups) == 80
+
+    # 两个弹窗并排放在角落，中间留出 10px 空隙（落在同一个点击测试网格单元内）
+    engine, overlay = manager.engine, manager._overlay
+    left, right = [w for w in manager.windows if w.state == STATE_MOVING][:2]
+    y = 1000.0
+    engine.x[left.row], engine.y[left.row] = 100.0, y
+    engine.x[right.row], engine.y[right.row] = 100.0 + left.popup_width + 10, y
+    overlay.sync(manager.windows + manager._closing)
+
+    gap = QPoint(left.x + left.popup_width + 5, int(y))
+    cell = overlay._index.cell_size
+    assert (left.x + left.popup_width - 1) // cell == gap.x() // cell == right.x // cell
+    assert not overlay.mask().contains(gap)
+    assert overlay.mask().contains(left.rect().center())
+    assert overlay.mask().contains(right.rect().center())
+
+    event = QMouseEvent(QEvent.MouseButtonPress, QPointF(gap), Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
+    overlay.mousePressEvent(event)
+    assert left.state == right.state == STATE_MOVING
+
+
+def test_fade_mode_applies_to_existing_windows(manager, monkeypatch):
+    if config.render_mode != "windows":
+        pytest.skip("只有原生窗口使用窗口透明度")
+    manager.create_windows(1920, 1080, 10)
+    pump(1.0)
+    manager.close_all()
+    manager.create_windows(1920, 1080, 5)
+    pump(1.0)
+    assert manager.pool.idle
+
+    # offscreen 平台没有合成器，模拟检测到合成器
+    monkeypatch.setattr(heart_window, "native_opacity_supported", lambda: True)
+    manager.update_fade_mode()
+    windows = [w for w in manager.windows + manager.pool.idle if isinstance(w, HeartWindow)]
+    assert all(w._native_opacity for w in windows)
+
+    monkeypatch.undo()
+    manager.configure(fade_mode="repaint")
+    manager.update_fade_mode()
+    assert not any(w._native_opacity for w in windows)
+    assert all(w.windowOpacity() == 1.0 for w in windows)
+
+
+def test_pool_idle_trim_and_switch_to_overlay(manager):
+    if config.render_mode != "windows":
+        pytest.skip("只有原生窗口使用复用池")
+    manager.create_windows(1920, 1080, 6)
+    pump(1.0)
+    manager.close_all()
+    wait_idle(manager)
+    pool = manager.pool
+    assert pool.idle and pool.trim_timer.isActive()
+
+    # 修改空闲清理时间：按新的时间重新计时，0 表示不清理
+    pool.set_idle_trim(0)
+    assert pool.idle_trim_ms == 0 and not pool.trim_timer.isActive()
+    pool.set_idle_trim(0.05)
+    assert pool.trim_timer.isActive()
+    pump(0.2)
+    assert not pool.idle
+
+    # 切换到覆盖层后，仍在淡出的原生窗口不再放回复用池
+    manager.create_windows(1920, 1080, 6)
+    pump(1.0)
+    manager.close_all()
+    manager.configure(render_mode="overlay")
+    wait_idle(manager)
+    assert not pool.idle
+    assert_consistent(manager)
@@ -0,0 +1,79 @@
+"""
+热重载测试（文件监视、按配置开关监视）
+"""
+import os
+import sys
+import time
+import types
+from pathlib import Path
+
+# 必须在导入 Qt 之前设置，保证无显示器环境下也能运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "src"))
+
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+from config import config, AppConfig
+import hot_reload
+from hot_reload import FileWatcher
+import main
+
+app = QApplication.instance() or QApplication([])
+
+
+def pump(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def configure():
+    original = config.load()
+
+    def configure(**changes):
+        values = {name: getattr(original, name) for name in AppConfig.model_fields}
+        values.update(changes)
+        config.replace(AppConfig(**values))
+
+    yield configure
+    config.replace(original)
+
+
+def test_watcher_reports_changed_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(hot_reload, "RELOAD_DEBOUNCE_MS", 20)
+    path = tmp_path / "config.json"
+    path.write_text("{}", encoding="utf-8")
+    watcher = FileWatcher([path])
+    changed = []
+    watcher.file_changed.connect(changed.append)
+
+    path.write_text('{"num_popups": 30}', encoding="utf-8")
+    end = time.monotonic() + 5
+    while not changed and time.monotonic() < end:
+        pump(0.05)
+    assert changed == [str(path)]
+
+
+def test_hot_reload_toggles_watcher(configure, monkeypatch):
+    # main 在启动时才导入配置
+    monkeypatch.setattr(main, "config", config)
+    calls = []
+    state = types.SimpleNamespace(watcher=None, _on_file_changed=calls.append)
+
+    configure(hot_reload=True)
+    main.HeartCareApp._update_watcher(state)
+    watcher = state.watcher
+    assert isinstance(watcher, FileWatcher)
+    main.HeartCareApp._update_watcher(state)
+    assert state.watcher is watcher
+
+    # 关闭热重载：已断开的监视器发出的通知不再处理
+    configure(hot_reload=False)
+    main.HeartCareApp._update_watcher(state)
+    assert state.watcher is None
+    watcher.file_changed.emit("config.json")
+    assert calls == []
+    pump(0.05)
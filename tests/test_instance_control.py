@@ -0,0 +1,115 @@
+"""
+单实例与本地控制通道测试
+运行中的实例在子进程中启动（offscreen 平台），测试进程作为本地客户端和第二个实例
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# 必须在导入 Qt 之前设置，保证无显示器环境下也能运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+SRC_DIR = Path(__file__).parent.parent.resolve() / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+import instance_control
+from instance_control import ControlServer, send_command
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+# 子进程中的实例：使用 HeartCareApp 的 num_popups 命令处理（配置校验、调整弹窗数量）
+INSTANCE_SCRIPT = """
+import os, sys, types
+sys.path.insert(0, sys.argv[1])
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+app = QApplication([])
+import instance_control
+instance_control.SERVER_NAME = sys.argv[2]
+import main
+from config import config
+from heart_window import HeartWindowManager
+main.config = config
+state = types.SimpleNamespace(manager=HeartWindowManager())
+server = instance_control.ControlServer()
+server.handlers.update({
+    "ping": lambda args: {"pid": os.getpid()},
+    "num_popups": lambda args: main.HeartCareApp._on_control_num_popups(state, args),
+    "quit": lambda args: (QTimer.singleShot(0, app.quit), {})[1],
+})
+assert server.listen() is True
+print("ready", flush=True)
+app.exec_()
+"""
+
+
+@pytest.fixture
+def server_name(monkeypatch):
+    """每个测试使用独立的套接字名称，不影响正在运行的程序"""
+    name = f"heartcare-popups-test-{os.getpid()}"
+    monkeypatch.setattr(instance_control, "SERVER_NAME", name)
+    yield name
+    from PyQt5.QtNetwork import QLocalServer
+    QLocalServer.removeServer(name)
+
+
+@pytest.fixture
+def instance(server_name):
+    """在子进程中启动一个监听控制通道的实例"""
+    process = subprocess.Popen(
+        [sys.executable, "-c", INSTANCE_SCRIPT, str(SRC_DIR), server_name],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    assert process.stdout.readline().strip() == "ready"
+    yield process
+    if process.poll() is None:
+        send_command("quit")
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def test_no_instance(server_name):
+    assert send_command("ping") is None
+
+
+def test_ping(instance):
+    reply = send_command("ping")
+    assert reply == {"ok": True, "pid": instance.pid}
+
+
+def test_unknown_command(instance):
+    reply = send_command("bogus")
+    assert reply["ok"] is False
+    assert "bogus" in reply["error"]
+
+
+def test_num_popups_validation(instance):
+    reply = send_command("num_popups", value=3)
+    assert reply["ok"] is False
+    assert "num_popups" in reply["error"]
+
+    reply = send_command("num_popups", value="many")
+    assert reply["ok"] is False
+
+    assert send_command("num_popups", value=30) == {"ok": True, "num_popups": 30}
+
+
+def test_second_listen_returns_false(instance):
+    assert ControlServer().listen() is False
+    # 第二个实例没有替换运行中实例的通道
+    assert send_command("ping")["pid"] == instance.pid
+
+
+def test_listen_after_crash(instance):
+    instance.kill()
+    instance.wait()
+
+    # 异常退出留下的套接字文件被清理，新实例可以监听
+    server = ControlServer()
+    assert server.listen() is True
+    server.close()
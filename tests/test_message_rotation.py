@@ -0,0 +1,127 @@
+"""
+语句轮换测试（选择策略、预取线程停止）
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+
+# 必须在导入 Qt 之前设置，保证无显示器环境下也能运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "src"))
+
+import pytest
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import QApplication
+
+import message_rotation
+from message_rotation import MessagePrefetcher, iter_sequential, iter_shuffled, iter_weighted
+
+app = QApplication.instance() or QApplication([])
+
+
+class SlowMessages:
+    """每次读取都有延迟的超大语句存储（模拟扫描需要很久的内存映射文件）"""
+
+    def __init__(self, count: int, delay: float):
+        self.count = count
+        self.delay = delay
+        self.reads = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> str:
+        self.reads += 1
+        time.sleep(self.delay)
+        return f"语句 {index}"
+
+
+def test_sequential_wraps_from_start():
+    assert list(islice(iter_sequential(5, 3), 7)) == [3, 4, 0, 1, 2, 3, 4]
+    assert next(iter_sequential(5, 12)) == 2
+
+
+@pytest.mark.parametrize("count", [1, 7, 50, 53])
+def test_shuffled_has_no_repeats_within_a_pass(count, monkeypatch):
+    # 小的语句块，覆盖多个块和最后一个不完整的块
+    monkeypatch.setattr(message_rotation, "SHUFFLE_BLOCK", 8)
+    random.seed(count)
+    indices = list(islice(iter_shuffled(count), count * 4))
+    for start in range(0, len(indices), count):
+        assert sorted(indices[start:start + count]) == list(range(count))
+    if count > 8:
+        # 每一轮的顺序都不同
+        assert indices[:count] != indices[count:2 * count]
+
+
+def test_weighted_follows_weights():
+    messages = [f"语句 {i}" for i in range(10)]
+    weights = {"语句 0": 0.0, "语句 1": 0.0, "语句 2": 12.0}
+    random.seed(1)
+    counts = Counter(islice(iter_weighted(messages, weights), 20000))
+
+    assert counts[0] == counts[1] == 0
+    # 总权重 7 × 1 + 12 = 19
+    assert counts[2] / 20000 == pytest.approx(12 / 19, abs=0.02)
+    for index in range(3, 10):
+        assert counts[index] / 20000 == pytest.approx(1 / 19, abs=0.01)
+
+
+def test_weighted_mostly_listed_and_all_zero():
+    messages = [f"语句 {i}" for i in range(6)]
+    weights = {message: 2.0 for message in messages[:5]}
+    random.seed(2)
+    counts = Counter(islice(iter_weighted(messages, weights), 11000))
+    assert counts[5] / 11000 == pytest.approx(1 / 11, abs=0.01)
+
+    # 权重全部为 0 时退回均匀随机
+    zero = {message: 0.0 for message in messages}
+    assert set(islice(iter_weighted(messages, zero), 500)) == set(range(6))
+
+
+def test_weighted_scan_stops_when_requested():
+    messages = SlowMessages(10 ** 6, 0.0)
+    stop_event = threading.Event()
+    stop_event.set()
+    assert list(iter_weighted(messages, {"语句 1": 2.0}, stop_event)) == []
+    assert messages.reads == 0
+
+
+def test_prefetcher_stops_during_weighted_scan():
+    # 完整扫描需要约 100 秒
+    messages = SlowMessages(10 ** 6, 1e-4)
+    prefetcher = MessagePrefetcher()
+    prefetcher.start(messages, "weighted", {"语句 1": 2.0}, 4, QFont())
+    time.sleep(0.2)
+    thread = prefetcher._thread
+
+    started = time.monotonic()
+    prefetcher.stop()
+    assert not thread.is_alive()
+    assert time.monotonic() - started < message_rotation.STOP_TIMEOUT
+    assert messages.reads < 10 ** 5
+
+
+def test_prefetcher_prepares_messages_in_order():
+    messages = [f"语句 {i}" for i in range(5)]
+    prefetcher = MessagePrefetcher()
+    prefetcher.position = 3
+    prefetcher.start(messages, "sequential", {}, 3, QFont())
+    taken = []
+    end = time.monotonic() + 5
+    while len(taken) < 4 and time.monotonic() < end:
+        message = prefetcher.take()
+        if message is None:
+            time.sleep(0.01)
+        else:
+            taken.append(message)
+    prefetcher.stop()
+
+    assert taken == ["语句 3", "语句 4", "语句 0", "语句 1"]
+    # 重新启动时从下一条继续
+    assert prefetcher.position == 2
@@ -0,0 +1,65 @@
+"""
+消息存储测试（内存映射 + 行索引缓存）
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "src"))
+
+import message_store
+from message_store import MappedMessageStore
+
+
+def write_messages(path: Path, messages, mtime_ns: int):
+    path.write_text("\n".join(messages) + "\n", encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_stale_index_cleanup_keeps_other_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(message_store, "CACHE_DIR", tmp_path / "cache")
+    # 文件名包含 "-v"，且与另一个文件只在 "-v" 之后不同
+    verses = tmp_path / "love-verses.txt"
+    other = tmp_path / "love-vows.txt"
+    write_messages(verses, ["a", "b"], 1_000_000_000)
+    write_messages(other, ["c"], 1_000_000_000)
+    MappedMessageStore(other).close()
+    MappedMessageStore(verses).close()
+
+    # 修改后重新打开：只替换该文件自己的索引
+    write_messages(verses, ["a", "b", "c"], 2_000_000_000)
+    store = MappedMessageStore(verses)
+    assert list(store) == ["a", "b", "c"]
+    store.close()
+
+    for pattern in ("*.idx.npy", "*.copy"):
+        names = sorted(p.name for p in (tmp_path / "cache").glob(pattern))
+        assert len(names) == 2
+        assert sum(name.startswith("love-verses-") for name in names) == 1
+        assert sum(name.startswith("love-vows-") for name in names) == 1
+
+
+def test_source_file_can_change_while_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(message_store, "CACHE_DIR", tmp_path / "cache")
+    path = tmp_path / "messages.txt"
+    messages = [f"第 {i} 条关心语句" for i in range(2000)]
+    write_messages(path, messages, 1_000_000_000)
+    store = MappedMessageStore(path)
+
+    # 映射的是缓存目录中的副本：原地截断和重写源文件不影响已打开的存储
+    with open(path, "r+b") as f:
+        f.truncate(0)
+    path.write_text("新内容\n", encoding="utf-8")
+    assert store[len(messages) - 1] == messages[-1]
+    assert store.sample(3)
+    store.close()
+
+    # 同一版本再次打开时复用副本
+    write_messages(path, messages, 1_000_000_000)
+    first = MappedMessageStore(path)
+    first.close()
+    copies = list((tmp_path / "cache").glob("*.copy"))
+    again = MappedMessageStore(path)
+    assert list((tmp_path / "cache").glob("*.copy")) == copies
+    assert len(again) == len(messages)
+    again.close()
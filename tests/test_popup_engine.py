@@ -0,0 +1,170 @@
+"""
+动画引擎测试
+引擎不依赖 Qt，用模拟时钟推进，结果是确定的
+"""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "src"))
+
+import pytest
+
+from heart_trajectory import HeartTrajectory
+from popup_engine import (
+    PopupEngine, FADE_DURATION, MAX_OPACITY,
+    STATE_PENDING, STATE_FADING_IN, STATE_MOVING, STATE_FADING_OUT, STATE_CLOSED, STATE_FREE
+)
+
+LAP = 10.0
+# 阶段边界的浮点误差（在理论时刻之后一点采样）
+EPS = 1e-9
+
+
+@pytest.fixture
+def trajectory():
+    return HeartTrajectory(center_x=960, center_y=540)
+
+
+def test_phase_transitions(trajectory):
+    engine = PopupEngine()
+    row = engine.add(trajectory, 0.25, appear_at=1.0)
+    assert engine.state[row] == STATE_PENDING
+
+    update = engine.step(0.5, LAP)
+    assert engine.state[row] == STATE_PENDING and not len(update.started)
+
+    update = engine.step(1.0, LAP)
+    assert engine.state[row] == STATE_FADING_IN
+    assert update.started.tolist() == [row]
+
+    engine.step(1.0 + FADE_DURATION / 2, LAP)
+    assert engine.opacity[row] == pytest.approx(MAX_OPACITY / 2)
+
+    update = engine.step(1.0 + FADE_DURATION + EPS, LAP)
+    assert engine.state[row] == STATE_MOVING
+    assert engine.opacity[row] == MAX_OPACITY
+    assert row in update.moved
+
+    assert engine.fade_out(row, 5.0) is False
+    assert engine.state[row] == STATE_FADING_OUT
+    engine.step(5.0 + FADE_DURATION / 2, LAP)
+    assert engine.opacity[row] == pytest.approx(MAX_OPACITY / 2)
+
+    update = engine.step(5.0 + FADE_DURATION + EPS, LAP)
+    assert engine.state[row] == STATE_CLOSED
+    assert update.closed.tolist() == [row]
+
+    engine.release(row)
+    assert engine.state[row] == STATE_FREE
+    assert engine.live == 0
+
+
+def test_pending_popup_closes_without_fading(trajectory):
+    engine = PopupEngine()
+    row = engine.add(trajectory, 0.0, appear_at=10.0)
+    assert engine.fade_out(row, 1.0) is True
+    assert engine.state[row] == STATE_CLOSED
+
+
+def test_phases_use_exact_times_within_one_frame(trajectory):
+    engine = PopupEngine()
+    row = engine.add(trajectory, 0.0, appear_at=1.0)
+
+    # 一帧内跨过出现、淡入两个阶段：运动从淡入结束的理论时刻开始计时
+    engine.step(1.0 + FADE_DURATION + LAP / 4, LAP)
+    assert engine.state[row] == STATE_MOVING
+    assert engine.phase_start[row] == pytest.approx(1.0 + FADE_DURATION)
+    assert engine.progress[row] == pytest.approx(0.25)
+
+
+def test_lap_duration_independent_of_step_cadence(trajectory):
+    start = 0.3
+    moving_at = FADE_DURATION
+    lap_end = moving_at + LAP
+    rng = random.Random(1)
+
+    results = []
+    for intervals in ([1 / 60] * 2000, [1 / 7] * 200, [rng.uniform(0.001, 0.5) for _ in range(200)]):
+        engine = PopupEngine()
+        row = engine.add(trajectory, start, appear_at=0.0)
+        now = 0.0
+        for dt in intervals:
+            if now + dt >= lap_end:
+                break
+            now += dt
+            engine.step(now, LAP)
+        engine.step(lap_end, LAP)
+        results.append((float(engine.progress[row]), float(engine.x[row]), float(engine.y[row])))
+
+    # 无论采样间隔如何，一圈恰好 LAP 秒回到起点，且各采样方式结果相同
+    for progress, x, y in results:
+        assert progress == pytest.approx(start)
+        assert (x, y) == pytest.approx(results[0][1:])
+    assert (results[0][1], results[0][2]) == pytest.approx(trajectory.get_point_at_progress(start))
+
+
+def test_rebase_keeps_progress_when_lap_changes(trajectory):
+    engine = PopupEngine()
+    row = engine.add(trajectory, 0.0, appear_at=0.0)
+    t = FADE_DURATION + LAP / 4
+    engine.step(t, LAP)
+    assert engine.progress[row] == pytest.approx(0.25)
+
+    # 圈速改为 2 倍：当前进度不跳变，之后按新圈速推进
+    engine.rebase(t, LAP)
+    engine.step(t, 2 * LAP)
+    assert engine.progress[row] == pytest.approx(0.25)
+    engine.step(t + LAP / 2, 2 * LAP)
+    assert engine.progress[row] == pytest.approx(0.5)
+
+
+def test_rotations_due(trajectory):
+    engine = PopupEngine()
+    row = engine.add(trajectory, 0.0, appear_at=0.0)
+    interval = 3.0
+    moving_at = FADE_DURATION
+
+    engine.step(1.0, LAP)
+    assert not len(engine.rotations_due(1.0, interval))
+    # 从开始运动起每隔 interval 更换一次
+    assert engine.rotate_at[row] == pytest.approx(moving_at + interval)
+
+    now = moving_at + interval
+    engine.step(now, LAP)
+    due = engine.rotations_due(now, interval)
+    assert due.tolist() == [row]
+    engine.schedule_rotation(due, now, interval)
+    assert engine.rotate_at[row] == pytest.approx(moving_at + 2 * interval)
+
+    # 错过多次时从现在起重新计时
+    now = moving_at + 10 * interval + 0.5
+    engine.step(now, LAP)
+    due = engine.rotations_due(now, interval)
+    engine.schedule_rotation(due, now, interval)
+    assert engine.rotate_at[row] == pytest.approx(now + interval)
+
+    # 未运动的弹窗不更换
+    pending = engine.add(trajectory, 0.5, appear_at=100.0)
+    assert pending not in engine.rotations_due(now + interval, interval)
+
+
+def test_fade_out_ignores_released_row(trajectory):
+    engine = PopupEngine()
+    kept = engine.add(trajectory, 0.0, appear_at=0.0)
+    row = engine.add(trajectory, 0.5, appear_at=0.0)
+    engine.release(row)
+
+    assert engine.fade_out(row, 1.0) is False
+    assert engine.state[row] == STATE_FREE
+    assert engine.state[kept] != STATE_FREE
+
+
+def test_released_rows_are_reused(trajectory):
+    engine = PopupEngine(capacity=2)
+    rows = [engine.add(trajectory, i / 4, appear_at=0.0) for i in range(4)]
+    assert engine.capacity >= 4 and len(set(rows)) == 4
+
+    engine.release(rows[1])
+    assert engine.add(trajectory, 0.9, appear_at=0.0) == rows[1]
+    assert engine.live == 4
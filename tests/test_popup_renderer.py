@@ -0,0 +1,50 @@
+"""
+弹窗预渲染缓存测试
+"""
+import os
+import sys
+from pathlib import Path
+
+# 必须在导入 Qt 之前设置，保证无显示器环境下也能运行
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "src"))
+
+import pytest
+from loguru import logger
+
+from popup_renderer import PopupPixmapCache, PIXMAP_RESERVE_LIMIT
+
+
+@pytest.fixture
+def warnings():
+    messages = []
+    handler = logger.add(messages.append, level="WARNING", format="{message}")
+    yield messages
+    logger.remove(handler)
+
+
+def test_reserve_grows_cache_and_warns(warnings):
+    cache = PopupPixmapCache(max_entries=100)
+    cache.reserve(40)
+    assert cache.max_entries == 100
+    assert not warnings
+
+    cache.reserve(300)
+    assert cache.max_entries == 300
+    assert len(warnings) == 1 and "300" in warnings[0]
+
+    # 同样的预留不重复警告
+    cache.reserve(300)
+    assert len(warnings) == 1
+
+
+def test_reserve_is_capped(warnings):
+    cache = PopupPixmapCache(max_entries=100)
+    cache.reserve(PIXMAP_RESERVE_LIMIT * 10)
+    assert cache.max_entries == PIXMAP_RESERVE_LIMIT
+    assert len(warnings) == 1
+
+    # 配置的容量大于上限时按配置
+    cache = PopupPixmapCache(max_entries=PIXMAP_RESERVE_LIMIT * 2)
+    cache.reserve(PIXMAP_RESERVE_LIMIT * 10)
+    assert cache.max_entries == PIXMAP_RESERVE_LIMIT * 2
@@ -0,0 +1,94 @@
+"""
+空间索引测试
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "src"))
+
+import numpy as np
+import pytest
+
+from spatial_index import UniformGridIndex, overlapping_pairs
+
+
+def test_query_point_orders_topmost_first():
+    index = UniformGridIndex(cell_size=64)
+    index.update("a", 0, 0, 100, 100, order=0)
+    index.update("b", 50, 50, 100, 100, order=1)
+    index.update("c", 90, 90, 20, 20, order=2)
+    assert index.query_point(95, 95) == ["c", "b", "a"]
+    # 右、下边缘不包含在矩形内
+    assert index.query_point(100, 60) == ["b"]
+    assert index.query_point(10, 10) == ["a"]
+
+    # 调整绘制顺序
+    index.update("a", 0, 0, 100, 100, order=5)
+    assert index.query_point(95, 95) == ["a", "c", "b"]
+
+    # 移动到其他网格单元：旧位置不再命中
+    index.update("c", 300, 300, 20, 20, order=2)
+    assert index.query_point(95, 95) == ["a", "b"]
+    assert index.query_point(310, 310) == ["c"]
+
+    # 单元范围不变的小幅移动也会更新命中矩形
+    index.update("c", 305, 300, 20, 20, order=2)
+    assert index.query_point(302, 310) == []
+    assert index.query_point(322, 310) == ["c"]
+
+    index.remove("b")
+    assert index.query_point(95, 95) == ["a"]
+    assert index.query_point(140, 140) == []
+    index.remove("b")
+
+    index.retain({"c"})
+    assert index.query_point(10, 10) == []
+    assert len(index) == 1
+
+
+def brute_force_pairs(xs, ys, widths, heights):
+    """逐对比较的参考实现 O(n²)"""
+    pairs = {}
+    for i in range(len(xs)):
+        for j in range(i + 1, len(xs)):
+            overlap_x = (min(xs[i] + widths[i] / 2, xs[j] + widths[j] / 2)
+                         - max(xs[i] - widths[i] / 2, xs[j] - widths[j] / 2))
+            overlap_y = (min(ys[i] + heights[i] / 2, ys[j] + heights[j] / 2)
+                         - max(ys[i] - heights[i] / 2, ys[j] - heights[j] / 2))
+            if overlap_x > 0 and overlap_y > 0:
+                pairs[(i, j)] = overlap_x * overlap_y
+    return pairs
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_overlapping_pairs_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    count = 300
+    # 包含负坐标和大小不一的矩形
+    xs = rng.uniform(-500, 1500, count)
+    ys = rng.uniform(-300, 900, count)
+    widths = rng.uniform(20, 160, count)
+    heights = rng.uniform(10, 60, count)
+
+    first, second, area = overlapping_pairs(xs, ys, widths, heights)
+    found = {}
+    for i, j, a in zip(first.tolist(), second.tolist(), area.tolist()):
+        key = (min(i, j), max(i, j))
+        assert key not in found, "每对矩形只应出现一次"
+        found[key] = a
+
+    expected = brute_force_pairs(xs, ys, widths, heights)
+    assert expected
+    assert found.keys() == expected.keys()
+    for key, a in expected.items():
+        assert found[key] == pytest.approx(a)
+
+
+def test_overlapping_pairs_scalar_size_and_touching_edges():
+    # 边缘恰好相接不算重叠
+    xs, ys = np.array([0.0, 100.0, 50.0]), np.array([0.0, 0.0, 10.0])
+    first, second, area = overlapping_pairs(xs, ys, 100, 40)
+    pairs = {(min(i, j), max(i, j)): a for i, j, a in zip(first.tolist(), second.tolist(), area.tolist())}
+    assert pairs == {(0, 2): pytest.approx(50 * 30), (1, 2): pytest.approx(50 * 30)}
+
+    assert len(overlapping_pairs([1.0], [1.0], 10, 10)[0]) == 0